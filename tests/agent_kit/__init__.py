@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""RAG / Agent 示例共用的组件。
+
+导出的名字在第一次访问时才导入对应子模块：import agent_kit 不会加载 openai、numpy 等依赖，
+只用到其中一部分组件的 Agent 启动更快。
+"""
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .answer_cache import SemanticAnswerCache
+    from .bm25_index import BM25Index
+    from .dedup import dedup_documents
+    from .embeddings import DashScopeEmbeddings
+    from .embedding_cache import CachedEmbeddings, SQLiteEmbeddingCache
+    from .hybrid_search import HybridRetriever, reciprocal_rank_fusion
+    from .matrix_store import MatrixVectorStore
+    from .quantized_store import QuantizedVectorStore
+    from .query_cache import QueryCachedEmbeddings, QueryEmbeddingCache
+
+
+# 导出名 -> 所在子模块
+_EXPORTS = {
+    'SemanticAnswerCache': 'answer_cache',
+    'BM25Index': 'bm25_index',
+    'dedup_documents': 'dedup',
+    'DashScopeEmbeddings': 'embeddings',
+    'CachedEmbeddings': 'embedding_cache',
+    'SQLiteEmbeddingCache': 'embedding_cache',
+    'HybridRetriever': 'hybrid_search',
+    'reciprocal_rank_fusion': 'hybrid_search',
+    'MatrixVectorStore': 'matrix_store',
+    'QuantizedVectorStore': 'quantized_store',
+    'QueryCachedEmbeddings': 'query_cache',
+    'QueryEmbeddingCache': 'query_cache',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # 缓存到包的命名空间，之后的访问不再经过 __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,214 @@
+"""
+按权限范围隔离的语义答案缓存，位于 Agent 之前。
+
+发给 RAG Agent 的问题大多是几百个 FAQ 问题的不同问法，每次仍要至少两次 LLM 调用和一次检索。
+缓存把问题嵌入后，只在同一权限范围（user_permission）内查找相似度不低于 threshold 的已答问题，
+命中时直接返回保存的答案，完全跳过 Agent 循环。
+
+- 隔离：不同权限范围各自一份向量矩阵，查找时不会跨范围比较，答案不会泄露给其他权限组；
+- 过期：每条答案有 TTL，超出 max_entries 时淘汰最久未命中的条目；
+- 失效：每条答案记录生成它时检索到的片段（source_key：正文 + 元数据的哈希），
+  片段被修改或删除后，invalidate_sources / sync_sources 会删除引用它的答案。
+  没有引用任何片段的答案（未检索、检索为空或反问用户）无从判断是否过期，不缓存。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .query_cache import normalize_query
+
+
+Scope = str | Sequence[str] | None
+
+
+def source_key(doc: Document) -> str:
+    """片段的内容指纹：正文或元数据（含权限）任一变化都会改变。"""
+    metadata = json.dumps(doc.metadata, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(f"{doc.page_content}\x1f{metadata}".encode("utf-8")).hexdigest()
+
+
+def scope_key(scope: Scope) -> tuple[str, ...]:
+    """权限范围的规范形式：多个组与顺序无关。"""
+    if scope is None:
+        return ()
+    if isinstance(scope, str):
+        return (scope,)
+    return tuple(sorted(set(scope)))
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: frozenset[str]
+    stored_at: float
+    last_hit: float
+    vector: np.ndarray = field(repr=False)
+    # 本次查找与缓存问题的余弦相似度
+    similarity: float = 1.0
+
+
+class _ScopeEntries:
+    """一个权限范围内的答案，问题向量按需堆成矩阵。"""
+
+    def __init__(self) -> None:
+        self.entries: list[CachedAnswer] = []
+        self._matrix: np.ndarray | None = None
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.vstack([e.vector for e in self.entries])
+        return self._matrix
+
+    def keep(self, entries: list[CachedAnswer]) -> int:
+        removed = len(self.entries) - len(entries)
+        if removed:
+            self.entries = entries
+            self._matrix = None
+        return removed
+
+    def append(self, entry: CachedAnswer) -> None:
+        self.entries.append(entry)
+        self._matrix = None
+
+    def evict_oldest(self) -> None:
+        """删除最久未命中的一条。"""
+        oldest = min(range(len(self.entries)), key=lambda i: self.entries[i].last_hit)
+        del self.entries[oldest]
+        self._matrix = None
+
+
+class SemanticAnswerCache:
+    """线程安全；embeddings 建议使用 QueryCachedEmbeddings，未命中时检索可复用同一个问题向量。"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.92,
+        ttl: float | None = 24 * 3600.0,
+        max_entries: int = 2048,
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold 必须在 (0, 1] 范围内")
+        if max_entries < 1:
+            raise ValueError("max_entries 必须大于 0")
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._scopes: dict[tuple[str, ...], _ScopeEntries] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidated = 0
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop_expired(self, entries: _ScopeEntries, now: float) -> None:
+        if self.ttl is not None:
+            self.expired += entries.keep([e for e in entries.entries if now - e.stored_at < self.ttl])
+
+    def lookup(self, question: str, scope: Scope) -> CachedAnswer | None:
+        """在 scope 内查找相似问题的答案；未命中返回 None。"""
+        key = scope_key(scope)
+        with self._lock:
+            if not self._scopes.get(key, _ScopeEntries()).entries:
+                self.misses += 1
+                return None
+        vector = self._embed(question)
+        now = time.monotonic()
+        with self._lock:
+            entries = self._scopes.get(key)
+            if entries is not None:
+                self._drop_expired(entries, now)
+            if not entries or not entries.entries:
+                self.misses += 1
+                return None
+            scores = entries.matrix() @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            entry = entries.entries[best]
+            entry.last_hit = now
+            self.hits += 1
+            return CachedAnswer(
+                entry.question, entry.answer, entry.sources, entry.stored_at, now, entry.vector, float(scores[best])
+            )
+
+    def store(self, question: str, scope: Scope, answer: str, sources: Iterable[Document] = ()) -> bool:
+        """保存 scope 内的一条答案，sources 为生成答案时检索到的片段；sources 为空时不保存，返回是否保存。"""
+        keys = frozenset(source_key(doc) for doc in sources)
+        if not keys:
+            # 知识库补充内容后这类答案不会被任何失效操作删除，缓存会一直返回“没有找到”
+            return False
+        vector = self._embed(question)
+        now = time.monotonic()
+        entry = CachedAnswer(question, answer, keys, now, now, vector)
+        key = scope_key(scope)
+        with self._lock:
+            entries = self._scopes.setdefault(key, _ScopeEntries())
+            self._drop_expired(entries, now)
+            # 同一问题重复保存时覆盖旧答案
+            entries.keep([e for e in entries.entries if normalize_query(e.question) != normalize_query(question)])
+            entries.append(entry)
+            # 每次只多出一条，按下标删掉最久未命中的即可
+            while len(entries.entries) > self.max_entries:
+                entries.evict_oldest()
+        return True
+
+    def invalidate_sources(self, sources: Iterable[Document | str]) -> int:
+        """删除引用了这些片段（Document 或 source_key）的答案，返回删除条数。"""
+        stale = {s if isinstance(s, str) else source_key(s) for s in sources}
+        removed = 0
+        with self._lock:
+            for entries in self._scopes.values():
+                removed += entries.keep([e for e in entries.entries if not (e.sources & stale)])
+            self.invalidated += removed
+        return removed
+
+    def sync_sources(self, documents: Iterable[Document]) -> int:
+        """documents 为当前的全部片段；删除引用了已不存在（或已修改）片段的答案。"""
+        live = {source_key(doc) for doc in documents}
+        removed = 0
+        with self._lock:
+            for entries in self._scopes.values():
+                removed += entries.keep([e for e in entries.entries if e.sources and e.sources <= live])
+            self.invalidated += removed
+        return removed
+
+    def clear(self, scope: Scope = None) -> None:
+        """清空全部（scope 为 None）或某个权限范围的答案。"""
+        with self._lock:
+            if scope is None:
+                self._scopes.clear()
+            else:
+                self._scopes.pop(scope_key(scope), None)
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            size = sum(len(entries.entries) for entries in self._scopes.values())
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "scopes": len(self._scopes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "invalidated": self.invalidated,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
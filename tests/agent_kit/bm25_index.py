@@ -0,0 +1,394 @@
+"""
+可增量更新、可持久化的 BM25 倒排索引，面向不含空格的中文文本。
+
+- 分词：中文按连续汉字切出单字与二元组（n-gram），英文/数字按词整体保留并转小写，
+  "补卡"、"SKU-1024" 这类精确词都能命中；
+- 索引：倒排数据按段（segment）保存，每段是按词号排序的 CSR 数组
+  (词号, 偏移, 行号, 词频)。每次写入生成一个新段，相邻段大小接近时合并，
+  段数保持在 O(log N)；删除只打墓碑标记，合并段时顺带丢弃已删除行，无需整体重建；
+- 打分：查询词在各段中二分查找取出倒排数组，用 NumPy 一次算出 BM25 分数并累加；
+- 持久化：bm25.npz 保存合并后的倒排数组，bm25.json 保存词表、文档与参数，可记录语料指纹。
+
+配置 indexed_fields 后支持与 MatrixVectorStore 相同的 where 条件过滤。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+import uuid
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Iterable, NamedTuple, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .matrix_store import DocFilter, top_k_indices
+from .metadata_index import MetadataIndex, Where
+
+
+Tokenizer = Callable[[str], list[str]]
+
+_NPZ_FILE = "bm25.npz"
+_META_FILE = "bm25.json"
+
+# 连续汉字（含扩展 A 区）或英文/数字词（允许 - _ . 连接，如产品编号）
+_TOKEN = re.compile(r"[㐀-䶿一-鿿]+|[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def default_bm25_dir(name: str = "default") -> Path:
+    """BM25_DB_DIR 下以 name 命名的子目录。"""
+    return Path(os.getenv("BM25_DB_DIR", "./bm25_db")) / name
+
+
+def cjk_tokenize(text: str, ngram_range: tuple[int, int] = (1, 2)) -> list[str]:
+    """中文切成 n-gram，英文/数字按词保留；先做 NFKC 全半角折叠并转小写。"""
+    low, high = ngram_range
+    tokens: list[str] = []
+    for match in _TOKEN.finditer(unicodedata.normalize("NFKC", text).lower()):
+        run = match.group()
+        if not ("㐀" <= run[0] <= "鿿"):
+            tokens.append(run)
+            continue
+        for n in range(low, high + 1):
+            tokens.extend(run[i : i + n] for i in range(len(run) - n + 1))
+        # 比最小 n 还短的汉字串整体保留
+        if len(run) < low:
+            tokens.append(run)
+    return tokens
+
+
+class _Segment(NamedTuple):
+    """一段倒排数据：terms[i] 的倒排条目为 rows/tfs[offsets[i]:offsets[i+1]]，行号递增。"""
+
+    terms: np.ndarray
+    offsets: np.ndarray
+    rows: np.ndarray
+    tfs: np.ndarray
+
+    @classmethod
+    def build(cls, term_ids: np.ndarray, rows: np.ndarray, tfs: np.ndarray) -> _Segment:
+        # 稳定排序：rows 原本递增，排序后每个词的倒排条目仍按行号递增
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        terms, starts = np.unique(term_ids, return_index=True)
+        offsets = np.append(starts, term_ids.size).astype(np.int64)
+        return cls(terms, offsets, rows[order].astype(np.int32), tfs[order].astype(np.int32))
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray] | None:
+        i = int(np.searchsorted(self.terms, term_id))
+        if i == self.terms.size or self.terms[i] != term_id:
+            return None
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return self.rows[lo:hi], self.tfs[lo:hi]
+
+    def flat_terms(self) -> np.ndarray:
+        return np.repeat(self.terms, np.diff(self.offsets))
+
+
+def _merge(segments: Sequence[_Segment], alive: np.ndarray) -> tuple[_Segment, int]:
+    """按写入顺序合并若干段并丢弃已删除行，返回 (新段, 丢弃的条目数)。"""
+    term_ids = np.concatenate([seg.flat_terms() for seg in segments])
+    rows = np.concatenate([seg.rows for seg in segments])
+    tfs = np.concatenate([seg.tfs for seg in segments])
+    keep = alive[rows]
+    dropped = int(keep.size - keep.sum())
+    return _Segment.build(term_ids[keep], rows[keep], tfs[keep]), dropped
+
+
+class BM25Index:
+    """BM25 倒排索引，行号按写入顺序分配，删除的行只打标记。"""
+
+    def __init__(
+        self,
+        k1: float = 1.5,
+        b: float = 0.75,
+        tokenizer: Tokenizer = cjk_tokenize,
+        indexed_fields: Sequence[str] = (),
+        compact_ratio: float = 0.5,
+    ):
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.compact_ratio = compact_ratio
+        self._metadata_index = MetadataIndex(indexed_fields) if indexed_fields else None
+        self._lock = threading.RLock()
+        self._vocab: dict[str, int] = {}
+        self._segments: list[_Segment] = []
+        self._doc_len = array("i")
+        # 每行的不同词数，即该行在倒排数据中的条目数
+        self._doc_terms = array("i")
+        self._alive = array("b")
+        self._docs: list[Document | None] = []
+        self._row_of: dict[str, int] = {}
+        self._total_len = 0
+        # 倒排数据中指向已删除行的条目数，用于判断何时压缩
+        self._dead_postings = 0
+        self._live_postings = 0
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._metadata_index
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def _alive_mask(self) -> np.ndarray:
+        return np.array(self._alive, dtype=bool)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def add_documents(self, documents: Sequence[Document], ids: Sequence[str | None] | None = None) -> list[str]:
+        """追加文档（整批生成一个新段）；id 已存在时先删除旧行再写入新行。"""
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError(f"ids 与 documents 数量不一致：{len(ids)} != {len(documents)}")
+        # 分词不持锁，写入时才加锁
+        tokenized = [Counter(self.tokenizer(doc.page_content)) for doc in documents]
+        id_iter = iter(ids) if ids is not None else iter(doc.id for doc in documents)
+        out_ids: list[str] = []
+        with self._lock:
+            vocab = self._vocab
+            term_ids: list[int] = []
+            tfs: list[int] = []
+            rows: list[int] = []
+            for doc, counts in zip(documents, tokenized):
+                doc_id = next(id_iter) or str(uuid.uuid4())
+                if doc_id in self._row_of:
+                    self._delete_row(self._row_of.pop(doc_id))
+                row = len(self._docs)
+                self._docs.append(Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata))
+                self._row_of[doc_id] = row
+                length = sum(counts.values())
+                self._doc_len.append(length)
+                self._doc_terms.append(len(counts))
+                self._alive.append(1)
+                self._total_len += length
+                self._live_postings += len(counts)
+                found = list(map(vocab.get, counts))
+                if None in found:
+                    found = [
+                        vocab.setdefault(term, len(vocab)) if term_id is None else term_id
+                        for term, term_id in zip(counts, found)
+                    ]
+                term_ids.extend(found)
+                tfs.extend(counts.values())
+                rows.extend([row] * len(counts))
+                if self._metadata_index is not None:
+                    self._metadata_index.add(row, doc.metadata)
+                out_ids.append(doc_id)
+            if term_ids:
+                self._segments.append(
+                    _Segment.build(
+                        np.asarray(term_ids, dtype=np.int64),
+                        np.asarray(rows, dtype=np.int32),
+                        np.asarray(tfs, dtype=np.int32),
+                    )
+                )
+                self._maybe_merge()
+        return out_ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        return self.add_documents([Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)], ids)
+
+    def _maybe_merge(self) -> None:
+        """新段不小于前一段的一半时与之合并，段大小近似按 2 的幂递减。"""
+        segments = self._segments
+        while len(segments) > 1 and segments[-2].rows.size <= 2 * segments[-1].rows.size:
+            merged, dropped = _merge(segments[-2:], self._alive_mask())
+            segments[-2:] = [merged]
+            self._dead_postings -= dropped
+
+    def _delete_row(self, row: int) -> None:
+        self._alive[row] = 0
+        self._total_len -= self._doc_len[row]
+        self._live_postings -= self._doc_terms[row]
+        self._dead_postings += self._doc_terms[row]
+        self._docs[row] = None
+        if self._metadata_index is not None:
+            self._metadata_index.remove(row)
+
+    def delete(self, ids: Sequence[str] | None = None) -> bool | None:
+        if not ids:
+            return None
+        with self._lock:
+            for doc_id in ids:
+                row = self._row_of.pop(doc_id, None)
+                if row is not None:
+                    self._delete_row(row)
+            if self._dead_postings > self.compact_ratio * max(self._live_postings, 1):
+                self.compact()
+        return True
+
+    def compact(self) -> None:
+        """把全部段合并为一段并移除已删除的行；行号保持不变。"""
+        with self._lock:
+            if len(self._segments) > 1 or self._dead_postings:
+                if self._segments:
+                    merged, _ = _merge(self._segments, self._alive_mask())
+                    self._segments = [merged] if merged.rows.size else []
+                self._dead_postings = 0
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        with self._lock:
+            return [self._docs[self._row_of[i]] for i in ids if i in self._row_of]
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+    def _score(self, query: str, where: Where | None) -> tuple[np.ndarray, np.ndarray, list[Document | None]]:
+        """返回 (候选行号, BM25 分数, 文档快照)，只包含至少命中一个查询词的存活行。"""
+        terms = dict.fromkeys(self.tokenizer(query))
+        with self._lock:
+            size = len(self._docs)
+            n_docs = len(self._row_of)
+            docs = self._docs
+            if not n_docs or not terms:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), docs
+            term_ids = [self._vocab[t] for t in terms if t in self._vocab]
+            segments = list(self._segments)
+            alive = self._alive_mask()
+            doc_len = np.array(self._doc_len, dtype=np.float32)
+            avgdl = self._total_len / n_docs or 1.0
+            allowed = None
+            if where:
+                if self._metadata_index is None:
+                    raise ValueError("未配置 indexed_fields，无法使用 where 条件")
+                allowed = self._metadata_index.rows(where)
+
+        scores = np.zeros(size, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+        for term_id in term_ids:
+            parts = [p for p in (seg.postings(term_id) for seg in segments) if p is not None]
+            if not parts:
+                continue
+            rows = np.concatenate([p[0] for p in parts])
+            tfs = np.concatenate([p[1] for p in parts]).astype(np.float32)
+            live = alive[rows]
+            rows, tfs = rows[live], tfs[live]
+            if rows.size == 0:
+                continue
+            idf = math.log(1 + (n_docs - rows.size + 0.5) / (rows.size + 0.5))
+            # 同一词的倒排条目中行号不重复，可以直接按下标累加
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+
+        if allowed is not None:
+            mask = np.zeros(size, dtype=bool)
+            mask[allowed[allowed < size]] = True
+            scores[~mask] = 0
+        rows = np.flatnonzero(scores > 0)
+        return rows, scores[rows], docs
+
+    def search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        where: Where | None = None,
+        filter: DocFilter | None = None,  # noqa: A002
+    ) -> list[tuple[Document, float]]:
+        rows, scores, docs = self._score(query, where)
+        hits: list[tuple[Document, float]] = []
+        order = top_k_indices(scores, rows.size if filter is not None else min(k, rows.size))
+        for i in order:
+            doc = docs[rows[i]]
+            if doc is None or (filter is not None and not filter(doc)):
+                continue
+            hits.append((doc, float(scores[i])))
+            if len(hits) == k:
+                break
+        return hits
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        where: Where | None = None,
+        filter: DocFilter | None = None,  # noqa: A002
+    ) -> list[Document]:
+        return [doc for doc, _ in self.search_with_score(query, k, where, filter)]
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def save_local(self, folder: str | Path | None = None, fingerprint: str | None = None) -> Path:
+        """保存倒排数组、文档和参数（先合并为一段，只保存存活行的倒排条目）。"""
+        folder = Path(folder) if folder is not None else default_bm25_dir()
+        folder.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.compact()
+            if self._segments:
+                segment = self._segments[0]
+            else:
+                segment = _Segment.build(np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.int32))
+            meta = {
+                "k1": self.k1,
+                "b": self.b,
+                "indexed_fields": list(self._metadata_index.fields) if self._metadata_index else [],
+                "terms": list(self._vocab),
+                "docs": [
+                    None if doc is None else {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in self._docs
+                ],
+                "fingerprint": fingerprint,
+            }
+            np.savez(
+                folder / _NPZ_FILE,
+                **segment._asdict(),
+                doc_len=np.array(self._doc_len, dtype=np.int32),
+                alive=np.array(self._alive, dtype=np.int8),
+            )
+        (folder / _META_FILE).write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        return folder
+
+    @staticmethod
+    def read_fingerprint(folder: str | Path | None = None) -> str | None:
+        """读取已保存索引的语料指纹，不存在时返回 None。"""
+        meta_path = (Path(folder) if folder is not None else default_bm25_dir()) / _META_FILE
+        if not meta_path.exists():
+            return None
+        return json.loads(meta_path.read_text(encoding="utf-8")).get("fingerprint")
+
+    @classmethod
+    def load_local(cls, folder: str | Path | None = None, tokenizer: Tokenizer = cjk_tokenize) -> BM25Index:
+        """读回索引；tokenizer 须与建索引时一致。"""
+        folder = Path(folder) if folder is not None else default_bm25_dir()
+        meta = json.loads((folder / _META_FILE).read_text(encoding="utf-8"))
+        index = cls(k1=meta["k1"], b=meta["b"], tokenizer=tokenizer, indexed_fields=meta["indexed_fields"])
+        with np.load(folder / _NPZ_FILE) as data:
+            segment = _Segment(*(data[name] for name in _Segment._fields))
+            index._doc_len = array("i", data["doc_len"].astype(np.int32).tobytes())
+            index._alive = array("b", data["alive"].astype(np.int8).tobytes())
+        if segment.rows.size:
+            index._segments = [segment]
+        doc_terms = np.bincount(segment.rows, minlength=len(index._doc_len)).astype(np.int32)
+        index._doc_terms = array("i", doc_terms.tobytes())
+        index._live_postings = int(segment.rows.size)
+        index._vocab = {term: i for i, term in enumerate(meta["terms"])}
+        index._docs = [None if item is None else Document(**item) for item in meta["docs"]]
+        for row, doc in enumerate(index._docs):
+            if doc is None:
+                continue
+            index._row_of[doc.id] = row
+            index._total_len += index._doc_len[row]
+            if index._metadata_index is not None:
+                index._metadata_index.add(row, doc.metadata)
+        return index
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Document], **kwargs: Any) -> BM25Index:
+        index = cls(**kwargs)
+        index.add_documents(list(documents))
+        return index
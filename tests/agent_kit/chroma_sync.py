@@ -0,0 +1,61 @@
+"""
+Chroma 向量库的增量同步。
+
+每个片段的 id 由 (source, chunk_id, 内容哈希) 生成，内容不变则 id 不变。
+同步时只比对 id：新增/修改的片段 upsert，已删除的片段按 id 删除，
+其余片段原样保留，启动耗时与变更量成正比，而不是与语料规模成正比。
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Iterator
+
+from langchain_core.documents import Document
+from langchain_chroma import Chroma
+
+
+def stable_chunk_id(doc: Document) -> str:
+    """由来源、片段序号和内容哈希生成稳定 id。"""
+    content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+    raw = f"{doc.metadata.get('source', '')}\x1f{doc.metadata.get('chunk_id', '')}\x1f{content_hash}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def iter_collection_ids(vector_store: Chroma, page_size: int = 1000) -> Iterator[str]:
+    """分页列出集合中已有的 id，不取向量和正文。"""
+    offset = 0
+    while True:
+        page = vector_store.get(limit=page_size, offset=offset, include=[])["ids"]
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+
+def sync_documents(
+    vector_store: Chroma,
+    documents: list[Document],
+    batch_size: int = 256,
+) -> dict[str, int]:
+    """将集合同步为 documents 的内容，返回新增/删除/未变化的片段数。"""
+    desired: dict[str, Document] = {}
+    for doc in documents:
+        desired[stable_chunk_id(doc)] = doc
+
+    existing = set(iter_collection_ids(vector_store))
+    to_upsert = [doc_id for doc_id in desired if doc_id not in existing]
+    to_delete = [doc_id for doc_id in existing if doc_id not in desired]
+
+    # 先写入再删除，同步过程中集合不会出现空窗
+    for i in range(0, len(to_upsert), batch_size):
+        ids = to_upsert[i : i + batch_size]
+        vector_store.add_documents([desired[doc_id] for doc_id in ids], ids=ids)
+    for i in range(0, len(to_delete), batch_size):
+        vector_store.delete(ids=to_delete[i : i + batch_size])
+
+    return {
+        "upserted": len(to_upsert),
+        "deleted": len(to_delete),
+        "unchanged": len(desired) - len(to_upsert),
+    }
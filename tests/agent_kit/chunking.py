@@ -0,0 +1,343 @@
+"""
+统一的文本切分模块，替代各示例里各自实现的切分函数。
+
+支持四种策略：
+- blank：按空行切块（FAQ 问答文件，等价于原来的 split_on_blank）；
+- qa：按 "问题:" 行切块，导出文件缺少空行时也能正确分块；
+- sentence：按中英文句末标点切句，再把整句打包成不超过 chunk_size 个字符的块，
+  块与块之间重叠至少 overlap 个字符的整句，不会从句子中间切开；
+- window：固定 chunk_size 个字符的滑动窗口，相邻窗口重叠 overlap 个字符。
+
+输入是 UTF-8 字节缓冲区（bytes 或只读 mmap），切分结果是字节偏移 Span(start, end)，
+只有调用 Span.decode 时才复制出字符串。大文件用 open_text 以 mmap 打开，
+由操作系统按需调页，常驻内存与文件大小无关。
+空白与 str.isspace 一致：除 ASCII 空白外，全角空格（U+3000）、不换行空格等按其 UTF-8 编码匹配。
+其他与 ASCII 兼容的编码（如 gbk）的文件先转码为 UTF-8 再切分；UTF-16 等不兼容 ASCII 的编码不支持。
+
+sentence / window 需要按字符计长，按约 4MB、以换行结尾的段处理，
+每段用 NumPy 一次性定位 UTF-8 字符边界；块不跨段。
+"""
+
+from __future__ import annotations
+
+import codecs
+import mmap
+import re
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Literal, NamedTuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+Strategy = Literal["blank", "qa", "sentence", "window"]
+
+_WHITESPACE = b" \t\n\r\f\v"
+_SEGMENT_BYTES = 1 << 22
+
+# str.isspace 为真的全部字符（与 re 的 \s 相同）：单字节的直接比较，多字节的按 UTF-8 编码匹配
+_ASCII_SPACES = _WHITESPACE + b"\x1c\x1d\x1e\x1f"
+_UNICODE_SPACES = frozenset(
+    ch.encode("utf-8")
+    for ch in "\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+# 多字节空白编码的首字节与末字节，先比较单个字节，多数非空白字符不必切片
+_UNICODE_SPACE_LEADS = frozenset(seq[0] for seq in _UNICODE_SPACES)
+_UNICODE_SPACE_TAILS = frozenset(seq[-1] for seq in _UNICODE_SPACES)
+_SPACE = b"(?:[" + re.escape(_ASCII_SPACES) + b"]|" + b"|".join(map(re.escape, sorted(_UNICODE_SPACES))) + b")"
+
+# 与 split_on_blank 的 r"\n\s*\n"（str 上的 \s）一致
+_BLANK_LINES = re.compile(rb"\n" + _SPACE + rb"*\n")
+_QA_HEADER = re.compile("^[ \t]*(?:问题|Q)[:：]".encode(), re.MULTILINE)
+# 句末：中文句号/问号/叹号/分号/省略号、换行，以及后接空白的英文 .!?;
+_CJK_TERMINATORS = [t.encode() for t in "。！？；…"]
+_ASCII_TERMINATORS = np.frombuffer(b".!?;", dtype=np.uint8)
+_ASCII_WHITESPACE = np.frombuffer(_WHITESPACE, dtype=np.uint8)
+# 句末之后紧跟的右引号、右括号归入前一句
+_CLOSERS = [t.encode() for t in "”’」』）)\"'"]
+
+
+class Span(NamedTuple):
+    """缓冲区中的一段字节区间 [start, end)。"""
+
+    start: int
+    end: int
+
+    def decode(self, buf: Buffer, encoding: str = "utf-8") -> str:
+        return bytes(buf[self.start : self.end]).decode(encoding)
+
+
+@contextmanager
+def open_text(path: str | Path) -> Iterator[Buffer]:
+    """以只读 mmap 打开文件；空文件返回 b""（mmap 不支持长度为 0 的文件）。"""
+    with open(path, "rb") as f:
+        if Path(path).stat().st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _unicode_space_after(buf: Buffer, start: int, end: int) -> int:
+    """[start, end) 开头是多字节空白时返回其字节数，否则返回 0。"""
+    # UTF-8 是前缀码，2、3 字节的空白编码不会与其他字符的开头混淆
+    for n in (2, 3):
+        if start + n <= end and bytes(buf[start : start + n]) in _UNICODE_SPACES:
+            return n
+    return 0
+
+
+def _unicode_space_before(buf: Buffer, start: int, end: int) -> int:
+    """[start, end) 结尾是多字节空白时返回其字节数，否则返回 0。"""
+    # 空白编码以首字节开头，匹配到的后缀必然是一个完整字符
+    for n in (2, 3):
+        if end - n >= start and buf[end - n] in _UNICODE_SPACE_LEADS and bytes(buf[end - n : end]) in _UNICODE_SPACES:
+            return n
+    return 0
+
+
+def _trim(buf: Buffer, start: int, end: int) -> Span | None:
+    """去掉首尾空白（与 str.strip 一致）；全为空白时返回 None。"""
+    while start < end:
+        byte = buf[start]
+        if byte in _ASCII_SPACES:
+            start += 1
+        elif byte in _UNICODE_SPACE_LEADS and (n := _unicode_space_after(buf, start, end)):
+            start += n
+        else:
+            break
+    while end > start:
+        byte = buf[end - 1]
+        if byte in _ASCII_SPACES:
+            end -= 1
+        elif byte in _UNICODE_SPACE_TAILS and (n := _unicode_space_before(buf, start, end)):
+            end -= n
+        else:
+            break
+    return Span(start, end) if start < end else None
+
+
+def _split_at(buf: Buffer, cuts: Iterator[tuple[int, int]]) -> Iterator[Span]:
+    """cuts 产出分隔区间 (a, b)，返回各分隔区间之间去掉首尾空白的块。"""
+    pos = 0
+    for a, b in cuts:
+        span = _trim(buf, pos, a)
+        if span is not None:
+            yield span
+        pos = b
+    span = _trim(buf, pos, len(buf))
+    if span is not None:
+        yield span
+
+
+def blank_line_spans(buf: Buffer) -> Iterator[Span]:
+    """按空行切块。"""
+    return _split_at(buf, (m.span() for m in _BLANK_LINES.finditer(buf)))
+
+
+def qa_block_spans(buf: Buffer) -> Iterator[Span]:
+    """每个 "问题:"（或 "Q:"）行开始一个新块，第一个问题之前的内容单独成块。"""
+    return _split_at(buf, ((m.start(), m.start()) for m in _QA_HEADER.finditer(buf)))
+
+
+def _segments(buf: Buffer, segment_bytes: int) -> Iterator[tuple[int, int]]:
+    """把缓冲区切成约 segment_bytes 大小、以换行结尾的段。"""
+    n = len(buf)
+    start = 0
+    while start < n:
+        end = min(start + segment_bytes, n)
+        if end < n:
+            newline = buf.find(b"\n", end)
+            end = n if newline < 0 else newline + 1
+        yield start, end
+        start = end
+
+
+def _char_starts(buf: Buffer, start: int, end: int) -> np.ndarray:
+    """段内每个 UTF-8 字符的起始字节偏移（相对段首）。"""
+    data = np.frombuffer(buf, dtype=np.uint8, count=end - start, offset=start)
+    return np.flatnonzero((data & 0xC0) != 0x80)
+
+
+def _windows(char_starts: np.ndarray, seg_len: int, chunk_size: int, overlap: int) -> tuple[np.ndarray, np.ndarray]:
+    """在字符边界上生成滑动窗口，返回相对段首的 (起点, 终点) 数组。"""
+    n_chars = char_starts.size
+    if n_chars == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    step = chunk_size - overlap
+    first = np.arange(0, max(n_chars - overlap, 1), step)
+    # 与 simple_chunk_text 一致：窗口到达末尾后不再继续
+    last = np.append(char_starts, seg_len)
+    return last[first], last[np.minimum(first + chunk_size, n_chars)]
+
+
+def _find(data: np.ndarray, seq: bytes) -> np.ndarray:
+    """data 中 seq 出现的所有起始位置。"""
+    n = data.size - len(seq) + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    mask = data[:n] == seq[0]
+    for k in range(1, len(seq)):
+        mask &= data[k : k + n] == seq[k]
+    return np.flatnonzero(mask)
+
+
+def _sentence_bounds(data: np.ndarray) -> np.ndarray:
+    """用 NumPy 在整段字节上定位句末，返回有序的句子边界（含段首 0 与段尾）。"""
+    ends = [_find(data, t) + len(t) for t in _CJK_TERMINATORS]
+    ends.append(np.flatnonzero(data == ord("\n")) + 1)
+    if data.size > 1:
+        ascii_end = np.isin(data[:-1], _ASCII_TERMINATORS) & np.isin(data[1:], _ASCII_WHITESPACE)
+        ends.append(np.flatnonzero(ascii_end) + 1)
+    bounds = np.concatenate(ends)
+    for closer in _CLOSERS:
+        starts = np.zeros(data.size + 1, dtype=bool)
+        starts[_find(data, closer)] = True
+        bounds = np.where(starts[bounds], bounds + len(closer), bounds)
+    # 用位图排序去重，比 np.unique 快
+    mask = np.zeros(data.size + 1, dtype=bool)
+    mask[bounds] = True
+    mask[0] = mask[-1] = True
+    return np.flatnonzero(mask)
+
+
+def window_spans(
+    buf: Buffer,
+    chunk_size: int = 300,
+    overlap: int = 50,
+    segment_bytes: int = _SEGMENT_BYTES,
+) -> Iterator[Span]:
+    """固定 chunk_size 个字符的滑动窗口，相邻窗口重叠 overlap 个字符。"""
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap 必须在 [0, chunk_size) 范围内")
+    for seg_start, seg_end in _segments(buf, segment_bytes):
+        starts, ends = _windows(_char_starts(buf, seg_start, seg_end), seg_end - seg_start, chunk_size, overlap)
+        for s, e in zip((starts + seg_start).tolist(), (ends + seg_start).tolist()):
+            yield Span(s, e)
+
+
+def sentence_spans(
+    buf: Buffer,
+    chunk_size: int = 300,
+    overlap: int = 50,
+    segment_bytes: int = _SEGMENT_BYTES,
+) -> Iterator[Span]:
+    """按句切分后把整句打包成不超过 chunk_size 个字符的块；超长的单句退化为滑动窗口。"""
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap 必须在 [0, chunk_size) 范围内")
+    for seg_start, seg_end in _segments(buf, segment_bytes):
+        seg_len = seg_end - seg_start
+        char_starts = _char_starts(buf, seg_start, seg_end)
+        # 句子边界（相对段首的字节偏移），首尾为段的两端
+        data = np.frombuffer(buf, dtype=np.uint8, count=seg_len, offset=seg_start)
+        bounds = _sentence_bounds(data)
+        # 每个边界之前的字符数；逐块贪心打包在 Python 列表上用 bisect，比逐次调用 NumPy 快
+        chars = np.searchsorted(char_starts, bounds).tolist()
+        byte_bounds = bounds.tolist()
+        i, last = 0, len(byte_bounds) - 1
+        while i < last:
+            j = bisect_right(chars, chars[i] + chunk_size) - 1
+            if j <= i:
+                # 单句超过 chunk_size：在这一句内部按窗口切分
+                lo, hi = chars[i], chars[i + 1]
+                sentence_start, sentence_end = byte_bounds[i], byte_bounds[i + 1]
+                starts, ends = _windows(
+                    char_starts[lo:hi] - sentence_start, sentence_end - sentence_start, chunk_size, overlap
+                )
+                offset = seg_start + sentence_start
+                for s, e in zip((starts + offset).tolist(), (ends + offset).tolist()):
+                    span = _trim(buf, s, e)
+                    if span is not None:
+                        yield span
+                i += 1
+                continue
+            span = _trim(buf, seg_start + byte_bounds[i], seg_start + byte_bounds[j])
+            if span is not None:
+                yield span
+            if j == last:
+                break
+            # 下一块从距本块末尾不超过 overlap 个字符的句首开始
+            i = max(bisect_left(chars, chars[j] - overlap), i + 1)
+
+
+STRATEGIES: dict[str, Callable[..., Iterator[Span]]] = {
+    "blank": blank_line_spans,
+    "qa": qa_block_spans,
+    "sentence": sentence_spans,
+    "window": window_spans,
+}
+
+
+def iter_spans(buf: Buffer, strategy: Strategy = "blank", **kwargs) -> Iterator[Span]:
+    try:
+        split = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"不支持的切分策略：{strategy}") from None
+    return split(buf, **kwargs)
+
+
+_ASCII_SAMPLE = bytes(range(0x80))
+
+
+def check_encoding(encoding: str) -> str:
+    """返回规范化的编码名。切分在字节上进行，只接受 ASCII 字节按 ASCII 解码的编码。"""
+    name = codecs.lookup(encoding).name
+    try:
+        compatible = _ASCII_SAMPLE.decode(name) == _ASCII_SAMPLE.decode("ascii")
+    except UnicodeDecodeError:
+        compatible = False
+    if not compatible:
+        raise ValueError(f"不支持与 ASCII 不兼容的编码：{encoding}")
+    return name
+
+
+def iter_file_chunks(
+    path: str | Path,
+    strategy: Strategy = "blank",
+    encoding: str = "utf-8",
+    **kwargs,
+) -> Iterator[str]:
+    """以 mmap 打开文件并逐块产出字符串，内存中只保留当前块。
+
+    UTF-8 / ASCII 以外的编码先整体转码为 UTF-8，不再使用 mmap。
+    """
+    if check_encoding(encoding) not in ("utf-8", "ascii"):
+        buf = Path(path).read_text(encoding=encoding).encode("utf-8")
+        for span in iter_spans(buf, strategy, **kwargs):
+            yield span.decode(buf)
+        return
+    with open_text(path) as buf:
+        for span in iter_spans(buf, strategy, **kwargs):
+            yield span.decode(buf, encoding)
+
+
+def split_text(text: str, strategy: Strategy = "blank", **kwargs) -> list[str]:
+    """切分内存中的字符串。"""
+    buf = text.encode("utf-8")
+    return [span.decode(buf) for span in iter_spans(buf, strategy, **kwargs)]
+
+
+def split_documents(
+    documents: list[Document],
+    strategy: Strategy = "sentence",
+    add_start_index: bool = False,
+    **kwargs,
+) -> list[Document]:
+    """切分 Document 列表，保留原 metadata；add_start_index=True 时记录块在原文中的字符下标。"""
+    out: list[Document] = []
+    for doc in documents:
+        buf = doc.page_content.encode("utf-8")
+        # 块的起点单调不减，字节偏移换算成字符下标只需增量解码
+        pos = chars = 0
+        for span in iter_spans(buf, strategy, **kwargs):
+            metadata = dict(doc.metadata)
+            if add_start_index:
+                chars += len(buf[pos : span.start].decode("utf-8"))
+                pos = span.start
+                metadata["start_index"] = chars
+            out.append(Document(page_content=span.decode(buf), metadata=metadata))
+    return out
@@ -0,0 +1,245 @@
+"""
+入库前的近似重复片段合并（MinHash + LSH）。
+
+FAQ 导出文件里常有同一个问题的多个权限版本、只差几个字的答案，
+逐条嵌入既浪费 Embedding 调用，也会在 top-k 里占掉多个名额。
+
+- 签名：文本做 NFKC、小写、去空白后切成字符 n-gram，
+  用 num_perm 组乘移位哈希取最小值得到 MinHash 签名，签名逐位相等的比例即 Jaccard 相似度的估计；
+- 候选：签名分成 bands 段，任一段完全相同的片段互为候选，只与候选比较，不做两两比较；
+- 合并：每个片段并入相似度不低于 threshold 的已有组（只与组代表比较，避免链式漂移），
+  否则自成一组。partition_fields 中的字段（默认 permissions）取值不同的片段从不合并：
+  同一问题给不同权限组的答案往往只差几个字（如“弹性打卡” / “固定时间打卡”），合并后权限取并集，
+  过滤就无法区分各版本。
+
+每组只保留一条代表文档入库（一次嵌入、一行索引），metadata["variants"] 记录组内每条原始片段；
+merge_fields 中的字段取组内并集，元数据索引按任一版本可见。
+检索命中后用 expand_variants 按 where 条件与过滤函数逐个检查展开后的版本。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .metadata_index import Where, matches_where, metadata_values
+
+
+VARIANTS_KEY = "variants"
+
+_WHITESPACE = re.compile(r"\s+")
+_MERSENNE_61 = (1 << 61) - 1
+# 计算签名时每次处理的 n-gram 数，限制 [num_perm, n-gram] 临时矩阵的大小
+_SHINGLE_BLOCK = 4096
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def shingle_hashes(text: str, ngram: int = 3) -> np.ndarray:
+    """文本的字符 n-gram 的 64 位哈希（去重），比 n 短的文本整体作为一个 n-gram。"""
+    codes = np.frombuffer(_normalize(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if codes.size == 0:
+        return np.empty(0, dtype=np.uint64)
+    n = min(ngram, codes.size)
+    m = codes.size - n + 1
+    # 多项式滚动哈希后做一次 splitmix64 末端混合，uint64 溢出即取模 2^64
+    h = np.zeros(m, dtype=np.uint64)
+    for k in range(n):
+        h = h * np.uint64(1_000_003) + codes[k : k + m]
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return np.unique(h)
+
+
+class MinHasher:
+    """生成固定长度的 MinHash 签名；同样的参数与种子得到同样的签名。"""
+
+    def __init__(self, num_perm: int = 128, ngram: int = 3, seed: int = 1):
+        if num_perm < 1 or ngram < 1:
+            raise ValueError("num_perm 与 ngram 必须大于 0")
+        self.num_perm = num_perm
+        self.ngram = ngram
+        rng = np.random.default_rng(seed)
+        # 乘移位哈希 (a·x + b) >> 32，a 取奇数
+        self._a = rng.integers(1, _MERSENNE_61, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, _MERSENNE_61, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.ngram)
+        sig = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        for start in range(0, hashes.size, _SHINGLE_BLOCK):
+            block = hashes[start : start + _SHINGLE_BLOCK]
+            permuted = (self._a[:, None] * block[None, :] + self._b[:, None]) >> np.uint64(32)
+            np.minimum(sig, permuted.min(axis=1).astype(np.uint32), out=sig)
+        return sig
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            out[i] = self.signature(text)
+        return out
+
+
+def choose_bands(num_perm: int, threshold: float) -> int:
+    """选 bands，使 LSH 的候选阈值 (1/bands)^(1/rows) 不高于 threshold 且尽量接近。
+
+    候选阈值偏低只会多比较几次签名，偏高则会漏掉相似片段。
+    """
+    best, best_gap = num_perm, math.inf
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        gap = threshold - (1 / bands) ** (1 / rows)
+        if 0 <= gap < best_gap:
+            best, best_gap = bands, gap
+    return best
+
+
+@dataclass
+class DedupStats:
+    documents: int = 0
+    unique: int = 0
+    # 含两条及以上片段的组数
+    merged_groups: int = 0
+
+    @property
+    def saved_embeddings(self) -> int:
+        """少嵌入的文本条数。"""
+        return self.documents - self.unique
+
+    @property
+    def saved_rows(self) -> int:
+        """向量库与关键词索引中少写入的行数。"""
+        return self.documents - self.unique
+
+    def saved_calls(self, batch_size: int) -> int:
+        """按 batch_size 条一批计算，少发起的 Embedding 请求数。"""
+        return math.ceil(self.documents / batch_size) - math.ceil(self.unique / batch_size)
+
+    def report(self, batch_size: int = 64) -> str:
+        return (
+            f"近似去重：{self.documents} 个片段合并为 {self.unique} 个（{self.merged_groups} 组近似重复），"
+            f"少嵌入 {self.saved_embeddings} 条文本（约 {self.saved_calls(batch_size)} 次请求），"
+            f"少写入 {self.saved_rows} 行索引"
+        )
+
+
+@dataclass
+class DedupResult:
+    documents: list[Document]
+    # groups[i] 为第 i 条代表文档对应的原始片段下标
+    groups: list[list[int]]
+    stats: DedupStats = field(default_factory=DedupStats)
+
+
+def _merge_field(metadatas: Sequence[dict[str, Any]], name: str) -> list[str | None]:
+    """字段取值的并集；某个版本该字段为空时加入 None，保持其公开可见。"""
+    merged: dict[str | None, None] = {}
+    for metadata in metadatas:
+        for value in metadata_values(metadata.get(name)) or [None]:
+            merged.setdefault(value)
+    return list(merged)
+
+
+def _partition_key(metadata: dict[str, Any], fields: Sequence[str]) -> tuple[frozenset[str | None], ...]:
+    return tuple(frozenset(metadata_values(metadata.get(name)) or [None]) for name in fields)
+
+
+def dedup_documents(
+    documents: Sequence[Document],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    ngram: int = 3,
+    bands: int | None = None,
+    merge_fields: Sequence[str] = ("permissions",),
+    seed: int = 1,
+    partition_fields: Sequence[str] = ("permissions",),
+) -> DedupResult:
+    """合并 page_content 近似重复（估计 Jaccard ≥ threshold）且 partition_fields 取值相同的文档，代表文档保持原有顺序。"""
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold 必须在 (0, 1] 范围内")
+    bands = bands or choose_bands(num_perm, threshold)
+    if num_perm % bands:
+        raise ValueError(f"num_perm={num_perm} 不能被 bands={bands} 整除")
+    rows = num_perm // bands
+
+    signatures = MinHasher(num_perm, ngram, seed).signatures([doc.page_content for doc in documents])
+    # (分区, 段号, 段内签名) -> 该段相同的组号；分区不同的片段不会成为候选
+    buckets: dict[tuple[Any, int, bytes], list[int]] = {}
+    groups: list[list[int]] = []
+    for i, sig in enumerate(signatures):
+        partition = _partition_key(documents[i].metadata, partition_fields)
+        keys = [(partition, band, sig[band * rows : (band + 1) * rows].tobytes()) for band in range(bands)]
+        candidates = sorted({g for key in keys for g in buckets.get(key, ())})
+        if candidates:
+            reps = signatures[[groups[g][0] for g in candidates]]
+            similarity = (reps == sig).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= threshold:
+                groups[candidates[best]].append(i)
+                continue
+        for key in keys:
+            buckets.setdefault(key, []).append(len(groups))
+        groups.append([i])
+
+    out: list[Document] = []
+    for members in groups:
+        first = documents[members[0]]
+        if len(members) == 1:
+            out.append(first)
+            continue
+        variants = [
+            {"id": documents[j].id, "page_content": documents[j].page_content, "metadata": dict(documents[j].metadata)}
+            for j in members
+        ]
+        metadata = dict(first.metadata)
+        for name in merge_fields:
+            metadata[name] = _merge_field([v["metadata"] for v in variants], name)
+        metadata[VARIANTS_KEY] = variants
+        out.append(Document(id=first.id, page_content=first.page_content, metadata=metadata))
+
+    stats = DedupStats(
+        documents=len(documents),
+        unique=len(groups),
+        merged_groups=sum(1 for members in groups if len(members) > 1),
+    )
+    return DedupResult(out, groups, stats)
+
+
+def expand_variants(
+    hits: Sequence[tuple[Document, float]],
+    where: Where | None = None,
+    filter: Callable[[Document], bool] | None = None,  # noqa: A002
+) -> list[tuple[Document, float]]:
+    """把命中的代表文档展开成满足 where 条件与 filter 的原始版本，分数沿用代表文档的分数。
+
+    代表文档的 merge_fields 是各版本的并集，向量库按它过滤放行后，每个版本仍要单独检查。
+    """
+    out: list[tuple[Document, float]] = []
+    for doc, score in hits:
+        variants = doc.metadata.get(VARIANTS_KEY)
+        if not variants:
+            out.append((doc, score))
+            continue
+        for i, variant in enumerate(variants):
+            if where and not matches_where(variant["metadata"], where):
+                continue
+            # 原始片段没有 id 时以 代表 id#序号 区分，同一次结果中各版本 id 不重复
+            doc_id = variant.get("id") or (f"{doc.id}#{i}" if doc.id is not None else None)
+            expanded = Document(id=doc_id, page_content=variant["page_content"], metadata=variant["metadata"])
+            if filter is not None and not filter(expanded):
+                continue
+            out.append((expanded, score))
+    return out
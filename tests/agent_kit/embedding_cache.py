@@ -0,0 +1,166 @@
+"""
+基于 SQLite 的持久化 Embedding 缓存。
+
+键为 sha256(model, dimensions, text)，向量以 float32 二进制存储。
+批量嵌入时先整批查库，只把未命中的文本（同批内去重后）交给底层模型，
+语料未变化时重启不会产生任何 Embedding 调用。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+from .embeddings import DeadLetter, EmbeddingBatchError
+from .query_cache import embed_queries
+
+
+# SQLite 单条语句的参数个数有上限，分段查询
+_LOOKUP_CHUNK = 500
+
+
+def cache_key(model: str, dimensions: int | None, text: str) -> str:
+    """由模型、维度和文本生成缓存键。"""
+    raw = f"{model}\x1f{dimensions}\x1f{text}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class SQLiteEmbeddingCache:
+    """键值形式的向量存储，线程安全。"""
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path or os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for i in range(0, len(unique), _LOOKUP_CHUNK):
+                part = unique[i : i + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    part,
+                )
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+
+    def set_many(self, items: dict[str, list[float]]) -> None:
+        if not items:
+            return
+        rows = [(key, array("f", vector).tobytes()) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """在任意 Embeddings 外包一层持久化缓存，查询向量不做缓存。"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: SQLiteEmbeddingCache | None = None,
+    ):
+        self.embeddings = embeddings
+        self.cache = cache or SQLiteEmbeddingCache()
+        self.model = getattr(embeddings, "model", embeddings.__class__.__name__)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+        self.hits = 0
+        self.misses = 0
+
+    def _plan(self, texts: list[str]) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        """返回 (每个文本的键, 已命中的向量, 需要嵌入的 键->文本，已去重)。"""
+        keys = [cache_key(self.model, self.dimensions, text) for text in texts]
+        found = self.cache.get_many(keys)
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += len(missing)
+        return keys, found, missing
+
+    def _merge(
+        self,
+        keys: list[str],
+        found: dict[str, list[float]],
+        missing: dict[str, str],
+        vectors: list[list[float]],
+    ) -> list[list[float]]:
+        fresh = dict(zip(missing, vectors))
+        self.cache.set_many(fresh)
+        found.update(fresh)
+        return [found[key] for key in keys]
+
+    def _partial(
+        self,
+        keys: list[str],
+        found: dict[str, list[float]],
+        missing: dict[str, str],
+        error: EmbeddingBatchError,
+    ) -> EmbeddingBatchError:
+        """底层部分失败时缓存成功的向量，并把失败位置换算回本次调用的输入下标。"""
+        fresh = {key: vector for key, vector in zip(missing, error.vectors) if vector is not None}
+        self.cache.set_many(fresh)
+        found.update(fresh)
+        missing_keys = list(missing)
+        failed = {missing_keys[f.index]: f for f in error.failures}
+        failures = [
+            DeadLetter(i, failed[key].text, failed[key].error, failed[key].attempts)
+            for i, key in enumerate(keys)
+            if key in failed
+        ]
+        return EmbeddingBatchError([found.get(key) for key in keys], failures)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._plan(texts)
+        try:
+            vectors = self.embeddings.embed_documents(list(missing.values())) if missing else []
+        except EmbeddingBatchError as e:
+            raise self._partial(keys, found, missing, e) from e
+        return self._merge(keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._plan(texts)
+        try:
+            vectors = await self.embeddings.aembed_documents(list(missing.values())) if missing else []
+        except EmbeddingBatchError as e:
+            raise self._partial(keys, found, missing, e) from e
+        return self._merge(keys, found, missing, vectors)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        # 查询向量不落盘，直接透传
+        return embed_queries(self.embeddings, texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
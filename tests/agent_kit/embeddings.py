@@ -0,0 +1,284 @@
+"""
+DashScope 兼容的 Embeddings 封装（各 RAG 示例共用）。
+
+`embed_documents` 不再逐批串行请求，而是把批次交给后台事件循环，
+由异步客户端同时保持 `max_concurrency` 个批次在途，结果按输入顺序返回。
+同步与异步调用共用同一个后台循环和同一个连接池，连接可以复用。
+
+每次请求先经过限流器（每分钟请求数 / token 数，见 rate_limit），失败时：
+- 429、5xx、超时与连接错误：带抖动的指数退避后重试，429 同时让所有请求暂停并降速；
+- 批次或单条输入过大：批次对半拆分后分别重试；
+- 重试用尽或输入本身无效：记入 dead_letters，其余文本照常返回，
+  最后抛出 EmbeddingBatchError 交给调用方处理，不会用零向量顶替写进索引；
+- 鉴权失败等配置错误：直接抛出。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Coroutine, Literal, TypeVar
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+from .http_clients import get_client_factory
+from .rate_limit import RateLimiter, RetryPolicy, estimate_tokens
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+
+
+# 加载模型配置
+_ = load_dotenv()
+
+T = TypeVar("T")
+
+
+class _BackgroundLoop:
+    """常驻后台线程的事件循环，异步客户端及其连接池绑定在该循环上。"""
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever,
+                    name="embeddings-loop",
+                    daemon=True,
+                )
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro: Coroutine[object, object, T]) -> Future[T]:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+
+_background_loop = _BackgroundLoop()
+
+# 服务端报 "批次/输入过大" 时错误信息中常见的片段
+_OVERSIZE_HINTS = ("batch size", "input length", "too long", "too large", "larger than", "exceed", "maximum")
+
+ErrorAction = Literal["retry", "split", "fail", "raise"]
+
+
+@dataclass
+class DeadLetter:
+    """最终没能嵌入的一条文本。index 为其在本次调用输入中的下标。"""
+
+    index: int
+    text: str
+    error: str
+    attempts: int
+
+
+class EmbeddingBatchError(RuntimeError):
+    """部分文本嵌入失败。vectors 与输入一一对应，失败的位置为 None。"""
+
+    def __init__(self, vectors: list[list[float] | None], failures: list[DeadLetter]):
+        super().__init__(f"{len(failures)}/{len(vectors)} 条文本嵌入失败：{failures[0].error}")
+        self.vectors = vectors
+        self.failures = failures
+
+
+def classify_error(exc: BaseException) -> ErrorAction:
+    """决定一次失败请求的处理方式。"""
+    # openai 导入较慢，到第一次请求时才导入
+    import openai
+
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError)):
+        return "retry"
+    if isinstance(exc, (openai.AuthenticationError, openai.PermissionDeniedError, openai.NotFoundError)):
+        return "raise"
+    if isinstance(exc, openai.APIStatusError):
+        if exc.status_code >= 500 or exc.status_code in (408, 409):
+            return "retry"
+        message = str(exc).lower()
+        if exc.status_code == 413 or any(hint in message for hint in _OVERSIZE_HINTS):
+            return "split"
+        return "fail"
+    return "raise"
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """读取响应头中的 Retry-After（秒）。"""
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _env_float(name: str) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+class DashScopeEmbeddings(Embeddings):
+    """DashScope 兼容的 Embeddings 封装。
+
+    requests_per_minute / tokens_per_minute 默认读取 EMBEDDING_RPM / EMBEDDING_TPM，未配置则不限流。
+    http_client 默认使用进程内共享的连接池（http_clients.get_client_factory）。
+    """
+
+    def __init__(
+        self,
+        model: str = "text-embedding-v4",
+        dimensions: int = 1024,
+        batch_size: int = 10,
+        max_concurrency: int = 8,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        retry_policy: RetryPolicy | None = None,
+        http_client: httpx.AsyncClient | None = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size 必须大于 0")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency 必须大于 0")
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.api_key = api_key or os.getenv("DASHSCOPE_API_KEY")
+        self.base_url = base_url or os.getenv("DASHSCOPE_BASE_URL")
+        self.limiter = RateLimiter(
+            requests_per_minute or _env_float("EMBEDDING_RPM"),
+            tokens_per_minute or _env_float("EMBEDDING_TPM"),
+        )
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.http_client = http_client
+        # 历次调用中最终失败的文本，供排查或补录
+        self.dead_letters: list[DeadLetter] = []
+        self.retries = 0
+        self.splits = 0
+        self._async_client: AsyncOpenAI | None = None
+
+    def _get_async_client(self) -> AsyncOpenAI:
+        # 只在后台循环线程中调用，无需加锁；重试由本类统一处理，关闭客户端自带的重试
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=self.http_client or get_client_factory().async_client,
+            )
+        return self._async_client
+
+    async def _embed_batch(self, batch: list[str]) -> list[list[float]]:
+        response = await self._get_async_client().embeddings.create(
+            model=self.model,
+            input=batch,
+            dimensions=self.dimensions,
+        )
+        # 按返回的 index 排序，保证与输入一一对应
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def _embed_with_retry(
+        self,
+        batch: list[str],
+        offset: int,
+        failures: list[DeadLetter],
+    ) -> list[list[float] | None]:
+        """限流、退避重试、过大时拆分；最终失败的文本记入 failures，对应位置返回 None。"""
+        tokens = sum(estimate_tokens(text) for text in batch)
+        attempt = 0
+        while True:
+            await self.limiter.acquire(tokens)
+            try:
+                vectors = await self._embed_batch(batch)
+            except Exception as exc:
+                action = classify_error(exc)
+                if action == "raise":
+                    raise
+                if action == "split" and len(batch) > 1:
+                    self.splits += 1
+                    mid = len(batch) // 2
+                    left, right = await asyncio.gather(
+                        self._embed_with_retry(batch[:mid], offset, failures),
+                        self._embed_with_retry(batch[mid:], offset + mid, failures),
+                    )
+                    return left + right
+                if action == "retry" and attempt < self.retry_policy.max_retries:
+                    delay = self.retry_policy.delay(attempt, retry_after_seconds(exc))
+                    if getattr(exc, "status_code", None) == 429:
+                        self.limiter.throttle(delay)
+                    self.retries += 1
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+                error = f"{type(exc).__name__}: {exc}"
+                failures.extend(DeadLetter(offset + i, text, error, attempt + 1) for i, text in enumerate(batch))
+                return [None] * len(batch)
+            self.limiter.reward()
+            return vectors
+
+    async def _embed_all(self, texts: list[str]) -> list[list[float]]:
+        """在后台循环中运行：固定数量的 worker 依次领取批次。"""
+        batches = [texts[i : i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results: list[list[list[float] | None] | None] = [None] * len(batches)
+        failures: list[DeadLetter] = []
+        pending = iter(range(len(batches)))
+
+        async def worker() -> None:
+            for idx in pending:
+                results[idx] = await self._embed_with_retry(batches[idx], idx * self.batch_size, failures)
+
+        workers = [
+            asyncio.ensure_future(worker())
+            for _ in range(min(self.max_concurrency, len(batches)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+
+        vectors: list[list[float] | None] = []
+        for batch_vectors in results:
+            vectors.extend(batch_vectors or [])
+        if failures:
+            failures.sort(key=lambda f: f.index)
+            self.dead_letters.extend(failures)
+            raise EmbeddingBatchError(vectors, failures)
+        return vectors
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        future = _background_loop.submit(self._embed_all(list(texts)))
+        return await asyncio.wrap_future(future)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        # 同步入口同样走后台循环，build_vector_store 无需改动即可并发
+        if not texts:
+            return []
+        return _background_loop.submit(self._embed_all(list(texts))).result()
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """多条查询合并请求（每批最多 batch_size 条）。"""
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        future = _background_loop.submit(self._embed_all([text]))
+        return (await asyncio.wrap_future(future))[0]
+
+    def embed_query(self, text: str) -> list[float]:
+        # 与文档嵌入共用限流与重试
+        return _background_loop.submit(self._embed_all([text])).result()[0]
+
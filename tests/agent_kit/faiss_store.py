@@ -0,0 +1,536 @@
+"""
+基于 FAISS 的近似最近邻向量库，支持持久化到 FAISS_DB_DIR。
+
+支持三种索引：
+- flat：精确检索（内积，向量已归一化即余弦相似度）；
+- ivf：倒排聚类，nprobe 越大召回越高、越慢。聚类中心要用足够多的向量训练，
+  写入的向量先缓存，到第一次检索 / 保存（或指定 nlist 时攒够 39 * nlist 条）再训练并写入索引；
+- hnsw：图索引，ef_search 越大召回越高、越慢。
+
+删除与覆盖只给旧行打墓碑，检索时按墓碑比例多取候选；墓碑超过 compact_ratio 时自动 compact()，
+用存活的向量重建索引（IVF 沿用已训练的聚类中心）。
+
+索引保存为 index.faiss，文档保存为 docstore.json，参数保存为 meta.json。
+measure_recall 以精确检索为基准报告 recall@k 和查询耗时，用于权衡召回与延迟。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, Literal, Sequence
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .matrix_store import cosine_relevance, normalize_rows
+from .metadata_index import Where, matches_where
+from .query_cache import embed_queries
+
+
+IndexType = Literal["flat", "ivf", "hnsw"]
+DocFilter = Callable[[Document], bool]
+
+_INDEX_FILE = "index.faiss"
+_DOCSTORE_FILE = "docstore.json"
+_META_FILE = "meta.json"
+# FAISS 对每个聚类中心至少需要的训练样本数，少于此数时聚类退化（并打印警告）
+_MIN_POINTS_PER_CENTROID = 39
+
+
+def default_faiss_dir(name: str = "default") -> Path:
+    """FAISS_DB_DIR 下以 name 命名的子目录。"""
+    return Path(os.getenv("FAISS_DB_DIR", "./faiss_db")) / name
+
+
+class FaissVectorStore(VectorStore):
+    """FAISS 向量库，行号即 FAISS 中的向量 id。"""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        index_type: IndexType = "hnsw",
+        nlist: int | None = None,
+        nprobe: int = 8,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        compact_ratio: float | None = 0.2,
+    ):
+        if index_type not in ("flat", "ivf", "hnsw"):
+            raise ValueError(f"不支持的索引类型: {index_type}")
+        if compact_ratio is not None and not 0 < compact_ratio < 1:
+            raise ValueError("compact_ratio 必须在 (0, 1) 之间")
+        self._embedding = embedding
+        self.index_type = index_type
+        self.nlist = nlist
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self._nprobe = nprobe
+        self._ef_search = ef_search
+        # 墓碑行占比超过该值时自动重建索引，None 表示只在手动调用 compact() 时重建
+        self.compact_ratio = compact_ratio
+        self.compactions = 0
+        self._index: faiss.Index | None = None
+        self._docs: list[Document] = []
+        self._row_of: dict[str, int] = {}
+        # FAISS 的 HNSW 不支持按 id 删除，统一用墓碑标记
+        self._deleted: set[int] = set()
+        # IVF 训练前缓存的向量（按写入顺序，与 _docs 的行号对应）
+        self._pending: list[np.ndarray] = []
+        self._pending_rows = 0
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._docs) - len(self._deleted)
+
+    # ------------------------------------------------------------------
+    # 检索参数
+    # ------------------------------------------------------------------
+    @property
+    def nprobe(self) -> int:
+        return self._nprobe
+
+    @nprobe.setter
+    def nprobe(self, value: int) -> None:
+        self._nprobe = value
+        if self._index is not None and self.index_type == "ivf":
+            faiss.extract_index_ivf(self._index).nprobe = value
+
+    @property
+    def ef_search(self) -> int:
+        return self._ef_search
+
+    @ef_search.setter
+    def ef_search(self, value: int) -> None:
+        self._ef_search = value
+        if self._index is not None and self.index_type == "hnsw":
+            self._index.hnsw.efSearch = value
+
+    # ------------------------------------------------------------------
+    # 建索引 / 写入
+    # ------------------------------------------------------------------
+    def _create_index(self, vectors: np.ndarray) -> faiss.Index:
+        dim = vectors.shape[1]
+        if self.index_type == "flat":
+            return faiss.IndexFlatIP(dim)
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+            index.hnsw.efSearch = self._ef_search
+            return index
+        # IVF 需要先训练；聚类数默认取 4*sqrt(n)，且每个聚类中心至少有 39 个训练样本
+        nlist = self.nlist or max(1, int(4 * math.sqrt(len(vectors))))
+        nlist = max(1, min(nlist, len(vectors) // _MIN_POINTS_PER_CENTROID))
+        self.nlist = nlist
+        index = faiss.index_factory(dim, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = self._nprobe
+        # 支持 reconstruct，用于精确检索对比
+        index.make_direct_map()
+        return index
+
+    def add_vectors(
+        self,
+        vectors: Sequence[Sequence[float]] | np.ndarray,
+        documents: Sequence[Document],
+        ids: Sequence[str | None] | None = None,
+    ) -> list[str]:
+        """写入已算好的向量。IVF 索引训练前向量先缓存，见 _train_pending。"""
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError(f"ids 与 documents 数量不一致：{len(ids)} != {len(documents)}")
+        if not documents:
+            return []
+        matrix = np.ascontiguousarray(normalize_rows(np.asarray(vectors, dtype=np.float32)))
+        id_iter = iter(ids) if ids is not None else iter(doc.id for doc in documents)
+        out_ids: list[str] = []
+        with self._lock:
+            # 已存在的 id 视为覆盖：旧行打墓碑，新行追加
+            for doc in documents:
+                doc_id = next(id_iter) or str(uuid.uuid4())
+                old = self._row_of.get(doc_id)
+                if old is not None:
+                    self._deleted.add(old)
+                self._row_of[doc_id] = len(self._docs)
+                self._docs.append(Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata))
+                out_ids.append(doc_id)
+            if self._index is None and self.index_type == "ivf":
+                self._pending.append(matrix)
+                self._pending_rows += len(matrix)
+                if self.nlist and self._pending_rows >= _MIN_POINTS_PER_CENTROID * self.nlist:
+                    self._train_pending()
+            else:
+                if self._index is None:
+                    self._index = self._create_index(matrix)
+                self._index.add(matrix)
+            self._maybe_compact()
+        return out_ids
+
+    def _train_pending(self) -> None:
+        """用缓存的全部向量训练 IVF 索引，再把它们写入索引。调用方需持有锁。"""
+        if self._index is not None or not self._pending:
+            return
+        matrix = np.ascontiguousarray(np.concatenate(self._pending))
+        index = self._create_index(matrix)
+        index.add(matrix)
+        self._index = index
+        self._pending = []
+        self._pending_rows = 0
+
+    def _maybe_compact(self) -> None:
+        """墓碑比例超过 compact_ratio 时重建。调用方需持有锁。"""
+        if self.compact_ratio is not None and len(self._deleted) > self.compact_ratio * len(self._docs):
+            self.compact()
+
+    def compact(self) -> int:
+        """丢弃墓碑行，用存活的向量重建索引并重新编号行号，返回丢弃的行数。
+
+        重建生成新的索引对象与文档列表，进行中的检索继续使用各自的快照。
+        """
+        with self._lock:
+            if not self._deleted:
+                return 0
+            live = np.asarray([row for row in range(len(self._docs)) if row not in self._deleted], dtype=np.int64)
+            if self._index is None:
+                # IVF 尚未训练：只过滤缓存的向量
+                if self._pending:
+                    self._pending = [np.concatenate(self._pending)[live]]
+                    self._pending_rows = len(live)
+            else:
+                vectors = np.ascontiguousarray(self._index.reconstruct_n(0, self._index.ntotal)[live])
+                if self.index_type == "ivf":
+                    # 聚类中心不变，复制已训练的索引后清空重新写入
+                    index = faiss.clone_index(self._index)
+                    index.reset()
+                else:
+                    index = self._create_index(vectors)
+                index.add(vectors)
+                self._index = index
+            removed = len(self._docs) - len(live)
+            self._docs = [self._docs[row] for row in live]
+            self._row_of = {doc.id: row for row, doc in enumerate(self._docs)}
+            self._deleted = set()
+            self.compactions += 1
+            return removed
+
+    def build_index(self) -> None:
+        """立即训练并写入缓存的 IVF 向量；检索、保存、评估前会自动调用。"""
+        with self._lock:
+            self._train_pending()
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return self.add_documents(documents, ids=ids)
+
+    def add_documents(self, documents: list[Document], ids: list[str] | None = None, **kwargs: Any) -> list[str]:
+        vectors = self._embedding.embed_documents([doc.page_content for doc in documents])
+        return self.add_vectors(vectors, documents, ids)
+
+    async def aadd_documents(
+        self, documents: list[Document], ids: list[str] | None = None, **kwargs: Any
+    ) -> list[str]:
+        vectors = await self._embedding.aembed_documents([doc.page_content for doc in documents])
+        return self.add_vectors(vectors, documents, ids)
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        if not ids:
+            return None
+        with self._lock:
+            for doc_id in ids:
+                row = self._row_of.pop(doc_id, None)
+                if row is not None:
+                    self._deleted.add(row)
+            self._maybe_compact()
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        with self._lock:
+            return [self._docs[self._row_of[i]] for i in ids if i in self._row_of]
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _combine_filter(filter: DocFilter | None, where: Where | None) -> DocFilter | None:  # noqa: A002
+        """FAISS 没有元数据索引，where 条件转成逐条检查的过滤函数，与 filter 同时生效。"""
+        if not where:
+            return filter
+        if filter is None:
+            return lambda doc: matches_where(doc.metadata, where)
+        return lambda doc: matches_where(doc.metadata, where) and filter(doc)
+
+    @staticmethod
+    def _search_matrix(index: faiss.Index | None, queries: np.ndarray, fetch: int) -> tuple[np.ndarray, np.ndarray]:
+        if index is None or index.ntotal == 0:
+            empty = np.empty((len(queries), 0))
+            return empty, empty.astype(np.int64)
+        fetch = min(fetch, index.ntotal)
+        return index.search(np.ascontiguousarray(queries, dtype=np.float32), fetch)
+
+    @staticmethod
+    def _collect(
+        docs: list[Document],
+        deleted: set[int],
+        scores: np.ndarray,
+        rows: np.ndarray,
+        k: int,
+        filter: DocFilter | None,  # noqa: A002
+    ) -> list[tuple[Document, float]]:
+        hits: list[tuple[Document, float]] = []
+        for score, row in zip(scores, rows):
+            if row < 0 or row in deleted:
+                continue
+            doc = docs[row]
+            if filter is not None and not filter(doc):
+                continue
+            hits.append((doc, float(score)))
+            if len(hits) == k:
+                break
+        return hits
+
+    def batch_similarity_search_with_score_by_vector(
+        self,
+        embeddings: Sequence[Sequence[float]] | np.ndarray,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[list[tuple[Document, float]]]:
+        """多条查询一次提交给 FAISS，按查询顺序返回各自的 top-k。"""
+        if len(embeddings) == 0:
+            return []
+        doc_filter = self._combine_filter(filter, where)
+        queries = normalize_rows(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        # 索引、文档与墓碑取同一时刻的快照，compact() 替换它们不影响本次检索
+        with self._lock:
+            self._train_pending()
+            index, docs, deleted = self._index, self._docs, self._deleted
+            live_fraction = 1 - len(deleted) / len(docs) if docs else 1.0
+        ntotal = index.ntotal if index is not None else 0
+        # 按墓碑比例多取候选（墓碑比例受 compact_ratio 限制）；有过滤条件时再多取一些，不够再扩大
+        want = k if doc_filter is None else max(k * 4, 16)
+        fetch = math.ceil(want / max(live_fraction, 1e-3)) + 8
+        results: list[list[tuple[Document, float]] | None] = [None] * len(queries)
+        pending = list(range(len(queries)))
+        while pending:
+            scores, rows = self._search_matrix(index, queries[pending], fetch)
+            still: list[int] = []
+            for pos, j in enumerate(pending):
+                hits = self._collect(docs, deleted, scores[pos], rows[pos], k, doc_filter)
+                if len(hits) < k and fetch < ntotal:
+                    still.append(j)
+                else:
+                    results[j] = hits
+            pending = still
+            fetch *= 4
+        return results
+
+    def batch_similarity_search_with_score(
+        self,
+        queries: list[str],
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[list[tuple[Document, float]]]:
+        """多条查询只发起一次 Embedding 请求。"""
+        vectors = embed_queries(self._embedding, queries)
+        return self.batch_similarity_search_with_score_by_vector(vectors, k, filter, where)
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return self.batch_similarity_search_with_score_by_vector([embedding], k, filter, where)[0]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filter, where)]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter, where)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, where)]
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        embedding = await self._embedding.aembed_query(query)
+        return self.similarity_search_by_vector(embedding, k, filter, where)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # 分数是内积（归一化后即余弦相似度），不是距离
+        return cosine_relevance
+
+    # ------------------------------------------------------------------
+    # 召回评估
+    # ------------------------------------------------------------------
+    def measure_recall(
+        self,
+        query_vectors: Sequence[Sequence[float]] | np.ndarray,
+        k: int = 10,
+    ) -> dict[str, Any]:
+        """以存活行上的精确内积检索为基准，返回检索结果的 recall@k 与两者的平均查询耗时（毫秒）。
+
+        墓碑行不计入基准，也不会出现在检索结果中，recall 即实际检索返回结果的召回。
+        """
+        with self._lock:
+            self._train_pending()
+            index, deleted = self._index, set(self._deleted)
+            row_of = dict(self._row_of)
+        if index is None or index.ntotal == len(deleted):
+            raise ValueError("索引为空，无法评估召回")
+        queries = np.ascontiguousarray(normalize_rows(np.asarray(query_vectors, dtype=np.float32)))
+        live = np.asarray([row for row in range(index.ntotal) if row not in deleted], dtype=np.int64)
+        exact = faiss.IndexFlatIP(index.d)
+        exact.add(np.ascontiguousarray(index.reconstruct_n(0, index.ntotal)[live]))
+        k = min(k, live.size)
+
+        start = time.perf_counter()
+        _, truth = exact.search(queries, k)
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        start = time.perf_counter()
+        results = self.batch_similarity_search_with_score_by_vector(queries, k)
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        approx = [{row_of[doc.id] for doc, _ in hits if doc.id in row_of} for hits in results]
+        found = sum(len(a & set(live[t].tolist())) for a, t in zip(approx, truth))
+        return {
+            "index_type": self.index_type,
+            "k": k,
+            "recall": found / (k * len(queries)),
+            "ann_ms": ann_ms,
+            "exact_ms": exact_ms,
+        }
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def save_local(self, folder: str | Path | None = None, fingerprint: str | None = None) -> Path:
+        """保存索引、文档和参数；fingerprint 可记录语料指纹，用于判断是否需要重建。"""
+        folder = Path(folder) if folder is not None else default_faiss_dir()
+        folder.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._train_pending()
+            if self._index is not None:
+                faiss.write_index(self._index, str(folder / _INDEX_FILE))
+            docstore = [
+                {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in self._docs
+            ]
+            meta = {
+                "index_type": self.index_type,
+                "nlist": self.nlist,
+                "nprobe": self._nprobe,
+                "hnsw_m": self.hnsw_m,
+                "ef_construction": self.ef_construction,
+                "ef_search": self._ef_search,
+                "compact_ratio": self.compact_ratio,
+                "deleted": sorted(self._deleted),
+                "fingerprint": fingerprint,
+            }
+        (folder / _DOCSTORE_FILE).write_text(json.dumps(docstore, ensure_ascii=False), encoding="utf-8")
+        (folder / _META_FILE).write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        return folder
+
+    @staticmethod
+    def read_fingerprint(folder: str | Path | None = None) -> str | None:
+        """读取已保存索引的语料指纹，不存在时返回 None。"""
+        meta_path = (Path(folder) if folder is not None else default_faiss_dir()) / _META_FILE
+        if not meta_path.exists():
+            return None
+        return json.loads(meta_path.read_text(encoding="utf-8")).get("fingerprint")
+
+    @classmethod
+    def load_local(cls, embedding: Embeddings, folder: str | Path | None = None) -> FaissVectorStore:
+        folder = Path(folder) if folder is not None else default_faiss_dir()
+        meta = json.loads((folder / _META_FILE).read_text(encoding="utf-8"))
+        store = cls(
+            embedding=embedding,
+            index_type=meta["index_type"],
+            nlist=meta["nlist"],
+            nprobe=meta["nprobe"],
+            hnsw_m=meta["hnsw_m"],
+            ef_construction=meta["ef_construction"],
+            ef_search=meta["ef_search"],
+            compact_ratio=meta.get("compact_ratio", 0.2),
+        )
+        index_path = folder / _INDEX_FILE
+        if index_path.exists():
+            store._index = faiss.read_index(str(index_path))
+            # 读回的索引沿用保存时的检索参数
+            store.nprobe = store._nprobe
+            store.ef_search = store._ef_search
+        docstore = json.loads((folder / _DOCSTORE_FILE).read_text(encoding="utf-8"))
+        store._docs = [Document(**item) for item in docstore]
+        store._deleted = set(meta["deleted"])
+        store._row_of = {
+            doc.id: row for row, doc in enumerate(store._docs) if row not in store._deleted
+        }
+        return store
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> FaissVectorStore:
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
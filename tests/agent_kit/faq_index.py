@@ -0,0 +1,114 @@
+"""
+问答（Q/A）格式知识文件的精确匹配快速通道。
+
+files/question.txt 中的块都是 问题/答案/权限/关键词 的结构，用户原样或只差标点、全半角、空白地
+问出其中的问题时，不必进入 LLM 的工具调用循环。入库时为每个问题建立
+规范化问题文本 -> 答案 的索引（按权限区分版本），Agent 之前先查一次字典：
+
+- 命中且在用户权限内只有一个答案：直接返回，耗时为微秒级；
+- 未命中，或同一问题在权限内有多个不同答案（需要 Agent 向用户确认）：交给正常的 Agent 流程。
+
+权限判断与检索相同：用 matches_where 匹配 {"permissions": [user_permission, None]}，未设置权限的块视为公开。
+hits / misses / hit_rate 作为命中率指标。
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator
+
+from langchain_core.documents import Document
+
+from .metadata_index import matches_where
+from .query_cache import normalize_query
+
+
+_QUESTION = re.compile(r"^问题[:：]\s*(.*)$", re.MULTILINE)
+_ANSWER = re.compile(r"^答案[:：]\s*", re.MULTILINE)
+
+
+def normalize_question(text: str) -> str:
+    """在 normalize_query 的基础上去掉全部空白与标点/符号，「怎么考勤？」与「怎么 考勤?」视为同一问题。"""
+    text = normalize_query(text)
+    return "".join(ch for ch in text if not ch.isspace() and unicodedata.category(ch)[0] not in "PS")
+
+
+def parse_qa(page_content: str) -> tuple[str, str] | None:
+    """从 parse_block 清洗后的正文中取出 (问题, 答案)；答案可跨多行。不是 Q/A 块时返回 None。"""
+    question = _QUESTION.search(page_content)
+    answer = _ANSWER.search(page_content)
+    if question is None or answer is None or answer.start() < question.start():
+        return None
+    return question.group(1).strip(), page_content[answer.end():].strip()
+
+
+@dataclass
+class FAQEntry:
+    question: str
+    answer: str
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+
+class FAQIndex:
+    """规范化问题文本到答案的倒排表，线程安全。"""
+
+    def __init__(self, permission_field: str = "permissions"):
+        self.permission_field = permission_field
+        self._entries: dict[str, list[FAQEntry]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def add(self, document: Document) -> bool:
+        """索引一个片段；不是 Q/A 块时忽略并返回 False。"""
+        parsed = parse_qa(document.page_content)
+        if parsed is None:
+            return False
+        question, answer = parsed
+        key = normalize_question(question)
+        if not key or not answer:
+            return False
+        with self._lock:
+            self._entries.setdefault(key, []).append(FAQEntry(question, answer, dict(document.metadata)))
+        return True
+
+    def add_documents(self, documents: Iterable[Document]) -> int:
+        return sum(self.add(doc) for doc in documents)
+
+    def tee(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """边索引边原样产出，用于流式入库，不需要再读一遍文件。"""
+        for doc in documents:
+            self.add(doc)
+            yield doc
+
+    def lookup(self, question: str, user_permission: str) -> FAQEntry | None:
+        """用户权限内恰好有一个答案时返回该条目，否则返回 None（交给 Agent）。"""
+        where = {self.permission_field: [user_permission, None]}
+        candidates = self._entries.get(normalize_question(question), ())
+        visible = [e for e in candidates if matches_where(e.metadata, where)]
+        with self._lock:
+            if len({e.answer for e in visible}) == 1:
+                self.hits += 1
+                return visible[0]
+            self.misses += 1
+            return None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "questions": len(self._entries),
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,272 @@
+"""
+共享连接池的模型客户端工厂。
+
+每个示例模块都各自创建 ChatOpenAI 与 Embedding 客户端，每个客户端各有一个 httpx 连接池；
+同一进程加载多个 Agent 时会对 DashScope 建立多份 TLS 连接，彼此之间也无法复用 keep-alive。
+ClientFactory 只持有一个同步 httpx.Client 和一个异步客户端，chat_model() / embeddings() /
+openai_client() / async_openai_client() 给出的客户端都建立在这两个连接池之上：
+
+- 池参数（最大连接数、keep-alive 连接数与过期时间、HTTP/2、超时）由 PoolConfig 配置，默认读取 HTTP_* 环境变量；
+- httpx 的异步连接不能跨事件循环复用，异步客户端在每个事件循环中各建一份连接池，对外仍是同一个对象；
+- metrics() 按主机统计请求数、新建 TCP 连接数、TLS 握手数、失败数，以及连接池中当前的活跃/空闲连接，
+  连接复用率 = 1 - 新建连接数 / 请求数。
+
+HTTP/2 需要安装 h2（pip install httpx[http2]）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+import httpx
+
+
+def _env_number(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    timeout: float = 60.0
+    connect_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=int(_env_number("HTTP_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(_env_number("HTTP_MAX_KEEPALIVE_CONNECTIONS", cls.max_keepalive_connections)),
+            keepalive_expiry=_env_number("HTTP_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+            http2=os.getenv("HTTP2", "").lower() in ("1", "true", "yes"),
+            timeout=_env_number("HTTP_TIMEOUT", cls.timeout),
+            connect_timeout=_env_number("HTTP_CONNECT_TIMEOUT", cls.connect_timeout),
+        )
+
+    def httpx_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout)
+
+    def client_kwargs(self) -> dict[str, Any]:
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "timeout": self.httpx_timeout(),
+            "http2": self.http2,
+        }
+
+
+@dataclass
+class HostMetrics:
+    requests: int = 0
+    connections: int = 0
+    tls_handshakes: int = 0
+    connect_failures: int = 0
+    server_errors: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        return 1 - self.connections / self.requests if self.requests else 0.0
+
+
+@dataclass
+class _Metrics:
+    hosts: dict[str, HostMetrics] = field(default_factory=lambda: defaultdict(HostMetrics))
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, host: str, event: str) -> None:
+        with self.lock:
+            metrics = self.hosts[host]
+            setattr(metrics, event, getattr(metrics, event) + 1)
+
+    def on_trace(self, host: str, name: str) -> None:
+        if name == "connection.connect_tcp.complete":
+            self.record(host, "connections")
+        elif name == "connection.start_tls.complete":
+            self.record(host, "tls_handshakes")
+        elif name == "connection.connect_tcp.failed":
+            self.record(host, "connect_failures")
+
+
+def _pool_connections(client: httpx.Client | httpx.AsyncClient) -> list[Any]:
+    # httpcore 的连接池没有公开接口，取不到时不统计
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    return list(getattr(pool, "connections", ()))
+
+
+class _LoopLocalAsyncClient(httpx.AsyncClient):
+    """对外是一个 AsyncClient，send 时转给当前事件循环自己的连接池。"""
+
+    def __init__(self, make: Callable[[], httpx.AsyncClient], timeout: httpx.Timeout):
+        # OpenAI SDK 从 http_client.timeout 读取请求超时，是 httpx 默认值时改用自己的 600s，
+        # 包装对象本身不发请求，但超时必须与实际连接池一致
+        super().__init__(timeout=timeout)
+        self._make = make
+        self._clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def current(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = self._clients[loop] = self._make()
+            return client
+
+    def clients(self) -> list[httpx.AsyncClient]:
+        with self._lock:
+            return list(self._clients.values())
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        return await self.current().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环的连接池（其他循环的连接池随循环一起回收）。"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+        await super().aclose()
+
+
+class ClientFactory:
+    """持有共享连接池，给出建立在其上的 chat / embedding 客户端。线程安全，连接池在第一次使用时创建。"""
+
+    def __init__(self, config: PoolConfig | None = None):
+        self.config = config or PoolConfig.from_env()
+        self._metrics = _Metrics()
+        self._lock = threading.Lock()
+        self._sync_client: httpx.Client | None = None
+        self._async_client: _LoopLocalAsyncClient | None = None
+
+    def _sync_request_hook(self, request: httpx.Request) -> None:
+        host = request.url.host
+        self._metrics.record(host, "requests")
+        request.extensions["trace"] = lambda name, info: self._metrics.on_trace(host, name)
+
+    async def _async_request_hook(self, request: httpx.Request) -> None:
+        host = request.url.host
+
+        async def trace(name: str, info: dict[str, Any]) -> None:
+            self._metrics.on_trace(host, name)
+
+        self._metrics.record(host, "requests")
+        request.extensions["trace"] = trace
+
+    def _sync_response_hook(self, response: httpx.Response) -> None:
+        if response.status_code >= 500:
+            self._metrics.record(response.request.url.host, "server_errors")
+
+    async def _async_response_hook(self, response: httpx.Response) -> None:
+        self._sync_response_hook(response)
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(
+                    **self.config.client_kwargs(),
+                    event_hooks={"request": [self._sync_request_hook], "response": [self._sync_response_hook]},
+                )
+            return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = _LoopLocalAsyncClient(
+                    lambda: httpx.AsyncClient(
+                        **self.config.client_kwargs(),
+                        event_hooks={"request": [self._async_request_hook], "response": [self._async_response_hook]},
+                    ),
+                    timeout=self.config.httpx_timeout(),
+                )
+            return self._async_client
+
+    def chat_model(self, **kwargs: Any):
+        """ChatOpenAI，默认连接 DASHSCOPE_BASE_URL；其余参数原样传给 ChatOpenAI。"""
+        from langchain_openai import ChatOpenAI
+
+        kwargs.setdefault("api_key", os.getenv("DASHSCOPE_API_KEY"))
+        kwargs.setdefault("base_url", os.getenv("DASHSCOPE_BASE_URL"))
+        # ChatOpenAI 会把 timeout=None 显式传给 SDK，不设置时请求没有超时
+        kwargs.setdefault("timeout", self.config.httpx_timeout())
+        return ChatOpenAI(http_client=self.sync_client, http_async_client=self.async_client, **kwargs)
+
+    def embeddings(self, **kwargs: Any):
+        """DashScopeEmbeddings，请求走共享的异步连接池。"""
+        from .embeddings import DashScopeEmbeddings
+
+        return DashScopeEmbeddings(http_client=self.async_client, **kwargs)
+
+    def openai_client(self, **kwargs: Any):
+        """OpenAI SDK 同步客户端，供直接使用 SDK 的代码（如 graphiti）共用连接池。"""
+        from openai import OpenAI
+
+        kwargs.setdefault("api_key", os.getenv("DASHSCOPE_API_KEY"))
+        kwargs.setdefault("base_url", os.getenv("DASHSCOPE_BASE_URL"))
+        return OpenAI(http_client=self.sync_client, **kwargs)
+
+    def async_openai_client(self, **kwargs: Any):
+        """OpenAI SDK 异步客户端。"""
+        from openai import AsyncOpenAI
+
+        kwargs.setdefault("api_key", os.getenv("DASHSCOPE_API_KEY"))
+        kwargs.setdefault("base_url", os.getenv("DASHSCOPE_BASE_URL"))
+        return AsyncOpenAI(http_client=self.async_client, **kwargs)
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """按主机汇总的请求与连接统计，active / idle 为连接池中当前的连接数。"""
+        with self._metrics.lock:
+            report = {host: {**asdict(m), "reuse_ratio": m.reuse_ratio} for host, m in self._metrics.hosts.items()}
+        clients: list[httpx.Client | httpx.AsyncClient] = []
+        with self._lock:
+            if self._sync_client is not None:
+                clients.append(self._sync_client)
+            async_client = self._async_client
+        if async_client is not None:
+            clients.extend(async_client.clients())
+        for client in clients:
+            for connection in _pool_connections(client):
+                host = connection._origin.host.decode("ascii") if hasattr(connection, "_origin") else "?"
+                entry = report.setdefault(host, {})
+                state = "idle" if connection.is_idle() else "active"
+                entry[state] = entry.get(state, 0) + 1
+        return report
+
+    def close(self) -> None:
+        """关闭同步连接池；异步连接池随各自的事件循环回收。"""
+        with self._lock:
+            client, self._sync_client = self._sync_client, None
+        if client is not None:
+            client.close()
+
+
+_default_factory: ClientFactory | None = None
+_default_lock = threading.Lock()
+
+
+def get_client_factory() -> ClientFactory:
+    """进程内共享的默认工厂。"""
+    global _default_factory
+    with _default_lock:
+        if _default_factory is None:
+            _default_factory = ClientFactory()
+        return _default_factory
+
+
+def chat_model(**kwargs: Any):
+    """用默认工厂创建 ChatOpenAI，与进程内其他客户端共用连接池。"""
+    return get_client_factory().chat_model(**kwargs)
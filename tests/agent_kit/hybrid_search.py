@@ -0,0 +1,133 @@
+"""
+向量检索与 BM25 关键词检索的混合检索，用倒数排名融合（RRF）合并结果。
+
+RRF 只看各路结果中的名次：score(d) = Σ weight / (rrf_k + rank)，
+不需要把余弦相似度和 BM25 分数换算到同一量纲。
+向量检索擅长语义相近的问法，BM25 保证 "补卡"、产品编号这类精确词不被漏掉。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from .bm25_index import BM25Index
+from .dedup import expand_variants
+from .matrix_store import DocFilter
+from .metadata_index import Where
+
+
+def _doc_key(doc: Document) -> str:
+    if doc.id is not None:
+        return doc.id
+    return f"{doc.metadata.get('source')}#{doc.metadata.get('chunk_id')}#{doc.page_content}"
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[Sequence[Document]],
+    k: int = 4,
+    rrf_k: int = 60,
+    weights: Sequence[float] | None = None,
+) -> list[tuple[Document, float]]:
+    """按 RRF 合并多路有序结果，同一文档（按 id）只保留一次，返回融合分数降序的前 k 个。"""
+    weights = weights or [1.0] * len(result_lists)
+    if len(weights) != len(result_lists):
+        raise ValueError(f"weights 与结果路数不一致：{len(weights)} != {len(result_lists)}")
+    fused: dict[str, float] = {}
+    docs: dict[str, Document] = {}
+    for weight, results in zip(weights, result_lists):
+        for rank, doc in enumerate(results, start=1):
+            key = _doc_key(doc)
+            fused[key] = fused.get(key, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    # 分数相同时保持首次出现的顺序
+    ranked = sorted(fused.items(), key=lambda item: -item[1])[:k]
+    return [(docs[key], score) for key, score in ranked]
+
+
+class HybridRetriever:
+    """向量库 + BM25 的混合检索；text_index 为 None 时退化为纯向量检索。
+
+    近似去重合并过的代表文档在返回前按 where 条件与 filter 展开成具体版本（见 dedup.expand_variants）。
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        text_index: BM25Index | None = None,
+        fetch_k: int = 20,
+        rrf_k: int = 60,
+        weights: tuple[float, float] = (1.0, 1.0),
+    ):
+        self.vector_store = vector_store
+        self.text_index = text_index
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+        self.weights = weights
+
+    @staticmethod
+    def _kwargs(where: Where | None, filter: DocFilter | None) -> dict[str, Any]:  # noqa: A002
+        kwargs: dict[str, Any] = {}
+        if where:
+            kwargs["where"] = where
+        if filter is not None:
+            kwargs["filter"] = filter
+        return kwargs
+
+    def _fuse(
+        self,
+        query: str,
+        vector_hits: list[tuple[Document, float]],
+        k: int,
+        where: Where | None,
+        filter: DocFilter | None,  # noqa: A002
+    ) -> list[tuple[Document, float]]:
+        if self.text_index is None:
+            return expand_variants(vector_hits[:k], where, filter)
+        text_hits = self.text_index.search(query, self.fetch_k, where=where, filter=filter)
+        fused = reciprocal_rank_fusion(
+            [[doc for doc, _ in vector_hits], text_hits], k=k, rrf_k=self.rrf_k, weights=self.weights
+        )
+        return expand_variants(fused, where, filter)
+
+    def search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        where: Where | None = None,
+        filter: DocFilter | None = None,  # noqa: A002
+    ) -> list[tuple[Document, float]]:
+        """返回 (文档, 分数)：混合检索时为 RRF 融合分数，否则为向量相似度。"""
+        fetch_k = k if self.text_index is None else max(k, self.fetch_k)
+        vector_hits = self.vector_store.similarity_search_with_score(query, k=fetch_k, **self._kwargs(where, filter))
+        return self._fuse(query, vector_hits, k, where, filter)
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        where: Where | None = None,
+        filter: DocFilter | None = None,  # noqa: A002
+    ) -> list[Document]:
+        return [doc for doc, _ in self.search_with_score(query, k, where, filter)]
+
+    def batch_search_with_score(
+        self,
+        queries: list[str],
+        k: int = 4,
+        where: Where | None = None,
+        filter: DocFilter | None = None,  # noqa: A002
+    ) -> list[list[tuple[Document, float]]]:
+        """多条查询的向量部分合并为一次 Embedding 请求和一次打分，再逐条与 BM25 融合。"""
+        fetch_k = k if self.text_index is None else max(k, self.fetch_k)
+        batch = getattr(self.vector_store, "batch_similarity_search_with_score", None)
+        if batch is not None:
+            vector_results = batch(queries, k=fetch_k, **self._kwargs(where, filter))
+        else:
+            vector_results = [
+                self.vector_store.similarity_search_with_score(q, k=fetch_k, **self._kwargs(where, filter))
+                for q in queries
+            ]
+        return [self._fuse(q, hits, k, where, filter) for q, hits in zip(queries, vector_results)]
@@ -0,0 +1,176 @@
+"""
+两级意图分类：本地模型先判，置信度不够时才调用 LLM。
+
+多意图图在做任何实际工作前都要先判断问题属于哪个意图，整轮 LLM 调用往往要一秒以上。
+大部分问题凭关键词或与标注样例的相似度就能确定：
+
+1. 关键词规则（KeywordIntentRules）：命中规则时直接采用，命中多个意图的规则即为复合问题
+   （如「北京天气怎么样，顺便算一下 123+456」），返回意图集合；
+2. 最近质心（CentroidIntentClassifier）：把各意图的标注样例嵌入后取质心，
+   问题与最近质心的相似度、以及与第二近质心的差距都足够大时采用；
+3. 以上都不确定时调用 fallback（通常是 LLM，可返回逗号分隔的多个意图），
+   结果按规范化问题缓存，同一问题不再重复调用。
+
+默认的 HashingEmbeddings 是本地的字符 n-gram 哈希向量，不依赖模型与网络，单次分类在毫秒以内；
+也可以换成任意 LangChain Embeddings（例如带查询缓存的 DashScopeEmbeddings）。
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Mapping, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .query_cache import LRUCache, normalize_query
+
+
+class HashingEmbeddings(Embeddings):
+    """字符 n-gram 的带符号哈希向量（单位长度），同一文本在任何进程中得到同一向量。"""
+
+    def __init__(self, dimensions: int = 1024, ngram_range: tuple[int, int] = (1, 3)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _embed(self, text: str) -> np.ndarray:
+        # 空白在中英混排的问题里只是噪音（数学样例里尤其多），去掉后再取 n-gram
+        text = normalize_query(text).replace(" ", "")
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                h = zlib.crc32(text[i:i + n].encode("utf-8"))
+                vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(t).tolist() for t in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text).tolist()
+
+
+@dataclass(frozen=True)
+class IntentPrediction:
+    # 按 labels 顺序排列，至少一个
+    intents: tuple[str, ...]
+    confidence: float
+    # 作出判断的一级：rules / centroid / fallback / cache
+    tier: str
+
+    @property
+    def intent(self) -> str:
+        """主意图（单意图场景使用）。"""
+        return self.intents[0]
+
+
+class KeywordIntentRules:
+    """每个意图一组正则，返回命中的意图集合。"""
+
+    def __init__(self, rules: Mapping[str, Sequence[str]]):
+        self.rules = {intent: re.compile("|".join(f"(?:{p})" for p in patterns)) for intent, patterns in rules.items()}
+
+    def match(self, text: str) -> set[str]:
+        text = normalize_query(text)
+        return {intent for intent, pattern in self.rules.items() if pattern.search(text)}
+
+
+class CentroidIntentClassifier:
+    """标注样例的最近质心分类，置信度为与最近质心和第二近质心的相似度之差。"""
+
+    def __init__(self, embeddings: Embeddings, examples: Mapping[str, Sequence[str]]):
+        self.embeddings = embeddings
+        self.labels = list(examples)
+        centroids = []
+        for label in self.labels:
+            vectors = np.asarray(embeddings.embed_documents(list(examples[label])), dtype=np.float32)
+            centroid = vectors.mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+        self.centroids = np.vstack(centroids)
+
+    def scores(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        return self.centroids @ (vector / (np.linalg.norm(vector) or 1.0))
+
+    def predict(self, text: str) -> tuple[str, float, float]:
+        """返回 (意图, 与最近质心的相似度, 与第二近质心的差距)。"""
+        scores = self.scores(text)
+        order = np.argsort(-scores)
+        best = float(scores[order[0]])
+        margin = best - float(scores[order[1]]) if len(order) > 1 else best
+        return self.labels[order[0]], best, margin
+
+
+class TieredIntentClassifier:
+    """规则 -> 最近质心 -> fallback 的分类阶段，线程安全，按规范化问题缓存结果。"""
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        rules: KeywordIntentRules | None = None,
+        centroid: CentroidIntentClassifier | None = None,
+        fallback: Callable[[str], str] | None = None,
+        default: str | None = None,
+        min_similarity: float = 0.15,
+        min_margin: float = 0.05,
+        cache: LRUCache[IntentPrediction] | None = None,
+    ):
+        self.labels = list(labels)
+        self.rules = rules
+        self.centroid = centroid
+        self.fallback = fallback
+        self.default = default or self.labels[-1]
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.cache: LRUCache[IntentPrediction] = cache or LRUCache()
+        self.tiers: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def _ordered(self, intents: set[str]) -> tuple[str, ...]:
+        return tuple(label for label in self.labels if label in intents) or (self.default,)
+
+    def _classify(self, text: str) -> IntentPrediction:
+        if self.rules is not None:
+            matched = self.rules.match(text)
+            if matched:
+                return IntentPrediction(self._ordered(matched), 1.0, "rules")
+
+        guess, similarity, margin = None, 0.0, 0.0
+        if self.centroid is not None:
+            guess, similarity, margin = self.centroid.predict(text)
+            if similarity >= self.min_similarity and margin >= self.min_margin:
+                return IntentPrediction((guess,), margin, "centroid")
+
+        if self.fallback is not None:
+            answer = self.fallback(text)
+            return IntentPrediction(self._ordered(set(re.findall(r"[a-z_]+", answer.lower()))), 1.0, "fallback")
+        return IntentPrediction((guess or self.default,), margin, "centroid")
+
+    def classify(self, text: str) -> IntentPrediction:
+        key = (normalize_query(text),)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self._lock:
+                self.tiers["cache"] += 1
+            return IntentPrediction(cached.intents, cached.confidence, "cache")
+        prediction = self._classify(text)
+        self.cache.put(key, prediction)
+        with self._lock:
+            self.tiers[prediction.tier] += 1
+        return prediction
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            tiers = dict(self.tiers)
+        total = sum(tiers.values())
+        return {
+            **tiers,
+            "total": total,
+            "fallback_ratio": tiers.get("fallback", 0) / total if total else 0.0,
+        }
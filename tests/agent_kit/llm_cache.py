@@ -0,0 +1,210 @@
+"""
+基于 SQLite 的持久化 LLM 响应缓存，用于 temperature=0 的确定性调用。
+
+意图分类、RAG Agent、对同一份 FAQ 的批量评测会反复发出完全相同的请求。缓存实现 LangChain 的 BaseCache，
+挂到共享的 llm 对象上（ChatOpenAI(cache=...) 或 attach_llm_cache），invoke / bind_tools 之后的调用
+以及图内部的调用都会先查缓存：
+
+- 键：sha256(llm_string, prompt)。llm_string 由 LangChain 生成，包含模型、参数与 bind_tools 绑定的工具，
+  prompt 是去掉消息 id 后序列化的消息列表；
+- 只缓存 temperature 为 0 的调用。未设置 temperature（使用服务端默认值）或大于 0 时跳过，
+  除非 allow_nondeterministic=True；
+- 条目数超过 max_entries 时按最近访问时间淘汰（LRU）；
+- 直接调用 llm.stream() 时 LangChain 不查缓存，用 stream_with_cache 代替：命中时把缓存的回答按块重放。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration, Generation
+from langchain_core.runnables import RunnableBinding
+
+
+# llm_string 中的 temperature：序列化参数里是 "temperature": 0，调用参数里是 ('temperature', 0.7)
+_TEMPERATURE = re.compile(r"""["']temperature["']\s*[:,]\s*(-?[\d.]+(?:[eE]-?\d+)?|None|null)""")
+
+
+def llm_cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x1f{prompt}".encode("utf-8")).hexdigest()
+
+
+def call_temperature(llm_string: str) -> float | None:
+    """调用实际使用的 temperature；调用时传入的参数在后面，覆盖模型上的设置。未设置时返回 None。"""
+    matches = _TEMPERATURE.findall(llm_string)
+    if not matches or matches[-1] in ("None", "null"):
+        return None
+    return float(matches[-1])
+
+
+class SQLiteLLMCache(BaseCache):
+    """线程安全的 LLM 响应缓存。"""
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        max_entries: int = 10000,
+        allow_nondeterministic: bool = False,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries 必须大于 0")
+        self.path = Path(path or os.getenv("LLM_CACHE_PATH", "./llm_cache.sqlite"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.allow_nondeterministic = allow_nondeterministic
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache "
+            "(key TEXT PRIMARY KEY, generations TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def cacheable(self, llm_string: str) -> bool:
+        if self.allow_nondeterministic:
+            return True
+        return call_temperature(llm_string) == 0
+
+    def lookup(self, prompt: str, llm_string: str) -> Sequence[Generation] | None:
+        if not self.cacheable(llm_string):
+            with self._lock:
+                self.skipped += 1
+            return None
+        key = llm_cache_key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute("SELECT generations FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(row[0], allowed_objects="core")
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        if not self.cacheable(llm_string):
+            return
+        key = llm_cache_key(prompt, llm_string)
+        payload = dumps(list(return_val))
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, generations, accessed_at) VALUES (?, ?, ?)",
+                (key, payload, time.time()),
+            )
+            if exists is None:
+                self._size += 1
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            self._size = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+def attach_llm_cache(llm: BaseChatModel, cache: SQLiteLLMCache | None = None) -> SQLiteLLMCache:
+    """给共享的 llm 对象挂上缓存，之后 bind_tools / with_structured_output 得到的模型同样生效。"""
+    if cache is None:
+        cache = SQLiteLLMCache()
+    llm.cache = cache
+    return cache
+
+
+def stream_with_cache(
+    model: BaseChatModel | RunnableBinding,
+    input: LanguageModelInput,
+    cache: SQLiteLLMCache | None = None,
+    chunk_size: int = 16,
+    stop: list[str] | None = None,
+    **kwargs: Any,
+) -> Iterator[AIMessageChunk]:
+    """与 model.stream 相同，但先查缓存：命中时按 chunk_size 个字符一块重放，未命中时边流式输出边累积，结束后写入缓存。"""
+    if isinstance(model, RunnableBinding):
+        kwargs = {**model.kwargs, **kwargs}
+        model = model.bound
+    if cache is None and isinstance(model.cache, BaseCache):
+        cache = model.cache
+    if cache is None:
+        yield from model.stream(input, stop=stop, **kwargs)
+        return
+
+    messages = model._convert_input(input).to_messages()
+    # 与 BaseChatModel._generate_with_cache 使用相同的键，invoke 与 stream 共用缓存
+    llm_string = model._get_llm_string(stop=stop, **kwargs)
+    prompt = dumps([m.model_copy(update={"id": None}) if getattr(m, "id", None) is not None else m for m in messages])
+    cached = cache.lookup(prompt, llm_string)
+    if cached:
+        message = cached[0].message
+        text = message.text if isinstance(message.content, list) else message.content
+        pieces = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)] or [""]
+        for i, piece in enumerate(pieces):
+            last = i == len(pieces) - 1
+            yield AIMessageChunk(
+                content=piece,
+                id=message.id,
+                # 工具调用与元数据只在最后一块给出，合并后与原回答一致
+                tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"], ensure_ascii=False), "id": c["id"], "index": j}
+                    for j, c in enumerate(message.tool_calls)
+                ] if last else [],
+                response_metadata=message.response_metadata if last else {},
+                usage_metadata=message.usage_metadata if last else None,
+                chunk_position="last" if last else None,
+            )
+        return
+
+    merged: AIMessageChunk | None = None
+    for chunk in model.stream(messages, stop=stop, **kwargs):
+        merged = chunk if merged is None else merged + chunk
+        yield chunk
+    if merged is not None:
+        cache.update(prompt, llm_string, [ChatGeneration(message=message_chunk_to_message(merged))])
@@ -0,0 +1,425 @@
+"""
+基于 NumPy 矩阵的内存向量库，可替换 InMemoryVectorStore。
+
+全部向量 L2 归一化后存成一块连续的 float32 矩阵，容量按倍数增长。
+检索时一次矩阵-向量乘得到全部余弦相似度，再用 argpartition 取 top-k，
+不再逐条在 Python 中计算。接口（add_documents / similarity_search / filter）
+与 InMemoryVectorStore 保持一致，create_react_agent 无需改动。
+
+配置 indexed_fields 后，可用 where={"permissions": ["IT组", None]} 这类条件
+借助元数据索引过滤，只对允许的行打分。
+"""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from typing import Any, Callable, Iterable, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from .metadata_index import MetadataIndex, Where
+from .query_cache import embed_queries
+
+
+DocFilter = Callable[[Document], bool]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行做 L2 归一化，零向量保持为零。"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def cosine_relevance(score: float) -> float:
+    """把余弦相似度 [-1, 1] 映射为相关度 [0, 1]。
+
+    LangChain 自带的 _cosine_relevance_score_fn 是 1 - 距离，而这里的分数是相似度而非距离，不能直接用。
+    """
+    return (score + 1.0) / 2.0
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回分数最高的 k 个下标（按分数降序）。"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= scores.size:
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+class MatrixVectorStore(VectorStore):
+    """以连续 float32 矩阵保存向量的内存向量库。"""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        initial_capacity: int = 1024,
+        indexed_fields: Sequence[str] = (),
+        prefilter_ratio: float = 0.2,
+    ):
+        self._embedding = embedding
+        # 对这些元数据字段建立倒排索引，检索时可用 where 条件过滤
+        self._metadata_index = MetadataIndex(indexed_fields) if indexed_fields else None
+        self.prefilter_ratio = prefilter_ratio
+        self._lock = threading.RLock()
+        self._matrix: np.ndarray | None = None
+        self._dim: int | None = None
+        self._initial_capacity = max(1, initial_capacity)
+        self._size = 0
+        # 被删除的行只打标记，检索时屏蔽
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: list[str | None] = []
+        self._docs: list[Document | None] = []
+        self._row_of: dict[str, int] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def metadata_index(self) -> MetadataIndex | None:
+        return self._metadata_index
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def _allocate(self, capacity: int, dim: int) -> None:
+        """创建向量存储；子类可改用其他编码方式。"""
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+
+    def _grow(self, capacity: int) -> None:
+        """把向量存储扩容到 capacity 行，保留已有内容。"""
+        matrix = np.zeros((capacity, self._dim), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+
+    def _store_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """写入一批已归一化的向量。"""
+        self._matrix[rows] = vectors
+
+    def _reserve(self, extra: int, dim: int) -> None:
+        """保证还能追加 extra 行，不够时容量翻倍。"""
+        if self._dim is None:
+            capacity = max(self._initial_capacity, extra)
+            self._dim = dim
+            self._allocate(capacity, dim)
+            self._alive = np.zeros(capacity, dtype=bool)
+            return
+        if self._dim != dim:
+            raise ValueError(f"向量维度不一致：已有 {self._dim}，新增 {dim}")
+        needed = self._size + extra
+        capacity = self._alive.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._grow(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._alive = alive
+
+    def add_vectors(
+        self,
+        vectors: Sequence[Sequence[float]] | np.ndarray,
+        documents: Sequence[Document],
+        ids: Sequence[str | None] | None = None,
+    ) -> list[str]:
+        """写入已算好的向量；id 已存在时原位覆盖。"""
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError(f"ids 与 documents 数量不一致：{len(ids)} != {len(documents)}")
+        if not documents:
+            return []
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if matrix.shape[0] != len(documents):
+            raise ValueError(f"向量与文档数量不一致：{matrix.shape[0]} != {len(documents)}")
+
+        id_iter = iter(ids) if ids is not None else iter(doc.id for doc in documents)
+        out_ids: list[str] = []
+        rows: list[int] = []
+        with self._lock:
+            self._reserve(len(documents), matrix.shape[1])
+            for doc in documents:
+                doc_id = next(id_iter) or str(uuid.uuid4())
+                stored = Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata)
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._ids.append(doc_id)
+                    self._docs.append(stored)
+                    self._row_of[doc_id] = row
+                else:
+                    self._docs[row] = stored
+                if self._metadata_index is not None:
+                    self._metadata_index.add(row, stored.metadata)
+                rows.append(row)
+                out_ids.append(doc_id)
+            rows_arr = np.asarray(rows, dtype=np.int64)
+            self._store_rows(rows_arr, matrix)
+            self._alive[rows_arr] = True
+        return out_ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return self.add_documents(documents, ids=ids)
+
+    def add_documents(self, documents: list[Document], ids: list[str] | None = None, **kwargs: Any) -> list[str]:
+        vectors = self._embedding.embed_documents([doc.page_content for doc in documents])
+        return self.add_vectors(vectors, documents, ids)
+
+    async def aadd_documents(
+        self, documents: list[Document], ids: list[str] | None = None, **kwargs: Any
+    ) -> list[str]:
+        vectors = await self._embedding.aembed_documents([doc.page_content for doc in documents])
+        return self.add_vectors(vectors, documents, ids)
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        if not ids:
+            return None
+        with self._lock:
+            for doc_id in ids:
+                row = self._row_of.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._alive[row] = False
+                if self._metadata_index is not None:
+                    self._metadata_index.remove(row)
+                self._ids[row] = None
+                self._docs[row] = None
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> list[Document]:
+        with self._lock:
+            rows = [self._row_of[i] for i in ids if i in self._row_of]
+            return [self._docs[row] for row in rows]
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+    def _scorer(self, size: int) -> Callable[[np.ndarray | None, np.ndarray], np.ndarray]:
+        """在锁内取存储快照，返回打分函数 score(rows, queries) -> [行数, 查询数]。
+
+        rows 为 None 时对前 size 行全部打分。
+        """
+        matrix = self._matrix[:size]
+
+        def score(rows: np.ndarray | None, queries: np.ndarray) -> np.ndarray:
+            if rows is None:
+                return matrix @ queries.T
+            return matrix[rows] @ queries.T
+
+        return score
+
+    def _snapshot(self, where: Where | None) -> tuple | None:
+        """调用方持有锁：取检索所需的状态 (行数, 打分函数, 存活标记, 文档列表, where 允许的行)。
+
+        库为空时返回 None；没有 where 条件时允许的行为 None。
+        """
+        if self._dim is None or not self._row_of:
+            return None
+        size = self._size
+        allowed = None
+        if where:
+            if self._metadata_index is None:
+                raise ValueError("未配置 indexed_fields，无法使用 where 条件")
+            allowed = self._metadata_index.rows(where)
+        return size, self._scorer(size), self._alive[:size], self._docs, allowed
+
+    def _candidates(
+        self,
+        queries: np.ndarray,
+        where: Where | None,
+        snapshot: tuple | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, list[Document | None]]:
+        """对一批查询向量打分，返回 (候选行号, 分数矩阵 [行数, 查询数], 文档快照)。
+
+        有 where 条件时先从元数据索引取出允许的行：命中行较少则只对这些行
+        做乘法（预过滤）；命中行较多则整表相乘后再取这些行（后过滤）。
+        snapshot 为调用方在锁内取得的 _snapshot(where)，未给出时在这里取。
+        """
+        if snapshot is None:
+            with self._lock:
+                snapshot = self._snapshot(where)
+        if snapshot is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(queries)), dtype=np.float32), []
+        size, score, alive, docs, allowed = snapshot
+
+        if allowed is None:
+            rows = np.flatnonzero(alive)
+            return rows, score(None, queries)[rows], docs
+
+        allowed = allowed[allowed < size]
+        rows = allowed[alive[allowed]]
+        if rows.size == 0:
+            return rows, np.empty((0, len(queries)), dtype=np.float32), docs
+        if rows.size <= self.prefilter_ratio * size:
+            return rows, score(rows, queries), docs
+        return rows, score(None, queries)[rows], docs
+
+    @staticmethod
+    def _select(
+        rows: np.ndarray,
+        scores: np.ndarray,
+        docs: list[Document | None],
+        k: int,
+        filter: DocFilter | None,  # noqa: A002
+    ) -> list[tuple[int, float]]:
+        """从单个查询的候选分数中选出 top-k 行。"""
+        n = rows.size
+        if filter is None:
+            order = top_k_indices(scores, min(k, n))
+            return [(int(rows[i]), float(scores[i])) for i in order]
+
+        # 可调用过滤：按分数顺序逐批检查，候选不足时扩大范围，直到凑够 k 个或扫完
+        hits: list[tuple[int, float]] = []
+        seen = 0
+        want = max(k * 4, 16)
+        while len(hits) < k and seen < n:
+            want = min(want, n)
+            order = top_k_indices(scores, want)
+            for i in order[seen:]:
+                doc = docs[rows[i]]
+                if doc is not None and filter(doc):
+                    hits.append((int(rows[i]), float(scores[i])))
+                    if len(hits) == k:
+                        break
+            seen = want
+            want *= 4
+        return hits
+
+    def _search_rows(
+        self,
+        query_vectors: Sequence[Sequence[float]] | np.ndarray,
+        k: int,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        rows, scores, docs = self._candidates(queries, where)
+        results: list[list[tuple[Document, float]]] = []
+        for j in range(len(queries)):
+            hits = self._select(rows, scores[:, j], docs, k, filter)
+            # 检索期间被并发删除的行直接跳过
+            results.append([(docs[row], score) for row, score in hits if docs[row] is not None])
+        return results
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        return self._search_rows([embedding], k, filter, where)[0]
+
+    def batch_similarity_search_with_score_by_vector(
+        self,
+        embeddings: Sequence[Sequence[float]] | np.ndarray,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        """一次矩阵-矩阵乘对多条查询打分，按查询顺序返回各自的 top-k。"""
+        if len(embeddings) == 0:
+            return []
+        return self._search_rows(embeddings, k, filter, where)
+
+    def batch_similarity_search_with_score(
+        self,
+        queries: list[str],
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        """多条查询只发起一次 Embedding 请求，再一次性完成打分。"""
+        vectors = embed_queries(self._embedding, queries)
+        return self.batch_similarity_search_with_score_by_vector(vectors, k, filter, where)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        hits = self.similarity_search_with_score_by_vector(embedding, k, filter, where)
+        return [doc for doc, _ in hits]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter, where)
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        embedding = await self._embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, filter, where)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, where)]
+
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, filter, where)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return cosine_relevance
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        **kwargs: Any,
+    ) -> MatrixVectorStore:
+        ids = kwargs.pop("ids", None)
+        store = cls(embedding=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
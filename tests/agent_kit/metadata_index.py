@@ -0,0 +1,116 @@
+"""
+入库时构建的元数据倒排索引（权限组、关键词等）。
+
+每个字段的每个取值对应一份行号集合，查询时转成有序的 int64 数组并缓存，
+字段为空的行单独归入 None 桶（例如未设置权限即视为公开）。
+检索只需按取值取出行号做并/交集，不再对每篇文档执行 Python 过滤函数；
+新增一个权限组只会多一份行号数组，不影响其他组的查询。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Iterable, Mapping, Sequence
+
+import numpy as np
+
+
+# 与 parse_block 中权限字段的分隔规则一致：顿号、逗号、空白
+_SPLIT_VALUES = re.compile(r"[、,，\s]+")
+
+Where = Mapping[str, "str | None | Sequence[str | None]"]
+
+
+def metadata_values(value: Any) -> list[str | None]:
+    """把元数据字段统一拆成取值列表，字符串按分隔符切分。
+
+    列表中的 None 保留为 None（合并多个版本时表示其中有公开版本），
+    整个字段为 None 时返回空列表。
+    """
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v for v in _SPLIT_VALUES.split(value) if v]
+    if isinstance(value, (list, tuple, set)):
+        out: list[str | None] = []
+        for item in value:
+            if item is None:
+                out.append(None)
+            else:
+                out.extend(metadata_values(item))
+        return out
+    return [str(value)]
+
+
+def matches_where(metadata: Mapping[str, Any], where: Where) -> bool:
+    """单条元数据是否满足 where 条件，语义与 MetadataIndex.rows 一致。"""
+    for field, wanted in where.items():
+        if wanted is None or isinstance(wanted, str):
+            wanted = [wanted]
+        values = metadata_values(metadata.get(field)) or [None]
+        if not any(value in wanted for value in values):
+            return False
+    return True
+
+
+class MetadataIndex:
+    """字段取值 -> 行号 的倒排索引，由向量库在写入/删除时维护。"""
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = tuple(fields)
+        self._postings: dict[str, dict[str | None, set[int]]] = {f: {} for f in self.fields}
+        self._arrays: dict[tuple[str, str | None], np.ndarray] = {}
+        # 记录每行写入了哪些取值，覆盖或删除时据此撤销
+        self._row_values: dict[int, list[tuple[str, str | None]]] = {}
+
+    def add(self, row: int, metadata: Mapping[str, Any]) -> None:
+        self.remove(row)
+        entries: list[tuple[str, str | None]] = []
+        for field in self.fields:
+            values = metadata_values(metadata.get(field)) or [None]
+            for value in dict.fromkeys(values):
+                self._postings[field].setdefault(value, set()).add(row)
+                self._arrays.pop((field, value), None)
+                entries.append((field, value))
+        self._row_values[row] = entries
+
+    def remove(self, row: int) -> None:
+        for field, value in self._row_values.pop(row, []):
+            rows = self._postings[field].get(value)
+            if rows is None:
+                continue
+            rows.discard(row)
+            if not rows:
+                del self._postings[field][value]
+            self._arrays.pop((field, value), None)
+
+    def _rows_for_value(self, field: str, value: str | None) -> np.ndarray:
+        key = (field, value)
+        cached = self._arrays.get(key)
+        if cached is None:
+            rows = self._postings[field].get(value, ())
+            cached = np.fromiter(sorted(rows), dtype=np.int64, count=len(rows))
+            self._arrays[key] = cached
+        return cached
+
+    def rows(self, where: Where) -> np.ndarray:
+        """按条件返回有序行号：同一字段内多个取值取并集，不同字段取交集。
+
+        取值 None 表示匹配该字段为空的行。
+        """
+        result: np.ndarray | None = None
+        for field, wanted in where.items():
+            if field not in self._postings:
+                raise KeyError(f"字段 {field!r} 未建立索引，可用字段：{self.fields}")
+            if wanted is None or isinstance(wanted, str):
+                wanted = [wanted]
+            parts = [self._rows_for_value(field, value) for value in wanted]
+            field_rows = parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+            result = field_rows if result is None else np.intersect1d(result, field_rows, assume_unique=True)
+            if result.size == 0:
+                break
+        return result if result is not None else np.empty(0, dtype=np.int64)
+
+    def values(self, field: str) -> list[str]:
+        """列出字段已出现的全部取值（不含空值桶）。"""
+        return sorted(v for v in self._postings[field] if v is not None)
@@ -0,0 +1,87 @@
+"""
+多进程并行解析知识文件。
+
+按文件把任务分发到进程池，子进程自己读取文件、切块并解析元数据，
+只回传紧凑的元组记录 (source, chunk_id, content, metadata)，
+不在进程间传递 Document 对象。结果按文件排序后的顺序返回，输出确定。
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from langchain_core.documents import Document
+
+from .chunking import iter_file_chunks
+from .qa_parser import parse_block
+
+
+# workers=None 时，文件数达到该值才启用进程池；文件少时启动进程的开销大于并行的收益
+PARALLEL_MIN_FILES = 32
+
+# (source, chunk_id, content, metadata)
+ChunkRecord = tuple[str, int, str, dict]
+BlockParser = Callable[[str], "tuple[str, dict]"]
+
+
+def _parse_file(task: tuple[str, BlockParser | None, str]) -> list[ChunkRecord]:
+    """子进程入口：读取单个文件并解析为记录列表。"""
+    path_str, parse_fn, encoding = task
+    path = Path(path_str)
+    records: list[ChunkRecord] = []
+    for idx, block in enumerate(iter_file_chunks(path, "blank", encoding)):
+        if parse_fn is None:
+            records.append((path.name, idx, block, {}))
+        else:
+            content, metadata = parse_fn(block)
+            records.append((path.name, idx, content, metadata))
+    return records
+
+
+def iter_chunk_records(
+    paths: Iterable[Path],
+    parse_fn: BlockParser | None = parse_block,
+    workers: int | None = None,
+    encoding: str = "utf-8",
+) -> Iterator[ChunkRecord]:
+    """并行解析多个文件，按 paths 的顺序产出记录。
+
+    parse_fn 须为模块级函数（可被 pickle）；为 None 时只切块不解析元数据。
+    workers=None 时文件数不少于 PARALLEL_MIN_FILES 才按 CPU 核数并行，否则串行；
+    workers=1 或只有一个文件时在当前进程内串行解析。
+    """
+    tasks = [(str(p), parse_fn, encoding) for p in paths]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(tasks) >= PARALLEL_MIN_FILES else 1
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield from _parse_file(task)
+        return
+    # 每个进程一次领取若干文件，减少进程间通信次数
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for records in executor.map(_parse_file, tasks, chunksize=chunksize):
+            yield from records
+
+
+def records_to_documents(records: Iterable[ChunkRecord]) -> Iterator[Document]:
+    """在主进程中把记录转为 Document。"""
+    for source, chunk_id, content, metadata in records:
+        yield Document(
+            page_content=content,
+            metadata={"source": source, "chunk_id": chunk_id, **metadata},
+        )
+
+
+def load_documents_parallel(
+    data_dir: Path,
+    parse_fn: BlockParser | None = parse_block,
+    workers: int | None = None,
+    pattern: str = "*.txt",
+) -> list[Document]:
+    """读取目录下全部文件（按文件名排序），并行解析为 Document 列表。"""
+    paths = sorted(data_dir.glob(pattern))
+    return list(records_to_documents(iter_chunk_records(paths, parse_fn, workers)))
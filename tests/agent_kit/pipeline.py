@@ -0,0 +1,188 @@
+"""
+流式、流水线化的入库流程：读取/切分 -> 嵌入 -> 写入索引。
+
+三个阶段之间用有界队列连接：
+- 读取阶段在线程中以 mmap 读文件、按空行切块，攒满一批才放入队列；
+- 嵌入阶段由 max_in_flight 个 worker 并发调用 aembed_documents；
+- 写入阶段把向量写入向量库（需提供 add_vectors），可同时写入关键词索引。
+Embeddings 重试后仍有文本失败（EmbeddingBatchError）时，只写入成功的文档，
+失败的文档记入 IngestStats.dead_letters，不中断整个入库，也不写入占位向量。
+下游变慢时上游会在队列上阻塞（背压），内存占用与语料大小无关，
+文件解析、网络请求与索引写入相互重叠。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Protocol
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .chunking import iter_file_chunks
+from .embeddings import EmbeddingBatchError
+
+
+_DONE = object()
+
+
+class VectorWriter(Protocol):
+    def add_vectors(self, vectors: Any, documents: Any, ids: Any = None) -> list[str]: ...
+
+
+class TextWriter(Protocol):
+    def add_documents(self, documents: Any, ids: Any = None) -> list[str]: ...
+
+
+@dataclass
+class IngestStats:
+    documents: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    # 各阶段累计耗时，用于判断瓶颈
+    stage_seconds: dict[str, float] = field(
+        default_factory=lambda: {"read": 0.0, "embed": 0.0, "write": 0.0}
+    )
+    # (文档, 错误信息)：嵌入最终失败、未写入索引的文档
+    dead_letters: list[tuple[Document, str]] = field(default_factory=list)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    def dead_letter_summary(self, limit: int = 5) -> str:
+        """列出前 limit 个嵌入失败的文档（来源#序号: 错误）。"""
+        lines = [f"{len(self.dead_letters)} 个文档嵌入失败，未写入索引："]
+        for doc, error in self.dead_letters[:limit]:
+            lines.append(f"  {doc.metadata.get('source')}#{doc.metadata.get('chunk_id')}: {error}")
+        if len(self.dead_letters) > limit:
+            lines.append(f"  ……另有 {len(self.dead_letters) - limit} 个")
+        return "\n".join(lines)
+
+
+def iter_blank_line_blocks(path: Path, encoding: str = "utf-8") -> Iterator[str]:
+    """按空行切块；文件以 mmap 打开，只在内存中保留当前块。"""
+    return iter_file_chunks(path, "blank", encoding)
+
+
+def _take(iterator: Iterator[Document], n: int) -> list[Document]:
+    batch: list[Document] = []
+    for doc in iterator:
+        batch.append(doc)
+        if len(batch) == n:
+            break
+    return batch
+
+
+async def aingest_documents(
+    documents: Iterable[Document],
+    vector_store: VectorWriter,
+    embeddings: Embeddings,
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    text_index: TextWriter | None = None,
+) -> IngestStats:
+    """把文档流写入向量库，返回吞吐统计。
+
+    提供 text_index（如 BM25Index）时，同一批文档以向量库返回的 id 写入关键词索引，
+    两路检索结果可按 id 融合。
+    """
+    if batch_size < 1 or max_in_flight < 1:
+        raise ValueError("batch_size 与 max_in_flight 必须大于 0")
+    stats = IngestStats()
+    started = time.perf_counter()
+    iterator = iter(documents)
+    to_embed: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+    to_write: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+
+    async def read() -> None:
+        try:
+            while True:
+                t0 = time.perf_counter()
+                batch = await asyncio.to_thread(_take, iterator, batch_size)
+                stats.stage_seconds["read"] += time.perf_counter() - t0
+                if not batch:
+                    break
+                await to_embed.put(batch)
+        finally:
+            for _ in range(max_in_flight):
+                await to_embed.put(_DONE)
+
+    async def embed() -> None:
+        try:
+            while (batch := await to_embed.get()) is not _DONE:
+                t0 = time.perf_counter()
+                try:
+                    vectors = await embeddings.aembed_documents([doc.page_content for doc in batch])
+                except EmbeddingBatchError as e:
+                    errors = {f.index: f.error for f in e.failures}
+                    stats.dead_letters.extend((batch[i], error) for i, error in errors.items())
+                    kept = [i for i, vector in enumerate(e.vectors) if vector is not None]
+                    batch, vectors = [batch[i] for i in kept], [e.vectors[i] for i in kept]
+                stats.stage_seconds["embed"] += time.perf_counter() - t0
+                if batch:
+                    await to_write.put((batch, vectors))
+        finally:
+            await to_write.put(_DONE)
+
+    async def write() -> None:
+        finished = 0
+        while finished < max_in_flight:
+            item = await to_write.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            batch, vectors = item
+            t0 = time.perf_counter()
+            ids = await asyncio.to_thread(vector_store.add_vectors, vectors, batch)
+            if text_index is not None:
+                await asyncio.to_thread(text_index.add_documents, batch, ids)
+            stats.stage_seconds["write"] += time.perf_counter() - t0
+            stats.documents += len(batch)
+            stats.batches += 1
+
+    tasks = [asyncio.ensure_future(read()), asyncio.ensure_future(write())]
+    tasks += [asyncio.ensure_future(embed()) for _ in range(max_in_flight)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def ingest_documents(
+    documents: Iterable[Document],
+    vector_store: VectorWriter,
+    embeddings: Embeddings,
+    batch_size: int = 64,
+    max_in_flight: int = 4,
+    text_index: TextWriter | None = None,
+) -> IngestStats:
+    """aingest_documents 的同步入口；已有事件循环（如 Notebook）时在新线程中运行。"""
+    coro = aingest_documents(documents, vector_store, embeddings, batch_size, max_in_flight, text_index)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result: dict[str, Any] = {}
+
+    def runner() -> None:
+        try:
+            result["stats"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner, name="ingest-pipeline")
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["stats"]
@@ -0,0 +1,55 @@
+"""
+问答（Q/A）格式知识文件的切分与解析。
+
+文件格式为空行分隔的块，每块包含 问题/答案，以及可选的 权限、关键词 行：
+------
+问题:公司的考勤方式是什么？
+答案:公司实行弹性打卡。
+权限: IT组、运维组
+关键词:考勤方式
+------
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+
+def split_on_blank(text: str) -> Iterable[str]:
+    # 使用正则按空行分割（兼容 \r\n）
+    for block in re.split(r"\n\s*\n", text):
+        cleaned = block.strip()
+        if cleaned:
+            yield cleaned
+
+
+_PERMISSION_PREFIXES = ("权限:", "权限：")
+_KEYWORD_PREFIXES = ("关键词:", "关键词：")
+
+
+def _field_value(line: str) -> str:
+    """取“字段:值”中冒号（中英文均可）之后的部分。"""
+    return re.split(r"[:：]", line, maxsplit=1)[1].strip()
+
+
+def parse_block(text_block: str) -> tuple[str, dict]:
+    """解析一个 Q/A 块，返回 (正文, 元数据)。
+
+    正文为去掉 权限、关键词 行后的其余非空行（问题与答案），元数据中
+    permissions 为权限组列表（按顿号、逗号或空白分隔），keywords 为关键词原文；
+    块中没有对应的行时不含该字段。
+    """
+    content_lines: list[str] = []
+    metadata: dict = {}
+    for line in text_block.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(_PERMISSION_PREFIXES):
+            metadata["permissions"] = [p for p in re.split(r"[、,，\s]+", _field_value(line)) if p]
+        elif line.startswith(_KEYWORD_PREFIXES):
+            metadata["keywords"] = _field_value(line)
+        else:
+            content_lines.append(line)
+    return "\n".join(content_lines), metadata
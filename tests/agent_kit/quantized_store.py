@@ -0,0 +1,243 @@
+"""
+量化存储的矩阵向量库：常驻内存的是压缩编码，全精度向量放在内存映射文件里。
+
+- storage="int8"：每行按最大绝对值做对称标量量化，int8 编码 + 一个 float32 缩放系数，
+  约为 float32 的 1/4；
+- storage="float16"：半精度编码，约为 float32 的 1/2。
+
+检索分两步：先用编码对候选行做一遍近似打分（分块反量化，临时内存有上界），
+再取前 k × rescore_factor 个候选，用映射文件中的 float32 向量精确重排。
+映射文件的页由操作系统按需调入、可随时换出，不计入常驻的向量存储。
+measure_recall / memory_usage 用于量化召回损失与内存收益。
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import time
+import weakref
+from pathlib import Path
+from typing import Any, Callable, Literal, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .matrix_store import DocFilter, MatrixVectorStore, normalize_rows, top_k_indices
+from .metadata_index import Where
+
+
+StorageType = Literal["int8", "float16"]
+
+_INT8_MAX = 127.0
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """按行对称量化：返回 (int8 编码, 每行缩放系数)，x ≈ codes * scale。"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / _INT8_MAX
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).clip(-_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class QuantizedVectorStore(MatrixVectorStore):
+    """first-pass 用 int8/float16 编码扫描、再用 float32 映射文件精确重排的向量库。"""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        storage: StorageType = "int8",
+        rescore_factor: int = 4,
+        vectors_path: str | Path | None = None,
+        block_rows: int = 8192,
+        **kwargs: Any,
+    ):
+        if storage not in ("int8", "float16"):
+            raise ValueError(f"不支持的 storage：{storage}")
+        if rescore_factor < 1 or block_rows < 1:
+            raise ValueError("rescore_factor 与 block_rows 必须大于 0")
+        super().__init__(embedding, **kwargs)
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        self.block_rows = block_rows
+        if vectors_path is None:
+            fd, path = tempfile.mkstemp(prefix="vectors-", suffix=".f32")
+            os.close(fd)
+            # 未指定路径时使用临时文件，对象回收时删除
+            weakref.finalize(self, _remove_file, path)
+            self.vectors_path = Path(path)
+        else:
+            self.vectors_path = Path(vectors_path)
+            self.vectors_path.parent.mkdir(parents=True, exist_ok=True)
+        self._codes: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+        self._exact: np.memmap | None = None
+
+    # ------------------------------------------------------------------
+    # 存储
+    # ------------------------------------------------------------------
+    def _map_exact(self, capacity: int, dim: int) -> None:
+        """把映射文件扩到 capacity 行并重新映射；旧映射在快照中仍然有效。"""
+        with self.vectors_path.open("r+b" if self._exact is not None else "wb") as f:
+            f.truncate(capacity * dim * 4)
+        self._exact = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+    def _allocate(self, capacity: int, dim: int) -> None:
+        dtype = np.int8 if self.storage == "int8" else np.float16
+        self._codes = np.zeros((capacity, dim), dtype=dtype)
+        if self.storage == "int8":
+            self._scales = np.ones(capacity, dtype=np.float32)
+        self._map_exact(capacity, dim)
+
+    def _grow(self, capacity: int) -> None:
+        codes = np.zeros((capacity, self._dim), dtype=self._codes.dtype)
+        codes[: self._size] = self._codes[: self._size]
+        self._codes = codes
+        if self._scales is not None:
+            scales = np.ones(capacity, dtype=np.float32)
+            scales[: self._size] = self._scales[: self._size]
+            self._scales = scales
+        self._exact.flush()
+        self._map_exact(capacity, self._dim)
+
+    def _store_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if self._scales is not None:
+            self._codes[rows], self._scales[rows] = quantize_int8(vectors)
+        else:
+            self._codes[rows] = vectors.astype(np.float16)
+        self._exact[rows] = vectors
+
+    def _scorer(self, size: int) -> Callable[[np.ndarray | None, np.ndarray], np.ndarray]:
+        codes = self._codes[:size]
+        scales = self._scales[:size] if self._scales is not None else None
+        block = self.block_rows
+
+        def score(rows: np.ndarray | None, queries: np.ndarray) -> np.ndarray:
+            n = size if rows is None else rows.size
+            out = np.empty((n, len(queries)), dtype=np.float32)
+            # 分块反量化，避免一次性生成整张 float32 矩阵
+            for start in range(0, n, block):
+                stop = min(start + block, n)
+                if rows is None:
+                    chunk, chunk_scales = codes[start:stop], None if scales is None else scales[start:stop]
+                else:
+                    picked = rows[start:stop]
+                    chunk, chunk_scales = codes[picked], None if scales is None else scales[picked]
+                part = chunk.astype(np.float32) @ queries.T
+                if chunk_scales is not None:
+                    part *= chunk_scales[:, None]
+                out[start:stop] = part
+            return out
+
+        return score
+
+    def flush(self) -> None:
+        """把映射文件中的全精度向量写回磁盘。"""
+        with self._lock:
+            if self._exact is not None:
+                self._exact.flush()
+
+    # ------------------------------------------------------------------
+    # 检索
+    # ------------------------------------------------------------------
+    def _search_rows(
+        self,
+        query_vectors: Sequence[Sequence[float]] | np.ndarray,
+        k: int,
+        filter: DocFilter | None = None,  # noqa: A002
+        where: Where | None = None,
+    ) -> list[list[tuple[Document, float]]]:
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        # 映射文件与候选行取自同一个快照，并发写入扩容后候选行不会超出 exact 的范围
+        with self._lock:
+            snapshot = self._snapshot(where)
+            exact = self._exact
+        if snapshot is None:
+            return [[] for _ in queries]
+        rows, scores, docs = self._candidates(queries, where, snapshot)
+        results: list[list[tuple[Document, float]]] = []
+        for j in range(len(queries)):
+            # 近似分数取前 k × rescore_factor 个候选，用全精度向量重排；
+            # 可调用过滤剔除过多导致不足 k 个时扩大候选范围
+            want = max(k, 1) * self.rescore_factor
+            while True:
+                order = top_k_indices(scores[:, j], min(want, rows.size))
+                candidates = rows[order]
+                hits = self._select(candidates, exact[candidates] @ queries[j], docs, k, filter)
+                if len(hits) >= k or order.size == rows.size:
+                    break
+                want *= 4
+            results.append([(docs[row], score) for row, score in hits if docs[row] is not None])
+        return results
+
+    # ------------------------------------------------------------------
+    # 评估
+    # ------------------------------------------------------------------
+    def memory_usage(self) -> dict[str, Any]:
+        """常驻的编码字节数，以及同样行数下 float32 矩阵的字节数。"""
+        with self._lock:
+            if self._dim is None:
+                return {"storage": self.storage, "rows": 0, "resident_bytes": 0,
+                        "float32_bytes": 0, "mmap_bytes": 0, "compression": 0.0}
+            rows = self._size
+            resident = self._codes[:rows].nbytes
+            if self._scales is not None:
+                resident += self._scales[:rows].nbytes
+            float32_bytes = rows * self._dim * 4
+        return {
+            "storage": self.storage,
+            "rows": rows,
+            "resident_bytes": resident,
+            "float32_bytes": float32_bytes,
+            "mmap_bytes": float32_bytes,
+            "compression": float32_bytes / resident if resident else 0.0,
+        }
+
+    def measure_recall(
+        self,
+        query_vectors: Sequence[Sequence[float]] | np.ndarray,
+        k: int = 10,
+    ) -> dict[str, Any]:
+        """以全精度精确检索为基准，返回重排前后的 recall@k 与平均查询耗时（毫秒）。"""
+        if not self._row_of:
+            raise ValueError("向量库为空，无法评估召回")
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_vectors, dtype=np.float32)))
+        with self._lock:
+            size = self._size
+            exact = self._exact[:size]
+            alive = np.flatnonzero(self._alive[:size])
+            score = self._scorer(size)
+        k = min(k, alive.size)
+
+        start = time.perf_counter()
+        exact_scores = (exact @ queries.T)[alive]
+        truth = [set(alive[top_k_indices(exact_scores[:, j], k)].tolist()) for j in range(len(queries))]
+        exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        approx_scores = score(None, queries)[alive]
+        first_pass = [set(alive[top_k_indices(approx_scores[:, j], k)].tolist()) for j in range(len(queries))]
+
+        start = time.perf_counter()
+        results = self._search_rows(queries, k)
+        search_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        rescored = [{self._row_of[doc.id] for doc, _ in hits if doc.id in self._row_of} for hits in results]
+
+        total = k * len(queries)
+        return {
+            "storage": self.storage,
+            "k": k,
+            "rescore_factor": self.rescore_factor,
+            "first_pass_recall": sum(len(a & t) for a, t in zip(first_pass, truth)) / total,
+            "recall": sum(len(a & t) for a, t in zip(rescored, truth)) / total,
+            "search_ms": search_ms,
+            "exact_ms": exact_ms,
+        }
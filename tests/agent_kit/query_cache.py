@@ -0,0 +1,201 @@
+"""
+查询向量的 LRU + TTL 缓存，位于 retrieve_context 的热路径上。
+
+ReAct Agent 在同一轮对话（以及不同用户之间）经常用相同或仅大小写/全半角/空白
+不同的问题重复检索。缓存以 (规范化文本, model, dimensions) 为键，命中时不再发起
+embed_query 网络请求。规范化只用于构造键，未命中时嵌入调用方给出的原文，
+包上缓存不会改变大小写敏感的查询（如产品编号）的检索结果。缓存可跨线程、跨 asyncio 任务共享；同一个键并发未命中时
+只发起一次请求，其余调用等待结果。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Generic, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+V = TypeVar("V")
+
+
+def normalize_query(text: str) -> str:
+    """全半角折叠（NFKC）、去首尾空白、合并连续空白、转小写。"""
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def embed_queries(embeddings: Embeddings, texts: list[str]) -> list[list[float]]:
+    """一次请求嵌入多条查询；Embeddings 未提供 embed_queries 时退化为 embed_documents。"""
+    if not texts:
+        return []
+    batch = getattr(embeddings, "embed_queries", None)
+    if batch is not None:
+        return batch(texts)
+    return embeddings.embed_documents(texts)
+
+
+class LRUCache(Generic[V]):
+    """线程安全的 LRU + TTL 缓存，记录命中统计。"""
+
+    def __init__(self, max_size: int = 4096, ttl: float | None = 3600.0):
+        if max_size < 1:
+            raise ValueError("max_size 必须大于 0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict[tuple, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> V | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or now - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value: V) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            size = len(self._data)
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_ratio": self.hit_ratio,
+        }
+
+
+class QueryEmbeddingCache(LRUCache[list[float]]):
+    """查询向量缓存，键为 (规范化文本, model, dimensions)，值为向量。"""
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """为 embed_query 加一层内存缓存，embed_documents 直接透传。"""
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache | None = None):
+        self.embeddings = embeddings
+        self.cache = cache or QueryEmbeddingCache()
+        self.model = getattr(embeddings, "model", embeddings.__class__.__name__)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+        # 进行中的请求：同一个键并发未命中时只请求一次
+        self._inflight: dict[tuple, Future[list[float]]] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _key(self, normalized: str) -> tuple:
+        return (normalized, self.model, self.dimensions)
+
+    def _claim(self, key: tuple) -> tuple[Future[list[float]], bool]:
+        """返回 (future, 是否由当前调用方负责请求)。"""
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _settle(self, key: tuple, future: Future[list[float]], vector: list[float] | None, error: BaseException | None) -> None:
+        if vector is not None:
+            self.cache.put(key, vector)
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(vector)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(normalize_query(text))
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        try:
+            vector = self.embeddings.embed_query(text)
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, vector, None)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key(normalize_query(text))
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        future, owner = self._claim(key)
+        if not owner:
+            return await asyncio.wrap_future(future)
+        try:
+            vector = await self.embeddings.aembed_query(text)
+        except BaseException as e:
+            self._settle(key, future, None, e)
+            raise
+        self._settle(key, future, vector, None)
+        return vector
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """批量查询：逐条查缓存，未命中的（去重后）合并为一次请求。"""
+        keys = [self._key(normalize_query(text)) for text in texts]
+        # 每个键嵌入第一次出现的原文
+        originals = dict(reversed(list(zip(keys, texts))))
+        found: dict[tuple, list[float]] = {}
+        missing: list[tuple] = []
+        for key in dict.fromkeys(keys):
+            vector = self.cache.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                found[key] = vector
+        if missing:
+            vectors = embed_queries(self.embeddings, [originals[key] for key in missing])
+            for key, vector in zip(missing, vectors):
+                self.cache.put(key, vector)
+                found[key] = vector
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
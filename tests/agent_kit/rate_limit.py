@@ -0,0 +1,128 @@
+"""
+调用模型接口时的限流与退避。
+
+- TokenBucket：令牌桶，按每分钟额度匀速补充，桶容量决定允许的突发量；
+- RateLimiter：同时限制 每分钟请求数 与 每分钟 token 数，收到 429 时整体暂停并降速，
+  之后每次成功逐步恢复到配置的额度（加性增、乘性减），长时间运行时稳定在服务端的持续限额附近；
+- RetryPolicy：带完全抖动（full jitter）的指数退避，服务端给出 Retry-After 时不早于该时间重试。
+
+限流器只在同一个事件循环内使用（Embeddings 的后台循环），不做跨线程同步。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：中文约 1 字 1 token（3 字节），英文约 4 字符 1 token，按 UTF-8 字节数 / 3 取偏大的估计。"""
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+class TokenBucket:
+    """每分钟补充 per_minute 个令牌，最多积攒 burst_seconds 秒的额度。"""
+
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        if per_minute <= 0 or burst_seconds <= 0:
+            raise ValueError("per_minute 与 burst_seconds 必须大于 0")
+        self.per_minute = per_minute
+        self.burst_seconds = burst_seconds
+        # 限流降速时按比例缩小补充速度，不改变配置的额度
+        self.scale = 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """当前每秒补充的令牌数。"""
+        return self.per_minute * self.scale / 60.0
+
+    @property
+    def capacity(self) -> float:
+        return self.per_minute * self.burst_seconds / 60.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """取走 amount 个令牌还需等待的秒数；超过桶容量的请求等桶满即可放行。"""
+        self._refill()
+        deficit = min(amount, self.capacity) - self._tokens
+        return max(0.0, deficit / self.rate)
+
+    def take(self, amount: float) -> None:
+        # 允许透支，超大请求之后的请求相应多等一会儿
+        self._refill()
+        self._tokens -= amount
+
+
+class RateLimiter:
+    """请求数与 token 数两个令牌桶；任一项为 None 表示不限制。"""
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        burst_seconds: float = 10.0,
+        min_scale: float = 0.1,
+        recovery: float = 0.05,
+    ):
+        self._requests = TokenBucket(requests_per_minute, burst_seconds) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute, burst_seconds) if tokens_per_minute else None
+        self.min_scale = min_scale
+        self.recovery = recovery
+        self._resume_at = 0.0
+        self._lock: asyncio.Lock | None = None
+        self.throttled = 0
+
+    @property
+    def buckets(self) -> list[TokenBucket]:
+        return [b for b in (self._requests, self._tokens) if b is not None]
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """等到可以发出一次约 tokens 个 token 的请求；按到达顺序放行。"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = self._resume_at - time.monotonic()
+                if self._requests is not None:
+                    wait = max(wait, self._requests.wait_time(1))
+                if self._tokens is not None:
+                    wait = max(wait, self._tokens.wait_time(tokens))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(tokens)
+
+    def throttle(self, pause: float = 0.0) -> None:
+        """收到 429：所有请求暂停 pause 秒，补充速度减半。"""
+        self.throttled += 1
+        self._resume_at = max(self._resume_at, time.monotonic() + pause)
+        for bucket in self.buckets:
+            bucket.scale = max(self.min_scale, bucket.scale * 0.5)
+
+    def reward(self) -> None:
+        """请求成功：补充速度逐步恢复到配置的额度。"""
+        for bucket in self.buckets:
+            bucket.scale = min(1.0, bucket.scale + self.recovery)
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = 6
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """第 attempt 次重试（从 0 开始）前的等待秒数：在 [0, min(max_delay, base·2^attempt)] 内均匀抖动。"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return max(random.uniform(0, ceiling), retry_after or 0.0)
@@ -0,0 +1,232 @@
+"""
+关键词规则路由：把路由表编译成 Aho–Corasick 自动机，一次扫描问题文本即可找出所有命中的关键词。
+
+每条路由有几百个关键词时，把它们拼成 a|b|c 的正则既慢又难维护；自动机的匹配时间只与问题长度有关，
+与关键词数量无关（短问题在微秒级）。路由表为 JSON 或 YAML：
+
+    {
+      "default": "chat",
+      "routes": {
+        "tool": {"priority": 10, "weight": 1.0, "keywords": ["天气", "weather", {"keyword": "气温", "weight": 2}]},
+        "chat": {"keywords": ["你好"]}
+      }
+    }
+
+选路：在命中的路由中先比 priority，再比得分（路由 weight × 命中的不同关键词的 weight 之和），
+仍相同时按表中顺序；都未命中时走 default。关键词与问题都先经 normalize_query 规范化（全半角、大小写）。
+
+RuleRouter 可直接作为 add_conditional_edges 的路由函数；路由表文件修改后自动热加载（按 reload_interval
+检查修改时间，加载失败时保留旧表），hits 记录每条路由的命中次数。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+from .query_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class AhoCorasick:
+    """纯 Python 的 Aho–Corasick 自动机，匹配结果为模式的序号。"""
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = patterns
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        for index, pattern in enumerate(patterns):
+            if pattern:
+                self._insert(pattern, index)
+        self._link()
+
+    def _insert(self, pattern: str, index: int) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (index,)
+
+    def _link(self) -> None:
+        # 广度优先计算失败指针，并把失败链上的输出合并到每个状态
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int]]:
+        """产出 (结束位置, 模式序号)，包含重叠的匹配。"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in out[state]:
+                yield pos, index
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    priority: int = 0
+    weight: float = 1.0
+
+
+class RuleTable:
+    """编译后的路由表，创建后不再修改，热加载时整体替换。"""
+
+    def __init__(self, spec: Mapping[str, Any]):
+        routes = spec.get("routes")
+        if not isinstance(routes, Mapping) or not routes:
+            raise ValueError("路由表缺少 routes")
+        self.routes: dict[str, Route] = {}
+        self.default: str = spec.get("default", next(iter(routes)))
+        # 同一关键词可以属于多条路由：关键词 -> [(路由, 权重)]
+        keywords: dict[str, list[tuple[str, float]]] = {}
+        for name, rule in routes.items():
+            rule = rule or {}
+            self.routes[name] = Route(name, int(rule.get("priority", 0)), float(rule.get("weight", 1.0)))
+            for item in rule.get("keywords", ()):
+                if isinstance(item, Mapping):
+                    keyword, weight = item["keyword"], float(item.get("weight", 1.0))
+                else:
+                    keyword, weight = item, 1.0
+                keyword = normalize_query(str(keyword))
+                if keyword:
+                    keywords.setdefault(keyword, []).append((name, weight))
+        self.keywords = list(keywords)
+        self._targets = [keywords[k] for k in self.keywords]
+        self._order = {name: i for i, name in enumerate(self.routes)}
+        self.automaton = AhoCorasick(self.keywords)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "RuleTable":
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix in (".yaml", ".yml"):
+            import yaml
+
+            return cls(yaml.safe_load(text))
+        return cls(json.loads(text))
+
+    def scores(self, text: str) -> dict[str, float]:
+        """每条命中路由的得分；同一关键词出现多次只计一次。"""
+        seen: set[int] = set()
+        scores: dict[str, float] = {}
+        for _, index in self.automaton.iter_matches(normalize_query(text)):
+            if index in seen:
+                continue
+            seen.add(index)
+            for name, weight in self._targets[index]:
+                scores[name] = scores.get(name, 0.0) + weight * self.routes[name].weight
+        return scores
+
+    def route(self, text: str) -> str:
+        scores = self.scores(text)
+        if not scores:
+            return self.default
+        return max(scores, key=lambda name: (self.routes[name].priority, scores[name], -self._order[name]))
+
+
+class RuleRouter:
+    """可热加载的规则路由；作为路由函数时读取最后一条消息的文本。
+
+    热加载不会改动已编译的图：新增路由名时需要同时在 add_conditional_edges 的 path_map 中加上对应的边。
+    """
+
+    def __init__(self, source: str | Path | Mapping[str, Any], reload_interval: float | None = 1.0):
+        self.path = None if isinstance(source, Mapping) else Path(source)
+        self.reload_interval = reload_interval
+        self.hits: Counter[str] = Counter()
+        self.reloads = 0
+        self.reload_errors = 0
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        if self.path is None:
+            self._mtime = None
+            self.table = RuleTable(source)
+        else:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self.table = RuleTable.load(self.path)
+
+    @property
+    def routes(self) -> list[str]:
+        """当前路由表中的全部路由名，可用作 add_conditional_edges 的 path_map。"""
+        return list(self.table.routes)
+
+    def reload(self) -> bool:
+        """路由表文件有修改时重新编译；失败时保留旧表。返回是否替换了路由表。"""
+        if self.path is None:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            # 编辑器保存时文件可能短暂不存在，下次再检查
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            table = RuleTable.load(self.path)
+        except Exception as e:
+            logger.warning("路由表 %s 加载失败，继续使用旧表：%s", self.path, e)
+            self.reload_errors += 1
+            # 同一个坏版本不再反复尝试
+            self._mtime = mtime
+            return False
+        self._mtime = mtime
+        self.table = table
+        self.reloads += 1
+        return True
+
+    def _maybe_reload(self) -> None:
+        if self.path is None or self.reload_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._checked_at >= self.reload_interval:
+                self._checked_at = now
+                self.reload()
+
+    def route(self, text: str) -> str:
+        self._maybe_reload()
+        name = self.table.route(text)
+        with self._lock:
+            self.hits[name] += 1
+        return name
+
+    def __call__(self, state: Mapping[str, Any], config: Any = None) -> str:
+        return self.route(state["messages"][-1].content)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = dict(self.hits)
+        return {
+            "hits": hits,
+            "keywords": len(self.table.keywords),
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
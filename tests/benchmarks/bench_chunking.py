@@ -0,0 +1,144 @@
+"""
+切分吞吐基准：agent_kit.chunking 的各策略 vs 原有的三种切分方式。
+
+用法：
+    python tests/benchmarks/bench_chunking.py --size-mb 1024 --baseline-mb 64
+
+生成一个混合 FAQ 块与中文长段落的合成语料，每种方法在独立子进程中运行，
+输出 MB/s、块数以及子进程的峰值 RSS。chunking 的策略直接 mmap 文件；
+原有方法需要先把文件整体读成字符串。RecursiveCharacterTextSplitter 很慢，
+原有方法只处理前 --baseline-mb MB（按吞吐比较，不影响结论）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent_kit.chunking import iter_spans, open_text  # noqa: E402
+from agent_kit.qa_parser import split_on_blank  # noqa: E402
+
+
+SENTENCES = [
+    "公司实行弹性打卡制度，员工需在每天十点前完成签到。",
+    "如遇系统故障导致缺卡，请在三个工作日内提交补卡申请！",
+    "报销单据需经部门负责人审批后再提交财务组。",
+    "请问产品编号 SKU-1024 的库存还有多少？",
+    "The quick brown fox jumps over the lazy dog.",
+    "仓库盘点每月进行一次，盘点期间暂停出入库；",
+]
+
+
+def write_corpus(path: Path, size_mb: int, seed: int = 0) -> None:
+    """写入约 size_mb MB 的语料：FAQ 块与长段落交替，块之间以空行分隔。"""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    pieces = []
+    for i in range(2000):
+        if i % 2:
+            pieces.append(
+                f"问题:第{i}个问题是什么？\n答案:{''.join(rng.choices(SENTENCES, k=rng.randint(1, 4)))}\n"
+                f"权限:IT组、运维组\n关键词:关键词{i % 50}\n\n"
+            )
+        else:
+            pieces.append("".join(rng.choices(SENTENCES, k=rng.randint(5, 30))) + "\n\n")
+    block = "".join(pieces).encode("utf-8")
+    with path.open("wb") as f:
+        written = 0
+        while written < target:
+            f.write(block)
+            written += len(block)
+
+
+def simple_chunk_text(text, chunk_size=300, overlap=50):
+    """smolagent 示例中的原实现。"""
+    chunks = []
+    start = 0
+    text_len = len(text)
+    while start < text_len:
+        end = min(start + chunk_size, text_len)
+        chunks.append(text[start:end])
+        if end == text_len:
+            break
+        start = end - overlap
+    return chunks
+
+
+def _read_prefix(path: Path, limit_mb: int) -> str:
+    with path.open("rb") as f:
+        return f.read(limit_mb * 1024 * 1024).decode("utf-8", errors="ignore")
+
+
+def run_method(name: str, path: str, baseline_mb: int) -> tuple[float, int, float, int]:
+    """子进程入口，返回 (秒, 块数, 处理的 MB, 峰值 RSS KB)。"""
+    path = Path(path)
+    start = time.perf_counter()
+    if name.startswith("chunking."):
+        strategy = name.split(".", 1)[1]
+        count = 0
+        with open_text(path) as buf:
+            # 只取偏移，按需才解码；这里解码每一块，与原方法产出字符串的工作量对齐
+            for span in iter_spans(buf, strategy):
+                span.decode(buf)
+                count += 1
+            size_mb = len(buf) / 1024 / 1024
+    else:
+        text = _read_prefix(path, baseline_mb)
+        size_mb = len(text.encode("utf-8")) / 1024 / 1024
+        if name == "split_on_blank":
+            count = sum(1 for _ in split_on_blank(text))
+        elif name == "simple_chunk_text":
+            count = len(simple_chunk_text(text))
+        else:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+            splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=50)
+            count = len(splitter.split_text(text))
+    seconds = time.perf_counter() - start
+    return seconds, count, size_mb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+METHODS = [
+    "chunking.blank",
+    "chunking.qa",
+    "chunking.sentence",
+    "chunking.window",
+    "split_on_blank",
+    "simple_chunk_text",
+    "RecursiveCharacterTextSplitter",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--baseline-mb", type=int, default=64)
+    parser.add_argument("--methods", nargs="*", default=METHODS)
+    args = parser.parse_args()
+
+    # spawn：每个方法在干净的子进程中运行，峰值 RSS 互不影响
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "corpus.txt"
+        write_corpus(path, args.size_mb)
+        print(f"语料：{path.stat().st_size / 1024 / 1024:.0f} MB")
+        print(f"{'method':<32} {'MB':>8} {'seconds':>9} {'MB/s':>8} {'chunks':>10} {'peak RSS MB':>12}")
+        for name in args.methods:
+            with ctx.Pool(1) as pool:
+                seconds, count, size_mb, rss_kb = pool.apply(run_method, (name, str(path), args.baseline_mb))
+            print(
+                f"{name:<32} {size_mb:>8.0f} {seconds:>9.2f} {size_mb / seconds:>8.1f} "
+                f"{count:>10} {rss_kb / 1024:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+入库基准：用离线的 Embedding 替身服务压测 test_agent_rag.build_retriever 的完整入库路径。
+
+用法：
+    python tests/benchmarks/bench_ingest.py --sizes 1000 10000 100000 --latency-ms 30 --jitter-ms 20
+    python tests/benchmarks/bench_ingest.py --sizes 1000000 --backend int8 --json ingest.json
+
+替身服务（fake_embedding_server）在独立进程中运行，可配置延迟、限流与错误注入；
+每个规模的语料在干净的子进程中入库（Embedding 缓存与 FAISS 目录都指向临时目录，不会命中旧数据），
+输出 chunks/s、单批请求延迟的 p50/p99（客户端视角，只统计成功的请求）、重试次数与子进程峰值 RSS。
+--json 把结果写入文件，便于与历史结果对比。
+
+注意：向量维度为 1024，100 万块在 matrix 后端需要约 4GB 内存，可用 --backend int8。
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_embedding_server import ServerConfig, parse_args as parse_server_args, start  # noqa: E402
+
+
+WORDS = [
+    "考勤", "打卡", "报销", "审批", "仓库", "盘点", "出差", "补卡", "年假", "事假", "工资", "发票",
+    "合同", "采购", "入职", "离职", "培训", "绩效", "加班", "调休", "社保", "公积金", "门禁", "网络",
+]
+GROUPS = ["IT组", "运维组", "运营组", "财务组", "人事组"]
+
+
+def write_corpus(folder: Path, n_chunks: int, per_file: int = 1000, seed: int = 0) -> None:
+    """生成 n_chunks 个互不相同的 问题/答案/权限/关键词 块，每个文件 per_file 块。"""
+    rng = random.Random(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    for start_idx in range(0, n_chunks, per_file):
+        blocks = []
+        for i in range(start_idx, min(start_idx + per_file, n_chunks)):
+            topic = "".join(rng.choices(WORDS, k=3))
+            answer = "，".join("".join(rng.choices(WORDS, k=rng.randint(2, 5))) for _ in range(rng.randint(2, 8)))
+            blocks.append(
+                f"问题:编号{i}的{topic}流程是什么？\n答案:{answer}。\n"
+                f"权限:{'、'.join(rng.sample(GROUPS, rng.randint(0, 2)))}\n关键词:{topic}"
+            )
+        (folder / f"faq_{start_idx // per_file:05d}.txt").write_text("\n\n".join(blocks), encoding="utf-8")
+
+
+def serve(config: ServerConfig, ports: mp.Queue) -> None:
+    """替身服务进程入口。"""
+    import asyncio
+
+    async def main() -> None:
+        _, port = await start(config)
+        ports.put(port)
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def run_ingest(data_dir: str, work_dir: str, base_url: str, backend: str, lexical: bool, dedup: float | None) -> dict:
+    """子进程入口：通过 build_retriever 入库，返回计时与延迟分布。"""
+    os.environ.update({
+        "DASHSCOPE_BASE_URL": base_url,
+        "DASHSCOPE_API_KEY": "fake",
+        "EMBEDDING_CACHE_PATH": str(Path(work_dir) / "embedding_cache.sqlite"),
+        "FAISS_DB_DIR": str(Path(work_dir) / "faiss_db"),
+        "BM25_DB_DIR": str(Path(work_dir) / "bm25_db"),
+    })
+    from agent_kit.embeddings import DashScopeEmbeddings
+    import test_agent_rag
+
+    # 只在基准进程内给单批请求计时，不改变请求本身
+    latencies: list[float] = []
+    original = DashScopeEmbeddings._embed_batch
+
+    async def timed(self, batch):
+        t0 = time.perf_counter()
+        vectors = await original(self, batch)
+        latencies.append(time.perf_counter() - t0)
+        return vectors
+
+    DashScopeEmbeddings._embed_batch = timed
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        retriever = test_agent_rag.build_retriever(Path(data_dir), backend=backend, lexical=lexical, dedup_threshold=dedup)
+    seconds = time.perf_counter() - start_time
+    lat = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "chunks": len(retriever.vector_store),
+        "seconds": seconds,
+        "chunks_per_second": len(retriever.vector_store) / seconds,
+        "batches": len(latencies),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backend", default="matrix", choices=["matrix", "faiss", "int8", "float16"])
+    parser.add_argument("--no-lexical", dest="lexical", action="store_false", help="不建 BM25 索引")
+    parser.add_argument("--dedup", type=float, default=None, help="近似去重阈值，默认不去重")
+    parser.add_argument("--json", type=Path, default=None, help="结果写入的 JSON 文件")
+    args, extra = parser.parse_known_args()
+    # 其余参数交给替身服务：--latency-ms、--jitter-ms、--rpm、--tpm、--error-rate 等
+    _, config = parse_server_args(extra)
+
+    ctx = mp.get_context("spawn")
+    ports: mp.Queue = ctx.Queue()
+    server = ctx.Process(target=serve, args=(config, ports), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{ports.get(timeout=30)}/v1"
+    print(f"替身服务：{base_url}  {asdict(config)}")
+    print(f"{'chunks':>9} {'seconds':>9} {'chunks/s':>10} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'429':>6} {'5xx':>6} {'peak RSS MB':>12}")
+
+    results = []
+    try:
+        for size in args.sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                data_dir = Path(tmp) / "files"
+                write_corpus(data_dir, size)
+                before = httpx.get(base_url.removesuffix("/v1") + "/stats").json()
+                with ctx.Pool(1) as pool:
+                    result = pool.apply(run_ingest, (str(data_dir), tmp, base_url, args.backend, args.lexical, args.dedup))
+                after = httpx.get(base_url.removesuffix("/v1") + "/stats").json()
+            result.update({
+                "size": size,
+                "rate_limited": after["rate_limited"] - before["rate_limited"],
+                "server_errors": after["errors"] - before["errors"],
+            })
+            results.append(result)
+            print(f"{result['chunks']:>9} {result['seconds']:>9.2f} {result['chunks_per_second']:>10.0f} "
+                  f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['rate_limited']:>6} "
+                  f"{result['server_errors']:>6} {result['peak_rss_mb']:>12.0f}")
+    finally:
+        server.terminate()
+
+    if args.json is not None:
+        report = {
+            "backend": args.backend,
+            "lexical": args.lexical,
+            "dedup": args.dedup,
+            "server": asdict(config),
+            "results": results,
+        }
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+意图分类基准：两级分类器（关键词规则 + 本地最近质心 + LLM 兜底）对比只用 LLM 的分类路径。
+
+用法：
+    python tests/benchmarks/bench_intent.py                    # 离线，LLM 用固定延迟的替身
+    python tests/benchmarks/bench_intent.py --llm-latency-ms 1200 --repeat 3 --json intent.json
+    python tests/benchmarks/bench_intent.py --real             # 调用真实 LLM（需要 .env）
+
+离线模式下 LLM 替身等待 --llm-latency-ms 后返回标注答案，即假设 LLM 全部分对：
+llm-only 的准确率是上限，tiered 与它的差距就是本地分类带来的误判。
+评测集与 test_multi_intention_graph.INTENT_EXAMPLES 中的样例不重叠。
+--repeat > 1 时重复整个评测集，后几轮命中按规范化问题的结果缓存。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+EVAL_SET = [
+    ("今天北京天气如何", "weather"), ("明天武汉下不下雨", "weather"), ("上海这几天气温多少", "weather"),
+    ("周末杭州天气好吗？", "weather"), ("外面冷吗", "weather"), ("要不要带伞出门", "weather"),
+    ("西安明天刮风吗", "weather"), ("三亚现在热不热", "weather"), ("重庆今天雾霾严重吗", "weather"),
+    ("后天会下雪吗", "weather"), ("天津最高温度多少", "weather"), ("今天紫外线强不强", "weather"),
+    ("晚上会不会变冷", "weather"), ("哈尔滨现在几度", "weather"), ("明早有雾吗", "weather"),
+    ("帮我算一下 99*99", "math"), ("123+456等于多少", "math"), ("1024 除以 16", "math"),
+    ("7 的平方是多少", "math"), ("250 乘以 4", "math"), ("3.14*2*5", "math"), ("2^8 是多少", "math"),
+    ("八十减去二十五", "math"), ("1 加到 10 是多少", "math"), ("一百的百分之十五", "math"),
+    ("根号 144", "math"), ("(3+5)*2", "math"), ("60 的三分之一", "math"), ("365 天是多少周", "math"),
+    ("5 个苹果每个 3 元一共多少钱", "math"),
+    ("你好", "chat"), ("你是谁", "chat"), ("给我讲个故事", "chat"), ("推荐几部电影", "chat"),
+    ("怎么提高写作水平", "chat"), ("帮我写一封感谢信", "chat"), ("我有点累", "chat"),
+    ("学编程从哪开始", "chat"), ("晚安", "chat"), ("周末去哪玩比较好", "chat"), ("Python 和 Java 哪个好学", "chat"),
+    ("给我起个英文名", "chat"), ("你喜欢什么颜色", "chat"), ("如何缓解压力", "chat"), ("早上好呀", "chat"),
+    # 复合问题：标注为按 INTENTIONS 顺序以 + 连接的意图
+    ("北京天气怎么样，顺便算一下 123+456", "weather+math"), ("上海明天下雨吗？另外 15 乘以 4 是多少", "weather+math"),
+]
+
+
+def oracle_llm(latency_ms: float):
+    """LLM 替身：固定延迟后返回标注答案。"""
+    labels = dict(EVAL_SET)
+
+    def classify(text: str) -> str:
+        time.sleep(latency_ms / 1000)
+        return labels.get(text, "chat")
+
+    return classify
+
+
+def normalize_intents(answer: str, labels, default: str) -> str:
+    """把 LLM 的回答（如 "weather,math"）按 tiered 路径的解析方式转成以 + 连接的意图。"""
+    found = set(re.findall(r"[a-z_]+", answer.lower()))
+    return "+".join(label for label in labels if label in found) or default
+
+
+def run(name: str, classify, queries: list[tuple[str, str]]) -> dict:
+    latencies, correct = [], 0
+    start = time.perf_counter()
+    for text, label in queries:
+        t0 = time.perf_counter()
+        intent = classify(text)
+        latencies.append(time.perf_counter() - t0)
+        correct += intent == label
+    seconds = time.perf_counter() - start
+    lat = np.asarray(latencies) * 1000
+    return {
+        "path": name,
+        "queries": len(queries),
+        "accuracy": correct / len(queries),
+        "qps": len(queries) / seconds,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="离线 LLM 替身的单次延迟")
+    parser.add_argument("--real", action="store_true", help="调用真实 LLM 代替替身")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", type=Path, default=None, help="结果写入的 JSON 文件")
+    args = parser.parse_args()
+
+    if not args.real:
+        # 离线时 test_multi_intention_graph 中的 ChatOpenAI 不会发起请求，只需要能构造
+        os.environ.setdefault("DASHSCOPE_API_KEY", "fake")
+    import test_multi_intention_graph as graph
+
+    llm = graph.llm_classify if args.real else oracle_llm(args.llm_latency_ms)
+    queries = EVAL_SET * args.repeat
+
+    if args.real:
+        from agent_kit.llm_cache import SQLiteLLMCache
+
+        cache_dir = tempfile.TemporaryDirectory()
+
+    results = []
+    misclassified = []
+    for name, fallback in (("llm-only", None), ("tiered", llm), ("local-only", None)):
+        if args.real:
+            # 每条路径换一个空的 LLM 响应缓存，tiered 不会命中 llm-only 刚写入的结果
+            graph.get_llm().cache.close()
+            graph.get_llm().cache = SQLiteLLMCache(Path(cache_dir.name) / f"{name}.sqlite")
+        if name == "llm-only":
+            classify = lambda text: normalize_intents(llm(text), graph.INTENTIONS, "chat")  # noqa: E731
+            tiers = {"fallback": len(queries)}
+        else:
+            classifier = graph.build_intent_classifier(fallback=fallback)
+            # 预测的意图集合与标注完全一致才算对
+            classify = lambda text: "+".join(classifier.classify(text).intents)  # noqa: E731
+        result = run(name, classify, queries)
+        if name != "llm-only":
+            tiers = classifier.stats()
+            for text, label in EVAL_SET:
+                intent = classify(text)
+                if intent != label:
+                    misclassified.append((name, text, intent, label))
+        result["tiers"] = {k: v for k, v in tiers.items() if k in ("rules", "centroid", "fallback", "cache")}
+        results.append(result)
+    if args.real:
+        graph.get_llm().cache.close()
+        cache_dir.cleanup()
+
+    print(f"{'path':<11} {'accuracy':>9} {'qps':>10} {'p50 ms':>9} {'p99 ms':>9}  tiers")
+    for r in results:
+        print(f"{r['path']:<11} {r['accuracy']:>9.3f} {r['qps']:>10.1f} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f}  {r['tiers']}")
+    for name, text, got, label in misclassified:
+        print(f"  [{name}] {text!r}: {got}（应为 {label}）")
+
+    if args.json is not None:
+        report = {"real_llm": args.real, "llm_latency_ms": None if args.real else args.llm_latency_ms, "results": results}
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+并行解析基准：在合成的 FAQ 文件上比较不同进程数的解析吞吐。
+
+用法：
+    python tests/benchmarks/bench_parallel_loader.py --files 2000 --blocks 200
+
+输出每个进程数下的耗时、块/秒以及相对单进程的加速比，并校验输出（正文、元数据与顺序）一致。
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent_kit.parallel_loader import iter_chunk_records  # noqa: E402
+
+
+GROUPS = ["IT组", "运维组", "运营组", "财务组", "人事组", "色卡组", "番禺大货仓"]
+
+
+def write_corpus(folder: Path, n_files: int, n_blocks: int, seed: int = 0) -> list[Path]:
+    """生成 问题/答案/权限/关键词 格式的合成文件。"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n_files):
+        blocks = []
+        for j in range(n_blocks):
+            perms = "、".join(rng.sample(GROUPS, rng.randint(0, 3)))
+            blocks.append(
+                f"问题:第{i}号文件的第{j}个问题是什么？\n"
+                f"答案:{'这是一个用于基准测试的答案。' * rng.randint(1, 6)}\n"
+                f"权限:{perms}\n"
+                f"关键词:关键词{j % 50}、主题{i % 20}"
+            )
+        path = folder / f"faq_{i:05d}.txt"
+        path.write_text("\n\n".join(blocks), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def run(paths: list[Path], workers: int) -> tuple[float, int, str]:
+    start = time.perf_counter()
+    count = 0
+    # 校验和覆盖正文与元数据，解析结果有任何差异（不只是顺序）都能发现
+    digest = hashlib.blake2b(digest_size=16)
+    for source, chunk_id, content, metadata in iter_chunk_records(paths, workers=workers):
+        count += 1
+        record = json.dumps([source, chunk_id, content, metadata], ensure_ascii=False, sort_keys=True)
+        digest.update(record.encode("utf-8") + b"\x1e")
+    return time.perf_counter() - start, count, digest.hexdigest()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= args.max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != args.max_workers:
+        worker_counts.append(args.max_workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_corpus(Path(tmp), args.files, args.blocks)
+        print(f"语料：{args.files} 个文件 × {args.blocks} 块，CPU 核数 {os.cpu_count()}")
+        print(f"{'workers':>8} {'seconds':>9} {'blocks/s':>12} {'speedup':>8}")
+        baseline = None
+        baseline_checksum = None
+        for workers in worker_counts:
+            seconds, count, checksum = run(paths, workers)
+            baseline = baseline or seconds
+            if baseline_checksum is None:
+                baseline_checksum = checksum
+            elif checksum != baseline_checksum:
+                raise RuntimeError(f"workers={workers} 的输出与单进程不一致")
+            print(f"{workers:>8} {seconds:>9.3f} {count / seconds:>12.0f} {baseline / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
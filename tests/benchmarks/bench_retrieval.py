@@ -0,0 +1,280 @@
+"""
+检索基准：随语料增长，各向量库的查询延迟、并发吞吐、每块内存与 recall@k。
+
+用法：
+    python tests/benchmarks/bench_retrieval.py --sizes 1000 10000 100000 --json retrieval.json
+    python tests/benchmarks/bench_retrieval.py --stores matrix faiss-hnsw chroma --concurrency 1 8 32
+
+语料是带簇结构的合成向量：先取若干簇中心，每个文档 = 中心 + 噪声，查询 = 某个文档再加噪声，
+真值由 NumPy 精确内积在全量（或权限过滤后的子集）上算出，因此最近邻已知。
+文本到向量用查表的 Embeddings 完成，不访问任何 Embedding 服务。
+
+每个文档按 test_auth_agent_rag 的格式带 permissions（0~2 个组，空表示公开）；
+--filter 同时测 "用户组 + 公开" 的权限过滤检索，各库使用各自的过滤方式：
+MatrixVectorStore / QuantizedVectorStore 用元数据索引 where，InMemoryVectorStore / FAISS 用过滤函数，
+Chroma 用 where 字典，Qdrant 用 payload Filter。
+
+每个 (向量库, 规模) 在独立子进程中运行，内存为建库前后的 RSS 差值除以块数。
+未安装的可选依赖（如 qdrant-client）会标记为 skipped。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+GROUPS = ["IT组", "运维组", "运营组", "财务组", "人事组"]
+USER_GROUP = "IT组"
+STORES = ["inmemory", "matrix", "int8", "faiss-flat", "faiss-hnsw", "chroma", "qdrant"]
+# Chroma 单次写入条数上限
+_CHROMA_BATCH = 5000
+
+
+class LookupEmbeddings(Embeddings):
+    """按文本查表返回预先生成的向量。"""
+
+    def __init__(self, texts: list[str], vectors: np.ndarray):
+        self._row = {text: i for i, text in enumerate(texts)}
+        self._vectors = vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._vectors[[self._row[t] for t in texts]].tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._vectors[self._row[text]].tolist()
+
+
+def make_corpus(size: int, n_queries: int, dim: int, seed: int = 0) -> dict[str, Any]:
+    """合成单位化的文档/查询向量、每个文档的权限组，以及 USER_GROUP 可见的文档掩码。"""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, size // 100)
+    centers = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    docs = centers[rng.integers(0, n_clusters, size)] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    queries = docs[rng.integers(0, size, n_queries)] + 0.3 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    permissions = [[str(g) for g in rng.choice(GROUPS, rng.integers(0, 3), replace=False)] for _ in range(size)]
+    allowed = np.array([not perms or USER_GROUP in perms for perms in permissions])
+    return {"docs": docs, "queries": queries, "permissions": permissions, "allowed": allowed}
+
+
+def ground_truth(docs: np.ndarray, queries: np.ndarray, k: int, mask: np.ndarray | None) -> list[set[int]]:
+    scores = queries @ docs.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def build_store(name: str, embedding: Embeddings, documents: list[Document]) -> tuple[Any, Callable[..., list[int]]]:
+    """建库并返回 (库, search(query, k, filtered) -> 文档序号列表)。"""
+    def allowed(doc: Document) -> bool:
+        perms = doc.metadata["permissions"]
+        return not perms or USER_GROUP in perms
+
+    if name == "inmemory":
+        from langchain_core.vectorstores import InMemoryVectorStore
+
+        store = InMemoryVectorStore(embedding)
+        store.add_documents(documents)
+
+        def search(query: str, k: int, filtered: bool) -> list[int]:
+            hits = store.similarity_search(query, k=k, filter=allowed if filtered else None)
+            return [doc.metadata["idx"] for doc in hits]
+
+    elif name in ("matrix", "int8"):
+        from agent_kit import MatrixVectorStore, QuantizedVectorStore
+
+        if name == "matrix":
+            store = MatrixVectorStore(embedding, indexed_fields=("permissions",))
+        else:
+            store = QuantizedVectorStore(embedding, storage="int8", indexed_fields=("permissions",))
+        store.add_documents(documents)
+        where = {"permissions": [USER_GROUP, None]}
+
+        def search(query: str, k: int, filtered: bool) -> list[int]:
+            hits = store.similarity_search(query, k=k, where=where if filtered else None)
+            return [doc.metadata["idx"] for doc in hits]
+
+    elif name.startswith("faiss-"):
+        from agent_kit.faiss_store import FaissVectorStore
+
+        store = FaissVectorStore(embedding, index_type=name.split("-", 1)[1])
+        store.add_documents(documents)
+
+        def search(query: str, k: int, filtered: bool) -> list[int]:
+            hits = store.similarity_search(query, k=k, filter=allowed if filtered else None)
+            return [doc.metadata["idx"] for doc in hits]
+
+    elif name == "chroma":
+        import chromadb
+        from langchain_chroma import Chroma
+
+        # Chroma 的元数据不支持列表，权限拆成布尔字段
+        flagged = [
+            Document(
+                page_content=doc.page_content,
+                metadata={
+                    "idx": doc.metadata["idx"],
+                    "public": not doc.metadata["permissions"],
+                    **{f"perm_{g}": g in doc.metadata["permissions"] for g in GROUPS},
+                },
+            )
+            for doc in documents
+        ]
+        store = Chroma(
+            # 同一进程内的 EphemeralClient 共享存储，每次建库用新的集合名
+            collection_name=f"bench-{uuid.uuid4().hex}",
+            embedding_function=embedding,
+            client=chromadb.EphemeralClient(),
+            collection_metadata={"hnsw:space": "cosine"},
+        )
+        for start in range(0, len(flagged), _CHROMA_BATCH):
+            store.add_documents(flagged[start : start + _CHROMA_BATCH])
+        where = {"$or": [{f"perm_{USER_GROUP}": True}, {"public": True}]}
+
+        def search(query: str, k: int, filtered: bool) -> list[int]:
+            hits = store.similarity_search(query, k=k, filter=where if filtered else None)
+            return [doc.metadata["idx"] for doc in hits]
+
+    elif name == "qdrant":
+        from langchain_qdrant import QdrantVectorStore
+        from qdrant_client import models
+
+        store = QdrantVectorStore.from_documents(
+            documents, embedding, location=":memory:", collection_name=f"bench-{uuid.uuid4().hex}",
+        )
+        condition = models.Filter(should=[
+            models.FieldCondition(key="metadata.permissions", match=models.MatchAny(any=[USER_GROUP])),
+            models.IsEmptyCondition(is_empty=models.PayloadField(key="metadata.permissions")),
+        ])
+
+        def search(query: str, k: int, filtered: bool) -> list[int]:
+            hits = store.similarity_search(query, k=k, filter=condition if filtered else None)
+            return [doc.metadata["idx"] for doc in hits]
+
+    else:
+        raise ValueError(f"未知的向量库：{name}")
+    return store, search
+
+
+def run_case(name: str, size: int, args: dict[str, Any]) -> list[dict[str, Any]]:
+    """子进程入口：建库并测量，返回 过滤/不过滤 两行结果。"""
+    k, dim = args["k"], args["dim"]
+    corpus = make_corpus(size, args["queries"], dim, args["seed"])
+    doc_texts = [f"doc-{i}" for i in range(size)]
+    query_texts = [f"query-{j}" for j in range(len(corpus["queries"]))]
+    embedding = LookupEmbeddings(doc_texts + query_texts, np.vstack([corpus["docs"], corpus["queries"]]))
+    documents = [
+        Document(page_content=text, metadata={"idx": i, "permissions": perms})
+        for i, (text, perms) in enumerate(zip(doc_texts, corpus["permissions"]))
+    ]
+
+    try:
+        # 先用少量文档建一次库，让模块导入与初始化不计入内存与建库耗时
+        build_store(name, embedding, documents[:10])
+    except ImportError as e:
+        return [{"store": name, "size": size, "skipped": f"缺少依赖：{e.name}"}]
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    _, search = build_store(name, embedding, documents)
+    build_seconds = time.perf_counter() - start
+    bytes_per_chunk = max(0, rss_bytes() - rss_before) / size
+
+    results = []
+    for filtered in ([False, True] if args["filter"] else [False]):
+        truth = ground_truth(corpus["docs"], corpus["queries"], k, corpus["allowed"] if filtered else None)
+        latencies = []
+        found = 0
+        for text, expected in zip(query_texts, truth):
+            t0 = time.perf_counter()
+            got = search(text, k, filtered)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found += len(set(got) & expected)
+        lat = np.asarray(latencies)
+
+        throughput = {}
+        for n in args["concurrency"]:
+            with ThreadPoolExecutor(n) as pool:
+                t0 = time.perf_counter()
+                list(pool.map(lambda q: search(q, k, filtered), query_texts))
+                throughput[str(n)] = len(query_texts) / (time.perf_counter() - t0)
+
+        results.append({
+            "store": name,
+            "size": size,
+            "filtered": filtered,
+            "k": k,
+            "recall": found / (k * len(truth)),
+            "p50_ms": float(np.percentile(lat, 50)),
+            "p95_ms": float(np.percentile(lat, 95)),
+            "p99_ms": float(np.percentile(lat, 99)),
+            "qps": throughput,
+            "build_seconds": build_seconds,
+            "bytes_per_chunk": bytes_per_chunk,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--stores", nargs="+", default=STORES, choices=STORES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--no-filter", dest="filter", action="store_false", help="不测权限过滤")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="结果写入的 JSON 文件")
+    args = parser.parse_args()
+    case_args = {k: getattr(args, k) for k in ("queries", "k", "dim", "concurrency", "filter", "seed")}
+
+    qps_cols = " ".join(f"{f'qps@{n}':>9}" for n in args.concurrency)
+    print(f"{'store':<11} {'size':>8} {'filter':>6} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{qps_cols} {'B/chunk':>9} {'build s':>8}")
+    # spawn：每个用例在干净的子进程中运行，RSS 互不影响
+    ctx = mp.get_context("spawn")
+    results: list[dict[str, Any]] = []
+    for size in args.sizes:
+        for name in args.stores:
+            with ctx.Pool(1) as pool:
+                rows = pool.apply(run_case, (name, size, case_args))
+            for row in rows:
+                results.append(row)
+                if "skipped" in row:
+                    print(f"{name:<11} {size:>8} skipped: {row['skipped']}")
+                    continue
+                qps = " ".join(f"{row['qps'][str(n)]:>9.0f}" for n in args.concurrency)
+                print(f"{name:<11} {size:>8} {'yes' if row['filtered'] else 'no':>6} {row['recall']:>7.3f} "
+                      f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {qps} "
+                      f"{row['bytes_per_chunk']:>9.0f} {row['build_seconds']:>8.2f}")
+
+    if args.json is not None:
+        report = {"config": {**case_args, "sizes": args.sizes, "stores": args.stores}, "results": results}
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
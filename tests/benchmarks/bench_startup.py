@@ -0,0 +1,258 @@
+"""
+启动基准：测量 Agent 模块的冷启动开销，发现 import 时加载重依赖、创建客户端或发起网络请求的回归。
+
+用法：
+    python tests/benchmarks/bench_startup.py
+    python tests/benchmarks/bench_startup.py --modules test_agent_rag --top 15 --json startup.json
+    python tests/benchmarks/bench_startup.py --budget-ms 200 --chat-latency-ms 300
+
+每个模块在干净的子进程中以 python -X importtime 运行，分三个阶段计时：
+- import：import 模块本身。列出按顶层包汇总的导入耗时与最慢的 --top 个模块；
+- warmup：调用模块的 warmup()（没有则跳过）；
+- first response：构建检索器 / 向量库并向 Agent 提第一个问题。模型与 Embedding 都指向进程内的
+  替身服务（fake_embedding_server），只测本地开销；test_rag 用内置文本代替抓取网页，
+  test_graphiti_v0 需要 Neo4j，不测这一阶段。
+time to first response 从启动子进程算起，包含解释器启动。
+
+预算检查（CI 中使用，任一项不满足时以状态 1 退出）：
+- import 阶段超过 --budget-ms；
+- import 阶段加载了 --forbid 中的包（默认 langchain、openai、bs4、numpy 等）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(TESTS_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+DEFAULT_MODULES = ["test_agent_rag", "test_rag", "test_graphiti_v0"]
+DEFAULT_FORBID = [
+    "langchain", "langchain_core", "langchain_openai", "langchain_community", "langgraph",
+    "openai", "httpx", "bs4", "numpy", "faiss", "graphiti_core",
+]
+PHASES = ("import", "warmup", "first_response")
+QUERY = "考勤缺卡怎么处理？"
+SAMPLE_TEXT = (
+    "Agent 通过工具调用扩展大模型的能力。当前的 Agent 在长程规划、错误恢复与成本控制上仍有局限。"
+    "检索增强生成把外部知识按需放入上下文，减少幻觉。"
+)
+_MARKER = "#bench-startup phase="
+
+
+# ---------------- 子进程 ----------------
+
+def _ask(agent) -> str:
+    result = agent.invoke({"messages": [{"role": "user", "content": QUERY}]})
+    return result["messages"][-1].content
+
+
+def _first_response_agent_rag(module) -> str:
+    retriever = module.build_retriever()
+    return _ask(module.create_react_agent(retriever))
+
+
+def _first_response_rag(module) -> str:
+    from langchain_core.documents import Document
+
+    store = module.build_vector_store([Document(page_content=SAMPLE_TEXT, metadata={"source": "bench"})])
+    return _ask(module.create_rag_agent(store))
+
+
+# 模块 -> 提出第一个问题的方式；不在表中的模块不测 first response
+FIRST_RESPONSE = {
+    "test_agent_rag": _first_response_agent_rag,
+    "test_rag": _first_response_rag,
+}
+
+
+def _mark(phase: str) -> None:
+    # 与 -X importtime 的输出写入同一个 stderr，按顺序切分各阶段导入的模块
+    sys.stderr.write(f"{_MARKER}{phase}\n")
+    sys.stderr.flush()
+
+
+def child(module_name: str) -> None:
+    """子进程入口：依次计时三个阶段，结果以 JSON 写到 stdout。"""
+    report: dict = {"module": module_name, "seconds": {}, "errors": {}}
+    module = None
+    for phase in PHASES:
+        _mark(phase)
+        start = time.perf_counter()
+        try:
+            # 模块自身的 print 不混入结果
+            with contextlib.redirect_stdout(io.StringIO()):
+                if phase == "import":
+                    module = importlib.import_module(module_name)
+                elif phase == "warmup":
+                    if not hasattr(module, "warmup"):
+                        continue
+                    module.warmup()
+                else:
+                    ask = FIRST_RESPONSE.get(module_name)
+                    if ask is None:
+                        continue
+                    report["answer"] = ask(module)
+                    report["answered_at"] = time.time()
+        except Exception as e:
+            report["errors"][phase] = f"{type(e).__name__}: {e}"
+            if phase == "import":
+                break
+            continue
+        report["seconds"][phase] = time.perf_counter() - start
+    _mark("end")
+    print(json.dumps(report, ensure_ascii=False))
+
+
+# ---------------- 主进程 ----------------
+
+def parse_importtime(stderr: str) -> dict[str, list[tuple[str, float]]]:
+    """把 -X importtime 的输出按阶段切分，每个阶段为 [(模块, 自身耗时 ms)]。"""
+    phases: dict[str, list[tuple[str, float]]] = defaultdict(list)
+    phase = None
+    for line in stderr.splitlines():
+        if line.startswith(_MARKER):
+            phase = line[len(_MARKER):]
+            continue
+        if phase is None or not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        phases[phase].append((fields[2].strip(), int(fields[0]) / 1000))
+    return phases
+
+
+def by_package(modules: list[tuple[str, float]]) -> dict[str, float]:
+    totals: dict[str, float] = defaultdict(float)
+    for name, ms in modules:
+        totals[name.split(".")[0]] += ms
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def measure(module_name: str, env: dict[str, str], top: int) -> dict:
+    cmd = [sys.executable, "-X", "importtime", str(Path(__file__).resolve()), "--child", module_name]
+    spawned_at = time.time()
+    proc = subprocess.run(cmd, cwd=TESTS_DIR, env=env, capture_output=True, text=True, timeout=600)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{module_name} 子进程失败（{proc.returncode}）：{proc.stderr[-2000:]}")
+    report = json.loads(lines[-1])
+    imports = parse_importtime(proc.stderr)
+    result = {
+        "module": module_name,
+        "import_ms": report["seconds"].get("import", 0.0) * 1000,
+        "warmup_ms": report["seconds"]["warmup"] * 1000 if "warmup" in report["seconds"] else None,
+        "first_response_ms": (
+            report["seconds"]["first_response"] * 1000 if "first_response" in report["seconds"] else None
+        ),
+        "time_to_first_response_ms": (
+            (report["answered_at"] - spawned_at) * 1000 if "answered_at" in report else None
+        ),
+        "errors": report["errors"],
+        "phases": {},
+    }
+    for phase in PHASES:
+        modules = imports.get(phase, [])
+        result["phases"][phase] = {
+            "modules": len(modules),
+            "import_ms": sum(ms for _, ms in modules),
+            "packages": by_package(modules),
+            "slowest": sorted(modules, key=lambda item: -item[1])[:top],
+        }
+    return result
+
+
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10, help="每个阶段列出最慢的模块数")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="import 阶段的耗时预算")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBID, help="import 阶段不允许加载的顶层包")
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0, help="替身模型的单次回答延迟")
+    parser.add_argument("--json", type=Path, default=None, help="结果写入的 JSON 文件")
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child)
+        return
+
+    from fake_embedding_server import ServerConfig, run_in_thread
+
+    results = []
+    violations = []
+    with run_in_thread(ServerConfig(chat_latency_ms=args.chat_latency_ms)) as base_url, \
+            tempfile.TemporaryDirectory() as tmp:
+        # 缓存与索引都放在临时目录，每个子进程从空缓存开始
+        env = {
+            **os.environ,
+            "DASHSCOPE_BASE_URL": base_url,
+            "DASHSCOPE_API_KEY": "fake",
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+        for module_name in args.modules:
+            work_dir = Path(tmp) / module_name
+            env.update({
+                "EMBEDDING_CACHE_PATH": str(work_dir / "embedding_cache.sqlite"),
+                "LLM_CACHE_PATH": str(work_dir / "llm_cache.sqlite"),
+                "FAISS_DB_DIR": str(work_dir / "faiss_db"),
+                "BM25_DB_DIR": str(work_dir / "bm25_db"),
+            })
+            result = measure(module_name, env, args.top)
+            results.append(result)
+
+            import_phase = result["phases"]["import"]
+            if result["import_ms"] > args.budget_ms:
+                violations.append(f"{module_name}: import 耗时 {result['import_ms']:.1f}ms 超过预算 {args.budget_ms:.0f}ms")
+            loaded = sorted(set(import_phase["packages"]) & set(args.forbid))
+            if loaded:
+                violations.append(f"{module_name}: import 时加载了 {', '.join(loaded)}")
+
+    print(f"{'module':<18} {'import ms':>10} {'warmup ms':>10} {'first resp ms':>14} {'TTFR ms':>9}")
+    for r in results:
+        print(f"{r['module']:<18} {_ms(r['import_ms']):>10} {_ms(r['warmup_ms']):>10} "
+              f"{_ms(r['first_response_ms']):>14} {_ms(r['time_to_first_response_ms']):>9}")
+    for r in results:
+        print(f"\n{r['module']}")
+        for phase, errors in r["errors"].items():
+            print(f"  {phase} 失败：{errors}")
+        for phase in PHASES:
+            info = r["phases"][phase]
+            if not info["modules"]:
+                continue
+            packages = ", ".join(f"{name} {ms:.1f}" for name, ms in list(info["packages"].items())[:6])
+            print(f"  [{phase}] 导入 {info['modules']} 个模块，共 {info['import_ms']:.1f}ms：{packages}")
+            for name, ms in info["slowest"]:
+                print(f"      {ms:>8.1f}ms  {name}")
+
+    if args.json is not None:
+        report = {"budget_ms": args.budget_ms, "forbid": args.forbid, "results": results, "violations": violations}
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"\n结果已写入 {args.json}")
+
+    if violations:
+        print("\n超出启动预算：")
+        for v in violations:
+            print(f"  {v}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
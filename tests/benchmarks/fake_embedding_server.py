@@ -0,0 +1,259 @@
+"""
+离线的 OpenAI 兼容 /v1/embeddings 替身服务，用于在不访问 DashScope 的情况下测试与压测入库流程。
+
+- 向量：以 sha256(model, text) 为种子生成的单位向量，同一文本每次得到同一向量；
+  支持请求中的 dimensions 与 encoding_format（float / base64，openai SDK 默认 base64）；
+- 延迟：每次请求 latency_ms + 每条 per_item_ms，再叠加 [0, jitter_ms] 的均匀抖动；
+- 限流：每分钟请求数 / token 数两个令牌桶，超出时返回 429 与 Retry-After；
+- 错误注入：按 error_rate 随机返回 500/503；批次超过 max_batch 或单条超过 max_input_chars
+  时返回与 DashScope 相同措辞的 400。
+POST /v1/chat/completions 固定延迟 chat_latency_ms 后返回 chat_reply（支持 stream），不调用工具，
+供启动基准测量首个回答的耗时。
+GET /stats 返回请求、条目、429、错误计数。
+
+用法：
+    python tests/benchmarks/fake_embedding_server.py --port 8765 --latency-ms 30 --jitter-ms 20
+    # 然后 DASHSCOPE_BASE_URL=http://127.0.0.1:8765/v1 DASHSCOPE_API_KEY=fake 运行示例
+
+也可在进程内启动：with run_in_thread(ServerConfig(...)) as base_url: ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Iterator
+
+import numpy as np
+from aiohttp import web
+
+
+@dataclass
+class ServerConfig:
+    dimensions: int = 1024
+    latency_ms: float = 0.0
+    per_item_ms: float = 0.0
+    jitter_ms: float = 0.0
+    requests_per_minute: float | None = None
+    tokens_per_minute: float | None = None
+    error_rate: float = 0.0
+    max_batch: int = 10
+    max_input_chars: int = 8192
+    seed: int = 0
+    chat_latency_ms: float = 0.0
+    chat_reply: str = "这是替身模型的回答。"
+
+
+def fake_vector(model: str, text: str, dimensions: int) -> np.ndarray:
+    """由 (model, text) 决定的单位向量。"""
+    digest = hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+    vector = rng.standard_normal(dimensions, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """取令牌；不够时不扣除，返回还需等待的秒数。"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+def _error(status: int, message: str, headers: dict[str, str] | None = None) -> web.Response:
+    return web.json_response({"error": {"message": message, "type": "fake_error"}}, status=status, headers=headers)
+
+
+class FakeEmbeddingServer:
+    def __init__(self, config: ServerConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._requests = _Bucket(config.requests_per_minute) if config.requests_per_minute else None
+        self._tokens = _Bucket(config.tokens_per_minute) if config.tokens_per_minute else None
+        self.stats = {"requests": 0, "items": 0, "rate_limited": 0, "errors": 0, "bad_requests": 0, "chat_requests": 0}
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        app.router.add_post("/embeddings", self.embeddings)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        app.router.add_post("/chat/completions", self.chat_completions)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "config": asdict(self.config)})
+
+    def _rate_limit(self, tokens: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.take(1))
+        if wait == 0 and self._tokens is not None:
+            wait = max(wait, self._tokens.take(tokens))
+        return wait
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        cfg = self.config
+        self.stats["requests"] += 1
+        body = await request.json()
+        inputs = body.get("input")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        if not isinstance(inputs, list) or not all(isinstance(t, str) for t in inputs):
+            self.stats["bad_requests"] += 1
+            return _error(400, "input must be a string or a list of strings")
+        if len(inputs) > cfg.max_batch:
+            self.stats["bad_requests"] += 1
+            return _error(400, f"batch size is invalid, it should not be larger than {cfg.max_batch}.")
+        if any(not 1 <= len(t) <= cfg.max_input_chars for t in inputs):
+            self.stats["bad_requests"] += 1
+            return _error(400, f"Range of input length should be [1, {cfg.max_input_chars}]")
+
+        tokens = sum(len(t) for t in inputs)
+        wait = self._rate_limit(tokens)
+        if wait > 0:
+            self.stats["rate_limited"] += 1
+            return _error(429, "Requests rate limit exceeded", {"Retry-After": f"{wait:.3f}"})
+
+        delay = cfg.latency_ms + cfg.per_item_ms * len(inputs) + self._rng.uniform(0, cfg.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if cfg.error_rate and self._rng.random() < cfg.error_rate:
+            self.stats["errors"] += 1
+            return _error(self._rng.choice((500, 503)), "injected server error")
+
+        model = body.get("model", "fake-embedding")
+        dimensions = int(body.get("dimensions") or cfg.dimensions)
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vector = fake_vector(model, text, dimensions)
+            embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode() if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        self.stats["items"] += len(inputs)
+        return web.json_response({
+            "object": "list",
+            "model": model,
+            "data": data,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        cfg = self.config
+        self.stats["chat_requests"] += 1
+        body = await request.json()
+        if cfg.chat_latency_ms > 0:
+            await asyncio.sleep(cfg.chat_latency_ms / 1000)
+        model = body.get("model", "fake-chat")
+        base = {"id": f"chatcmpl-fake-{self.stats['chat_requests']}", "created": int(time.time()), "model": model}
+        usage = {"prompt_tokens": 1, "completion_tokens": len(cfg.chat_reply), "total_tokens": 1 + len(cfg.chat_reply)}
+        if not body.get("stream"):
+            return web.json_response({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": cfg.chat_reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        deltas = [{"role": "assistant", "content": ""}, {"content": cfg.chat_reply}, {}]
+        for i, delta in enumerate(deltas):
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(deltas) - 1 else None}],
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+async def start(config: ServerConfig, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, int]:
+    """启动服务，返回 (runner, 实际端口)；port=0 时由系统分配。"""
+    runner = web.AppRunner(FakeEmbeddingServer(config).app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+@contextmanager
+def run_in_thread(config: ServerConfig | None = None, host: str = "127.0.0.1") -> Iterator[str]:
+    """在后台线程的事件循环中运行服务，产出 base_url（形如 http://127.0.0.1:端口/v1）。"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="fake-embedding-server", daemon=True)
+    thread.start()
+    runner, port = asyncio.run_coroutine_threadsafe(start(config or ServerConfig(), host), loop).result()
+    try:
+        yield f"http://{host}:{port}/v1"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def parse_args(argv: list[str] | None = None) -> tuple[argparse.Namespace, ServerConfig]:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--per-item-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=None, help="每分钟请求数上限")
+    parser.add_argument("--tpm", type=float, default=None, help="每分钟 token 数上限（按字符数计）")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-batch", type=int, default=10)
+    parser.add_argument("--max-input-chars", type=int, default=8192)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    config = ServerConfig(
+        dimensions=args.dimensions,
+        latency_ms=args.latency_ms,
+        per_item_ms=args.per_item_ms,
+        jitter_ms=args.jitter_ms,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        error_rate=args.error_rate,
+        max_batch=args.max_batch,
+        max_input_chars=args.max_input_chars,
+        seed=args.seed,
+        chat_latency_ms=args.chat_latency_ms,
+    )
+    return args, config
+
+
+def main() -> None:
+    args, config = parse_args()
+    print(f"fake embeddings: http://{args.host}:{args.port}/v1  {asdict(config)}")
+    web.run_app(FakeEmbeddingServer(config).app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
+import hashlib
 import os
+import sys
+from pathlib import Path
+
 from smolagents import CodeAgent, OpenAIServerModel, tool
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
-# 移除报错的 import
-# from langchain_text_splitters import RecursiveCharacterTextSplitter
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent_kit.bm25_index import BM25Index, default_bm25_dir  # noqa: E402
+from agent_kit.chunking import iter_spans, open_text  # noqa: E402
 
 # ==========================================
 # 1. 硅基流动 API 配置
@@ -21,52 +26,42 @@ model = OpenAIServerModel(
 )
 
 # ==========================================
-# 2. 读取本地文件并切分 (纯 Python 实现)
+# 2. 读取本地文件并切分 (mmap + 按句切分)
 # ==========================================
 FILE_PATH = "1.md"
 
 print(f"正在读取文件: {FILE_PATH} ...")
 
+# BM25 索引持久化到 BM25_DB_DIR，文件内容与切分参数不变时直接加载，不再重建
+CHUNK_STRATEGY, CHUNK_SIZE, CHUNK_OVERLAP = "sentence", 300, 50
+INDEX_DIR = default_bm25_dir("rag_file_demo")
+
 try:
-    with open(FILE_PATH, "r", encoding="utf-8") as f:
-        full_text = f.read()
+    with open_text(FILE_PATH) as buf:
+        fingerprint = hashlib.sha256(f"{CHUNK_STRATEGY}:{CHUNK_SIZE}:{CHUNK_OVERLAP}:".encode("utf-8"))
+        fingerprint.update(buf)
+        fingerprint = fingerprint.hexdigest()
+
+        if BM25Index.read_fingerprint(INDEX_DIR) == fingerprint:
+            bm25_index = BM25Index.load_local(INDEX_DIR)
+            print(f"文件未变化，从 {INDEX_DIR} 加载 BM25 索引（{len(bm25_index)} 个片段）")
+        else:
+            # 按句打包成不超过 CHUNK_SIZE 个字符的块，不会从句子中间切开
+            spans = list(iter_spans(buf, CHUNK_STRATEGY, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP))
+            print(f"文件已切分为 {len(spans)} 个片段，正在构建 BM25 索引...")
+
+            # 转换为 LangChain Document 并构建检索器；中文按单字 + 二元组切词
+            documents = [
+                Document(page_content=span.decode(buf), metadata={"chunk_id": i, "start_byte": span.start})
+                for i, span in enumerate(spans)
+            ]
+            bm25_index = BM25Index.from_documents(documents)
+            bm25_index.save_local(INDEX_DIR, fingerprint=fingerprint)
 except FileNotFoundError:
     print(f"错误: 找不到文件 {FILE_PATH}，请检查路径。")
     exit(1)
 
 
-# --- 替代方案：手写一个简单的切分函数 ---
-def simple_chunk_text(text, chunk_size=300, overlap=50):
-    """简单的文本切分函数，替代 LangChain 的复杂依赖"""
-    chunks = []
-    start = 0
-    text_len = len(text)
-
-    while start < text_len:
-        end = min(start + chunk_size, text_len)
-        chunk = text[start:end]
-        chunks.append(chunk)
-
-        # 如果已经到了末尾，停止
-        if end == text_len:
-            break
-
-        # 下一段的起始位置 = 当前结束位置 - 重叠量
-        start = end - overlap
-
-    return chunks
-
-
-# 使用新函数切分
-chunks = simple_chunk_text(full_text, chunk_size=300, overlap=50)
-print(f"文件已切分为 {len(chunks)} 个片段，正在构建 BM25 索引...")
-
-# 转换为 LangChain Document 并构建检索器
-documents = [Document(page_content=chunk) for chunk in chunks]
-bm25_retriever = BM25Retriever.from_documents(documents)
-bm25_retriever.k = 2
-
-
 # ==========================================
 # 3. 定义检索工具
 # ==========================================
@@ -80,7 +75,7 @@ def search_local_file(query: str) -> str:
         query: 搜索关键词。
     """
     print(f"\n>>> [工具调用] 正在检索: {query}")
-    results = bm25_retriever.invoke(query)
+    results = bm25_index.search(query, k=2)
 
     if not results:
         return "本地文件中未找到相关信息。"
@@ -1,4 +1,7 @@
 import os
+import sys
+from pathlib import Path
+
 from smolagents import CodeAgent, OpenAIServerModel, tool
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
@@ -6,6 +9,10 @@ from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent_kit.chunking import iter_file_chunks  # noqa: E402
+
 # ==========================================
 # 1. 配置信息
 # ==========================================
@@ -73,24 +80,8 @@ else:
     # 3. 读取文件 & 切分
     FILE_PATH = "company_qa.txt"
     try:
-        with open(FILE_PATH, "r", encoding="utf-8") as f:
-            full_text = f.read()
-
-
-        # 简单切分函数
-        def simple_chunk_text(text, chunk_size=300, overlap=50):
-            chunks = []
-            start = 0
-            text_len = len(text)
-            while start < text_len:
-                end = min(start + chunk_size, text_len)
-                chunks.append(text[start:end])
-                if end == text_len: break
-                start = end - overlap
-            return chunks
-
-
-        text_chunks = simple_chunk_text(full_text)
+        # mmap 读取并按句切分，块不超过 300 字符、重叠 50 字符，不会从句子中间切开
+        text_chunks = list(iter_file_chunks(FILE_PATH, "sentence", chunk_size=300, overlap=50))
         documents = [Document(page_content=chunk) for chunk in text_chunks]
 
         # 4. 上传数据 (这一步会消耗 Embedding Token)
@@ -1,15 +1,13 @@
 # 创建一个简单的Agent
-from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
 from dotenv import load_dotenv
-import os
+
+from agent_kit.http_clients import chat_model
 
 # 加载模型配置
 _ = load_dotenv()
 
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
+llm = chat_model(
     model="qwen3-coder-plus",
 )
 
@@ -12,130 +12,234 @@
 
 from __future__ import annotations
 
-import os
-import re
+import hashlib
+import importlib
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING, Iterable, Iterator
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
-from langchain_core.documents import Document
-from langchain_core.embeddings import Embeddings
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain.agents import create_agent
-from langchain.tools import tool
+
+# langchain / openai / numpy 等依赖在第一次用到时才导入，import 本模块只需几十毫秒
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_openai import ChatOpenAI
+
+    from agent_kit import MatrixVectorStore
+    from agent_kit.faiss_store import FaissVectorStore
+    from agent_kit.hybrid_search import HybridRetriever
 
 
 # 加载模型配置
 _ = load_dotenv()
 
-
-# 配置大模型
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-    model="qwen3-coder-plus",
-    temperature=0,
+# 处理第一个问题前必然用到的模块，warmup() 预先导入
+_HEAVY_MODULES = (
+    "langchain.agents",
+    "langchain.tools",
+    "openai",
+    "agent_kit.embeddings",
+    "agent_kit.embedding_cache",
+    "agent_kit.hybrid_search",
+    "agent_kit.matrix_store",
+    "agent_kit.pipeline",
 )
 
-# 创建 OpenAI 客户端
-client = OpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-)
 
+@lru_cache(maxsize=None)
+def get_llm() -> ChatOpenAI:
+    """配置大模型；第一次调用时创建，之后返回同一个对象。"""
+    from agent_kit.http_clients import chat_model
+    from agent_kit.llm_cache import SQLiteLLMCache
 
-class DashScopeEmbeddings(Embeddings):
-    """DashScope 兼容的 Embeddings 封装。"""
+    return chat_model(
+        model="qwen3-coder-plus",
+        temperature=0,
+        # temperature=0 的相同请求直接返回本地缓存的回答
+        cache=SQLiteLLMCache(),
+    )
 
-    def __init__(self, model: str = "text-embedding-v4", dimensions: int = 1024):
-        self.model = model
-        self.dimensions = dimensions
 
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        vectors: list[list[float]] = []
-        for i in range(0, len(texts), 10):
-            chunk = texts[i : i + 10]
-            response = client.embeddings.create(
-                model=self.model,
-                input=chunk,
-                dimensions=self.dimensions,
-            )
-            vectors.extend([item.embedding for item in response.data])
-        return vectors
-
-    def embed_query(self, text: str) -> list[float]:
-        response = client.embeddings.create(
-            model=self.model,
-            input=[text],
-            dimensions=self.dimensions,
-        )
-        return response.data[0].embedding
+def warmup() -> None:
+    """提前付清冷启动开销：导入依赖并创建模型客户端。服务在接收请求前调用，不调用时由第一个请求承担。"""
+    for name in _HEAVY_MODULES:
+        importlib.import_module(name)
+    get_llm()
 
 
-def load_txt_documents(data_dir: Path) -> list[Document]:
-    """读取目录下的 txt 文件并按空行分割为 Document。"""
+def iter_txt_documents(data_dir: Path) -> Iterator[Document]:
+    """逐个文件、逐块产出 Document，内存中只保留当前块。"""
+    from langchain_core.documents import Document
 
-    def split_on_blank(text: str) -> Iterable[str]:
-        # 按dimensions维度分割（一版用于通识文档）
-        # for block in re.split(rf"\n\s*{{{self.dimensions}}}\s*\n", text):
+    from agent_kit.pipeline import iter_blank_line_blocks
 
-        # 按空行分割（一版用于问答文档）
-        for block in re.split(r"\n\s*\n", text):
-            cleaned = block.strip()
-            if cleaned:
-                yield cleaned
-
-    documents: list[Document] = []
     for path in sorted(data_dir.glob("*.txt")):
-        content = path.read_text(encoding="utf-8")
-        for idx, part in enumerate(split_on_blank(content)):
-            documents.append(
-                Document(
-                    page_content=part,
-                    metadata={"source": path.name, "chunk_id": idx},
-                )
+        # 按空行分割（一版用于问答文档）
+        for idx, part in enumerate(iter_blank_line_blocks(path)):
+            yield Document(
+                page_content=part,
+                metadata={"source": path.name, "chunk_id": idx},
             )
+
+
+def load_txt_documents(data_dir: Path, workers: int | None = None) -> list[Document]:
+    """读取目录下的 txt 文件并按空行分割为 Document。
+
+    workers=None 时文件数达到 PARALLEL_MIN_FILES 才按 CPU 核数分片到进程池并行切块，
+    workers=1 时始终串行；输出顺序与串行一致。
+    """
+    from agent_kit.parallel_loader import load_documents_parallel
+
+    # 按空行分割（一版用于问答文档），只切块不解析元数据
+    documents = load_documents_parallel(data_dir, parse_fn=None, workers=workers)
     if not documents:
         raise ValueError(f"目录 {data_dir} 下未找到 txt 文档")
     return documents
 
 
-def build_vector_store(data_dir: Path | None = None) -> InMemoryVectorStore:
-    """读取 txt 文件并构建内存向量库。"""
+def corpus_fingerprint(documents: Iterable[Document], dedup_threshold: float | None = None) -> str:
+    """语料指纹：任一片段的来源、序号或内容变化，或去重阈值变化，都会改变指纹。"""
+    digest = hashlib.sha256()
+    if dedup_threshold is not None:
+        digest.update(f"dedup={dedup_threshold}\x1e".encode("utf-8"))
+    for doc in documents:
+        digest.update(f"{doc.metadata['source']}#{doc.metadata['chunk_id']}\x1f{doc.page_content}\x1e".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_retriever(
+    data_dir: Path | None = None,
+    backend: str = "matrix",
+    lexical: bool = True,
+    dedup_threshold: float | None = 0.8,
+) -> HybridRetriever:
+    """读取 txt 文件，构建向量库（lexical=True 时同时构建 BM25 关键词索引）。
+
+    文档经过 读取 -> 嵌入 -> 写入 三个阶段流水线入库。dedup_threshold 不为 None 时，
+    先把近似重复的片段合并为一条（只嵌入一次、只占一行索引），检索命中后再展开成各个版本；
+    为 None 时不去重，文档以流的形式入库，内存占用与语料大小无关。
+    backend="matrix" 为内存矩阵向量库；backend="faiss" 使用 HNSW 索引，
+    并持久化到 FAISS_DB_DIR（BM25 索引保存在同一目录），语料未变化时直接加载，不再重新建索引；
+    backend="int8" / "float16" 常驻量化编码，全精度向量放在内存映射文件中用于重排。
+    """
+    from agent_kit import CachedEmbeddings, DashScopeEmbeddings, MatrixVectorStore, QueryCachedEmbeddings
+    from agent_kit.bm25_index import BM25Index
+    from agent_kit.dedup import dedup_documents
+    from agent_kit.hybrid_search import HybridRetriever
+    from agent_kit.pipeline import ingest_documents
+
     # 默认指向仓库根目录下的 files，而非 tests/files
     target_dir = data_dir or (Path(__file__).parent.parent / "files")
-    documents = load_txt_documents(target_dir)
-
-    print(f"成功加载 {len(documents)} 个文档到向量库")
 
-    embeddings = DashScopeEmbeddings()
-    vector_store = InMemoryVectorStore(embedding=embeddings)
-    _ = vector_store.add_documents(documents)
-    
-    return vector_store
-
-
-def create_react_agent(vector_store: InMemoryVectorStore):
-    """基于给定向量库创建带检索工具的 ReAct Agent。"""
+    # 按 (model, dimensions, text) 命中本地缓存的片段不再重复调用 Embedding 接口，
+    # 重复的检索问题命中查询向量缓存，不再发起 embed_query 请求
+    embeddings = QueryCachedEmbeddings(CachedEmbeddings(DashScopeEmbeddings()))
+    text_index = BM25Index() if lexical else None
+
+    if dedup_threshold is None:
+        documents = iter_txt_documents(target_dir)
+    else:
+        # 去重需要看到全部片段，先整体读入
+        raw_documents = load_txt_documents(target_dir)
+        deduped = dedup_documents(raw_documents, threshold=dedup_threshold, merge_fields=())
+        print(deduped.stats.report())
+        documents = deduped.documents
+
+    if backend == "faiss":
+        # faiss 只在选用该后端时导入
+        from agent_kit.faiss_store import FaissVectorStore, default_faiss_dir
+
+        folder = default_faiss_dir("agent_rag")
+        # 不去重时指纹同样流式计算，只多读一遍文件；去重时按去重前的全部片段与阈值计算，
+        # 合并进 variants 的非代表片段变化、阈值变化都会重建（只看代表片段会加载到旧的版本正文）
+        fingerprint = corpus_fingerprint(
+            iter_txt_documents(target_dir) if dedup_threshold is None else raw_documents,
+            dedup_threshold,
+        )
+        if FaissVectorStore.read_fingerprint(folder) == fingerprint and (
+            not lexical or BM25Index.read_fingerprint(folder) == fingerprint
+        ):
+            print(f"语料未变化，从 {folder} 加载 FAISS 索引")
+            vector_store = FaissVectorStore.load_local(embeddings, folder)
+            return HybridRetriever(vector_store, BM25Index.load_local(folder) if lexical else None)
+        vector_store = FaissVectorStore(embedding=embeddings, index_type="hnsw")
+    elif backend in ("int8", "float16"):
+        from agent_kit.quantized_store import QuantizedVectorStore
+
+        vector_store = QuantizedVectorStore(embedding=embeddings, storage=backend)
+    else:
+        vector_store = MatrixVectorStore(embedding=embeddings)
+
+    stats = ingest_documents(documents, vector_store, embeddings, text_index=text_index)
+    if not stats.documents:
+        if stats.dead_letters:
+            raise RuntimeError(stats.dead_letter_summary())
+        raise ValueError(f"目录 {target_dir} 下未找到 txt 文档")
+    print(f"成功加载 {stats.documents} 个文档到向量库，耗时 {stats.seconds:.2f}s")
+    if stats.dead_letters:
+        print(stats.dead_letter_summary())
+
+    if backend == "faiss":
+        # 有文档嵌入失败时不记录指纹，下次启动重新入库（已成功的片段命中 Embedding 缓存）
+        saved = None if stats.dead_letters else fingerprint
+        vector_store.save_local(folder, fingerprint=saved)
+        if text_index is not None:
+            text_index.save_local(folder, fingerprint=saved)
+    return HybridRetriever(vector_store, text_index)
+
+
+def build_vector_store(
+    data_dir: Path | None = None,
+    backend: str = "matrix",
+) -> MatrixVectorStore | FaissVectorStore:
+    """只构建向量库，不建关键词索引。"""
+    return build_retriever(data_dir, backend, lexical=False).vector_store
+
+
+def create_react_agent(retriever: HybridRetriever):
+    """基于给定检索器创建带检索工具的 ReAct Agent。"""
+    from langchain.agents import create_agent
+    from langchain.tools import tool
 
     @tool(response_format="content_and_artifact")
     def retrieve_context(query: str):
-        """基于向量库检索与问题最相关的文本片段。"""
-        retrieved = vector_store.similarity_search(query, k=3)
+        """基于知识库检索与问题最相关的文本片段。"""
+        # 向量检索与 BM25 关键词检索按 RRF 融合，精确词（如“补卡”）不会被漏掉
+        retrieved = retriever.search(query, k=3)
         serialized = "\n\n".join(
             f"[{doc.metadata['source']}#{doc.metadata['chunk_id']}] {doc.page_content}"
             for doc in retrieved
         )
         return serialized, retrieved
 
+    @tool(response_format="content_and_artifact")
+    def retrieve_context_batch(queries: list[str]):
+        """一次检索多个子问题，适合包含多个部分的问题。"""
+        # 多条查询的向量部分合并为一次 Embedding 请求和一次矩阵打分
+        results = retriever.batch_search_with_score(queries, k=3)
+        # 同一片段命中多个子问题时只输出一次
+        unique: dict[str, list[int]] = {}
+        retrieved = []
+        for i, hits in enumerate(results):
+            for doc, _ in hits:
+                if doc.id not in unique:
+                    unique[doc.id] = []
+                    retrieved.append(doc)
+                unique[doc.id].append(i + 1)
+        serialized = "\n\n".join(
+            f"[{doc.metadata['source']}#{doc.metadata['chunk_id']}]"
+            f"（子问题 {', '.join(map(str, unique[doc.id]))}） {doc.page_content}"
+            for doc in retrieved
+        )
+        return serialized, retrieved
+
     return create_agent(
-        llm,
-        tools=[retrieve_context],
+        get_llm(),
+        tools=[retrieve_context, retrieve_context_batch],
         system_prompt=(
             "你可以使用检索工具获得参考资料。回答时结合检索到的内容，"
             "如有必要可以在答案中简单引用来源标识。"
+            "问题包含多个子问题时，优先用 retrieve_context_batch 一次检索全部子问题。"
         ),
     )
 
@@ -144,13 +248,13 @@ def run_demo():
     """简单演示：针对 txt 知识库发起提问。"""
     query = "考勤缺卡怎么处理？"
 
-    # 嵌入向量数据库
-    vector_store = build_vector_store()
+    # 嵌入向量数据库，同时建立关键词索引
+    retriever = build_retriever()
 
     print('嵌入完成' + '\n')
 
     # 检索向量数据库
-    agent = create_react_agent(vector_store)
+    agent = create_react_agent(retriever)
     for event in agent.stream({"messages": [{"role": "user", "content": query}]}, stream_mode="values"):
         event["messages"][-1].pretty_print()
 
@@ -12,83 +12,45 @@
 
 from __future__ import annotations
 
-import os
-import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
-from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma
 import chromadb
 from chromadb.config import Settings
 from langchain.agents import create_agent
 from langchain.tools import tool
 
+from agent_kit import CachedEmbeddings, DashScopeEmbeddings, QueryCachedEmbeddings
+from agent_kit.chroma_sync import sync_documents
+from agent_kit.chunking import iter_file_chunks
+from agent_kit.http_clients import chat_model
+from agent_kit.llm_cache import SQLiteLLMCache
+
 
 # 加载模型配置
 _ = load_dotenv()
 
 
-# 配置大模型
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-    model="qwen3-coder-plus",
-    temperature=0,
-)
-
-# 创建 OpenAI 客户端
-client = OpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-)
-
-
-class DashScopeEmbeddings(Embeddings):
-    """DashScope 兼容的 Embeddings 封装。"""
-
-    def __init__(self, model: str = "text-embedding-v4", dimensions: int = 1024):
-        self.model = model
-        self.dimensions = dimensions
-
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        vectors: list[list[float]] = []
-        for i in range(0, len(texts), 10):
-            chunk = texts[i : i + 10]
-            response = client.embeddings.create(
-                model=self.model,
-                input=chunk,
-                dimensions=self.dimensions,
-            )
-            vectors.extend([item.embedding for item in response.data])
-        return vectors
-
-    def embed_query(self, text: str) -> list[float]:
-        response = client.embeddings.create(
-            model=self.model,
-            input=[text],
-            dimensions=self.dimensions,
-        )
-        return response.data[0].embedding
+@lru_cache(maxsize=None)
+def get_llm():
+    """配置大模型；第一次调用时创建（连同 LLM 响应缓存文件），之后返回同一个对象。"""
+    return chat_model(
+        model="qwen3-coder-plus",
+        temperature=0,
+        # temperature=0 的相同请求直接返回本地缓存的回答
+        cache=SQLiteLLMCache(),
+    )
 
 
 def load_txt_documents(data_dir: Path) -> list[Document]:
     """读取目录下的 txt 文件并按空行分割为 Document。"""
 
-    def split_on_blank(text: str) -> Iterable[str]:
-        for block in re.split(r"\n\s*\n", text):
-            cleaned = block.strip()
-            if cleaned:
-                yield cleaned
-
     documents: list[Document] = []
     for path in sorted(data_dir.glob("*.txt")):
-        content = path.read_text(encoding="utf-8")
-        for idx, part in enumerate(split_on_blank(content)):
+        for idx, part in enumerate(iter_file_chunks(path, "blank")):
             documents.append(
                 Document(
                     page_content=part,
@@ -100,15 +62,20 @@ def load_txt_documents(data_dir: Path) -> list[Document]:
     return documents
 
 
-def build_vector_store(data_dir: Path | None = None) -> Chroma:
-    """读取 txt 文件并构建内存向量库。"""
+def build_vector_store(data_dir: Path | None = None, incremental: bool = True) -> Chroma:
+    """读取 txt 文件并构建内存向量库。
+
+    incremental=True 时只同步变更的片段；False 时清空集合后全量写入。
+    """
     # 默认指向仓库根目录下的 files，而非 tests/files
     target_dir = data_dir or (Path(__file__).parent.parent / "files")
     documents = load_txt_documents(target_dir)
 
     print(f"成功加载 {len(documents)} 个文档到向量库")
 
-    embeddings = DashScopeEmbeddings()
+    # 按 (model, dimensions, text) 命中本地缓存的片段不再重复调用 Embedding 接口，
+    # 重复的检索问题命中查询向量缓存，不再发起 embed_query 请求
+    embeddings = QueryCachedEmbeddings(CachedEmbeddings(DashScopeEmbeddings()))
     
     # 配置 Chroma 设置
     chroma_settings = Settings(
@@ -123,6 +90,12 @@ def build_vector_store(data_dir: Path | None = None) -> Chroma:
         client_settings=chroma_settings
     )
     
+    if incremental:
+        # 增量同步：只写入新增/修改的片段，删除已移除的片段
+        stats = sync_documents(vector_store, documents)
+        print(f"增量同步完成: {stats}")
+        return vector_store
+
     # 清空集合（可选）
     existing_ids = vector_store.get()["ids"]
     if existing_ids:
@@ -148,7 +121,7 @@ def create_react_agent(vector_store: Chroma):
         return serialized, retrieved
 
     return create_agent(
-        llm,
+        get_llm(),
         tools=[retrieve_context],
         system_prompt=(
             "你可以使用检索工具获得参考资料。回答时结合检索到的内容，"
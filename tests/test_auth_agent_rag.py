@@ -1,123 +1,56 @@
 from __future__ import annotations
 
-import os
-import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable
+from typing import Iterator
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
 from langchain_core.documents import Document
-from langchain_core.embeddings import Embeddings
-from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_core.messages import ToolMessage
 from langchain.agents import create_agent
 from langchain.tools import tool
 
+from agent_kit import CachedEmbeddings, DashScopeEmbeddings, MatrixVectorStore, QueryCachedEmbeddings
+from agent_kit.answer_cache import SemanticAnswerCache
+from agent_kit.bm25_index import BM25Index
+from agent_kit.dedup import dedup_documents
+from agent_kit.faq_index import FAQIndex
+from agent_kit.http_clients import chat_model
+from agent_kit.hybrid_search import HybridRetriever
+from agent_kit.llm_cache import SQLiteLLMCache
+from agent_kit.pipeline import ingest_documents, iter_blank_line_blocks
+from agent_kit.parallel_loader import load_documents_parallel
+from agent_kit.qa_parser import parse_block
+
 # 加载模型配置
 _ = load_dotenv()
 
-# 配置大模型
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-    model="qwen3-coder-plus",
-    temperature=0,
-)
-
-client = OpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-)
-
-class DashScopeEmbeddings(Embeddings):
-    """DashScope 兼容的 Embeddings 封装。"""
-    def __init__(self, model: str = "text-embedding-v4", dimensions: int = 1024):
-        self.model = model
-        self.dimensions = dimensions
-
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        vectors: list[list[float]] = []
-        # 批处理避免超时
-        for i in range(0, len(texts), 5):
-            chunk = texts[i : i + 5]
-            try:
-                response = client.embeddings.create(
-                    model=self.model,
-                    input=chunk,
-                    dimensions=self.dimensions,
-                )
-                vectors.extend([item.embedding for item in response.data])
-            except Exception as e:
-                print(f"Embedding error: {e}")
-                # 简单容错，实际生产需重试机制
-                vectors.extend([[0.0]*self.dimensions] * len(chunk))
-        return vectors
-
-    def embed_query(self, text: str) -> list[float]:
-        response = client.embeddings.create(
-            model=self.model,
-            input=[text],
-            dimensions=self.dimensions,
-        )
-        return response.data[0].embedding
-
-
-def load_txt_documents(data_dir: Path) -> list[Document]:
-    """读取目录下的 txt 文件，提取元数据，清洗正文。"""
-
-    def split_on_blank(text: str) -> Iterable[str]:
-        # 使用正则按空行分割（兼容 \r\n）
-        for block in re.split(r"\n\s*\n", text):
-            cleaned = block.strip()
-            if cleaned:
-                yield cleaned
-
-    def parse_block(text_block: str) -> tuple[str, dict]:
-        """
-        核心修改：
-        1. 提取 权限、关键词 到 metadata。
-        2. 返回的正文剔除这些元数据行，减少 Embedding 噪音。
-        """
-        lines = text_block.split('\n')
-        content_lines = []
-        metadata = {}
-        
-        for line in lines:
-            line = line.strip()
-            if not line: continue
-
-            # 提取权限 (支持中文冒号和英文冒号)
-            if line.startswith(("权限:", "权限：")):
-                # 统一分隔符，将顿号、逗号都转为列表
-                raw_perm = line.split(':', 1)[1].strip()
-                # 使用正则分割：顿号、逗号、空格
-                perm_list = re.split(r'[、,，\s]+', raw_perm)
-                # 去除空字符串
-                metadata["permissions"] = [p for p in perm_list if p]
-            
-            # 提取关键词
-            elif line.startswith(("关键词:", "关键词：")):
-                metadata["keywords"] = line.split(':', 1)[1].strip()
-            
-            # 保留正文 (问题和答案)
-            else:
-                content_lines.append(line)
-        
-        return "\n".join(content_lines), metadata
+@lru_cache(maxsize=None)
+def get_llm():
+    """配置大模型；第一次调用时创建（连同 LLM 响应缓存文件），之后返回同一个对象。"""
+    return chat_model(
+        model="qwen3-coder-plus",
+        temperature=0,
+        # temperature=0 的相同请求直接返回本地缓存的回答
+        cache=SQLiteLLMCache(),
+    )
+
+# parse_block 提取的元数据字段，入库时建立倒排索引
+RAG_INDEXED_FIELDS = ("permissions", "keywords")
 
-    documents: list[Document] = []
+
+def iter_txt_documents(data_dir: Path) -> Iterator[Document]:
+    """逐个文件、逐块产出 Document，内存中只保留当前块。"""
 
     # 确保目录存在
     if not data_dir.exists():
         print(f"警告：目录 {data_dir} 不存在，跳过加载。")
-        return []
+        return
 
     for path in sorted(data_dir.glob("*.txt")):
         print(f"正在读取文件: {path.absolute()}") 
-        content = path.read_text(encoding="utf-8")
         
-        for idx, part in enumerate(split_on_blank(content)):
+        for idx, part in enumerate(iter_blank_line_blocks(path)):
             clean_content, extracted_meta = parse_block(part)
             
             final_metadata = {
@@ -126,59 +59,95 @@ def load_txt_documents(data_dir: Path) -> list[Document]:
                 **extracted_meta 
             }
             
-            documents.append(
-                Document(
-                    page_content=clean_content, # 这里只包含 问题和答案
-                    metadata=final_metadata,
-                )
+            yield Document(
+                page_content=clean_content, # 这里只包含 问题和答案
+                metadata=final_metadata,
             )
-            
-    return documents
 
 
-def build_vector_store(data_dir: Path | None = None) -> InMemoryVectorStore:
+def load_txt_documents(data_dir: Path, workers: int | None = None) -> list[Document]:
+    """读取目录下的 txt 文件，提取元数据，清洗正文。
+
+    workers > 1 时按文件分片到进程池并行解析，适合成千上万个导出的 FAQ 文件；输出顺序与串行一致。
+    workers=None 时文件数达到 PARALLEL_MIN_FILES 才并行，workers=1 时逐个文件串行读取。
+    """
+    if workers == 1:
+        return list(iter_txt_documents(data_dir))
+    if not data_dir.exists():
+        print(f"警告：目录 {data_dir} 不存在，跳过加载。")
+        return []
+    return load_documents_parallel(data_dir, parse_block, workers=workers)
+
+
+def build_retriever(
+    data_dir: Path | None = None,
+    dedup_threshold: float | None = 0.8,
+    faq_index: FAQIndex | None = None,
+    workers: int | None = None,
+) -> HybridRetriever:
+    """构建向量库与 BM25 关键词索引，两者对权限字段建立相同的元数据索引。
+
+    dedup_threshold 不为 None 时，先合并近似重复的片段（如同一问题、同一权限的多次导出）再入库：
+    每组只嵌入一次、只占一行索引，检索时再展开成各个版本。权限不同的片段从不合并。
+    为 None 时不去重，文档以流的形式入库。
+    传入 faq_index 时，读取的同时把每个 Q/A 块（去重前的原始版本）加入精确匹配索引。
+    workers 见 load_txt_documents，只在去重（需要整体读入）时使用。
+    """
     target_dir = data_dir or Path(__file__).parent.parent / "files"
-    documents = load_txt_documents(target_dir)
 
-    if not documents:
+    # 按 (model, dimensions, text) 命中本地缓存的片段不再重复调用 Embedding 接口，
+    # 重复的检索问题命中查询向量缓存，不再发起 embed_query 请求
+    batch_size = 5  # 小批次避免超时
+    embeddings = QueryCachedEmbeddings(CachedEmbeddings(DashScopeEmbeddings(batch_size=batch_size)))
+    vector_store = MatrixVectorStore(embedding=embeddings, indexed_fields=RAG_INDEXED_FIELDS)
+    text_index = BM25Index(indexed_fields=RAG_INDEXED_FIELDS)
+    retriever = HybridRetriever(vector_store, text_index)
+
+    if dedup_threshold is None:
+        documents = iter_txt_documents(target_dir)
+    else:
+        # 去重需要看到全部片段，先整体读入；文件多时在进程池中并行解析
+        documents = load_txt_documents(target_dir, workers)
+    if faq_index is not None:
+        documents = faq_index.tee(documents)
+    if dedup_threshold is not None:
+        deduped = dedup_documents(list(documents), threshold=dedup_threshold, merge_fields=RAG_INDEXED_FIELDS)
+        print(deduped.stats.report(batch_size))
+        documents = deduped.documents
+
+    # 读取 -> 嵌入 -> 写入 流水线并行
+    stats = ingest_documents(documents, vector_store, embeddings, text_index=text_index)
+
+    if not stats.documents:
         print("未加载到任何文档，请检查 files 目录。")
-        return InMemoryVectorStore(embedding=DashScopeEmbeddings())
+        return retriever
 
-    print(f"成功加载 {len(documents)} 个文档片段")
+    print(f"成功加载 {stats.documents} 个文档片段，耗时 {stats.seconds:.2f}s")
+    if stats.dead_letters:
+        print(stats.dead_letter_summary())
     
-    embeddings = DashScopeEmbeddings()
-    vector_store = InMemoryVectorStore(embedding=embeddings)
-    vector_store.add_documents(documents)
-    
-    return vector_store
+    return retriever
+
+
+def build_vector_store(data_dir: Path | None = None) -> MatrixVectorStore:
+    """只需要向量库时使用。"""
+    return build_retriever(data_dir).vector_store
 
 
-def create_react_agent(vector_store: InMemoryVectorStore, user_permission: str):
+def create_react_agent(retriever: HybridRetriever, user_permission: str):
 
     @tool(response_format="content_and_artifact")
     def retrieve_context(query: str):
         """检索知识库。"""
         
-        # === 核心修改：修复过滤逻辑 ===
-        def filter_func(doc: Document) -> bool:
-            # 获取文档的权限列表 (在 parse_block 中我们已经将其转为了 list)
-            doc_perms = doc.metadata.get("permissions", [])
-            
-            # 1. 如果文档没有设置权限，默认为公开，返回 True
-            if not doc_perms: 
-                return True 
-            
-            # 2. 检查用户权限是否在文档允许的列表中
-            # 例如：user="番禺大货仓" in ["番禺大货仓", "色卡组"...] -> True
-            return user_permission in doc_perms
-
         print(f"\n[检索中] 用户权限: {user_permission}, 查询: {query}")
         
-        # 执行检索
-        retrieved = vector_store.similarity_search(
+        # 执行检索：向量与 BM25 两路都按入库时建立的元数据索引过滤，只对有权限的片段打分，
+        # 再按 RRF 融合；None 表示文档未设置权限，默认公开
+        retrieved = retriever.search(
             query, 
             k=3, 
-            filter=filter_func # 传入过滤函数
+            where={"permissions": [user_permission, None]},
         )
         
         if not retrieved:
@@ -191,37 +160,111 @@ def create_react_agent(vector_store: InMemoryVectorStore, user_permission: str):
         )
         return serialized, retrieved
 
+    @tool(response_format="content_and_artifact")
+    def retrieve_context_batch(queries: list[str]):
+        """一次检索多个子问题。"""
+        print(f"\n[批量检索中] 用户权限: {user_permission}, 查询: {queries}")
+
+        # 多条查询的向量部分合并为一次 Embedding 请求和一次矩阵打分，权限过滤同上
+        results = retriever.batch_search_with_score(
+            queries,
+            k=3,
+            where={"permissions": [user_permission, None]},
+        )
+
+        # 同一片段命中多个子问题时只输出一次
+        matched: dict[str, list[int]] = {}
+        retrieved = []
+        for i, hits in enumerate(results):
+            for doc, _ in hits:
+                if doc.id not in matched:
+                    matched[doc.id] = []
+                    retrieved.append(doc)
+                matched[doc.id].append(i + 1)
+
+        if not retrieved:
+            return "没有找到相关且您有权限查看的文档。", []
+
+        serialized = "\n\n".join(
+            f"---片段 {i+1}（子问题 {', '.join(map(str, matched[doc.id]))}）---\n{doc.page_content}"
+            for i, doc in enumerate(retrieved)
+        )
+        return serialized, retrieved
+
     return create_agent(
-        llm,
-        tools=[retrieve_context],
+        get_llm(),
+        tools=[retrieve_context, retrieve_context_batch],
         system_prompt=(
             "你是一个企业知识问答助手。"
             "必须优先根据检索到的【参考资料】回答用户问题。"
+            "问题包含多个子问题时，优先用 retrieve_context_batch 一次检索全部子问题。"
             "只输出用户权限组内的文档内容，不输出其他权限组的文档。"
             "不清晰或有多个相似回答的，需要咨询用户进行确认。"
         ),
     )
 
 
+def ask_agent(
+    retriever: HybridRetriever,
+    question: str,
+    user_permission: str,
+    answer_cache: SemanticAnswerCache | None = None,
+    faq_index: FAQIndex | None = None,
+) -> str:
+    """回答问题，依次尝试：
+
+    1. faq_index：与知识库中的问题精确匹配（忽略标点、全半角、空白），不调用 LLM 与 Embedding；
+    2. answer_cache：同一权限范围内有相似的已答问题时直接返回；
+    3. 都未命中时进入 Agent 循环。
+    """
+    if faq_index is not None:
+        entry = faq_index.lookup(question, user_permission)
+        if entry is not None:
+            print(f"\n[FAQ 精确匹配] {entry.question}")
+            return entry.answer
+
+    if answer_cache is not None:
+        cached = answer_cache.lookup(question, user_permission)
+        if cached is not None:
+            print(f"\n[答案缓存命中] 相似度 {cached.similarity:.3f}，原问题: {cached.question}")
+            return cached.answer
+
+    agent = create_react_agent(retriever, user_permission=user_permission)
+    response = agent.invoke({"messages": [{"role": "user", "content": question}]})
+    answer = response["messages"][-1].content
+
+    if answer_cache is not None:
+        # 记录答案引用的片段，片段变化后由 sync_sources / invalidate_sources 失效；
+        # 没有检索到片段的回答（如“没有找到”或反问）不会被缓存
+        sources = [
+            doc
+            for message in response["messages"]
+            if isinstance(message, ToolMessage) and message.artifact
+            for doc in message.artifact
+        ]
+        answer_cache.store(question, user_permission, answer, sources)
+    return answer
+
+
 def run_demo():
-    # 1. 构建向量库
+    # 1. 构建向量库与关键词索引
     # 假设当前脚本同级目录下有 files 文件夹
-    vector_store = build_vector_store()
+    faq_index = FAQIndex()
+    retriever = build_retriever(faq_index=faq_index)
     print('\n=== 向量库准备就绪 ===\n')
 
-    query = "怎么考勤？"
+    # 复用检索的查询向量缓存，命中判断不额外请求 Embedding 接口
+    answer_cache = SemanticAnswerCache(retriever.vector_store.embeddings)
 
-    # 场景测试
+    # 场景测试：知识库原问题走 FAQ 精确匹配；同一权限组的相似问题第二次直接命中答案缓存
     print(f"--- 场景测试: 用户权限 = [IT组] ---")
-    
-    # 传入用户权限
-    agent = create_react_agent(vector_store, user_permission="IT组")
-    
-    # 执行对话
-    response = agent.invoke({"messages": [{"role": "user", "content": query}]})
-    
-    print("\n=== 最终回答 ===")
-    print(response["messages"][-1].content)
+    for query in ["公司的考勤方式是什么?", "怎么考勤？", "怎么考勤"]:
+        answer = ask_agent(retriever, query, "IT组", answer_cache, faq_index)
+        print("\n=== 最终回答 ===")
+        print(answer)
+
+    print(f"FAQ 精确匹配: {faq_index.stats()}")
+    print(f"答案缓存: {answer_cache.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,24 @@
+"""
+Graphiti 知识图谱示例：把产品数据写入 Neo4j。
+
+import 本模块不会导入 graphiti_core / openai，也不会创建客户端或数据库驱动：
+build_graphiti() 在第一次调用时创建 Graphiti 实例，服务可在接收请求前调用 warmup()。
+"""
+
+from __future__ import annotations
+
 import asyncio
-from graphiti_core import Graphiti
-import os
+import importlib
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from graphiti_core import Graphiti
 
 # 硅基流动
 OPENAI_API_KEY="sk-kodzewuwqkxlypmgegdjdgvhwntqfegmcamipvcoylribmss"
@@ -11,81 +29,101 @@ OPENAI_API_EMBEDDING_MODEL="BAAI/bge-m3"
 # 嵌入模型维度
 OPENAI_API_EMBEDDING_DIM=1024
 
-# 开启日志，查看卡在哪一步
-import logging
-import sys
-# ================= 1. 开启调试日志 =================
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+# 创建 Graphiti 时必然用到的模块，warmup() 预先导入
+_HEAVY_MODULES = (
+    "graphiti_core",
+    "graphiti_core.driver.neo4j_driver",
+    "graphiti_core.llm_client.openai_generic_client",
+    "graphiti_core.embedder.openai",
+    "graphiti_core.cross_encoder.openai_reranker_client",
+    "graphiti_core.nodes",
+    "graphiti_core.utils.maintenance.graph_data_operations",
+    "openai",
 )
-# 这一行会让你看到是否卡在 API 请求上
-logging.getLogger("httpx").setLevel(logging.INFO)
 
 
-# 图数据库
-from graphiti_core.driver.neo4j_driver import Neo4jDriver
+def configure_logging() -> None:
+    """开启日志，查看卡在哪一步。"""
+    # ================= 1. 开启调试日志 =================
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    # 这一行会让你看到是否卡在 API 请求上
+    logging.getLogger("httpx").setLevel(logging.INFO)
 
-# LLM模型
-from graphiti_core.llm_client.config import LLMConfig
-from graphiti_core.llm_client.openai_generic_client import OpenAIGenericClient
-llm_config = LLMConfig(
-    api_key=OPENAI_API_KEY,  # OpenAI API key
-    model=OPENAI_API_MODEL,
-    small_model=OPENAI_API_SMALL_MODEL,
-    base_url=OPENAI_API_BASE,  # OpenAI's OpenAI-compatible endpoint
 
-)
-llm_client = OpenAIGenericClient(config=llm_config)
-
-# 嵌入模型
-from graphiti_core.embedder.openai import OpenAIEmbedder, OpenAIEmbedderConfig
-config=OpenAIEmbedderConfig(
-    api_key=OPENAI_API_KEY,  # Placeholder API key
-    embedding_model=OPENAI_API_EMBEDDING_MODEL,
-    embedding_dim=OPENAI_API_EMBEDDING_DIM,
-    base_url=OPENAI_API_BASE,
-)
-embedder=OpenAIEmbedder(config)
-
-# 重排模型
-from graphiti_core.cross_encoder.openai_reranker_client import OpenAIRerankerClient
-cross_encoder=OpenAIRerankerClient(client=llm_client, config=llm_config)
-
-# # 图数据库
-driver = Neo4jDriver(
-    uri="bolt://localhost:7687",
-    user="neo4j",
-    password="12345678",
-    database="neo4j"  # Custom database name
-)
+@lru_cache(maxsize=None)
+def build_graphiti() -> Graphiti:
+    """创建 Graphiti（LLM、嵌入、重排客户端与图数据库驱动）；之后返回同一个对象。"""
+    from graphiti_core import Graphiti
 
-# 初始化Graphiti
-graphiti = Graphiti(
-    # uri="bolt://localhost:7687",
-    # user="neo4j",
-    # password="12345678",
-    # database="neo4j",  # Custom database name
-    graph_driver=driver, 
-    llm_client=llm_client, 
-    embedder=embedder, 
-    cross_encoder=cross_encoder
-)
+    # 图数据库
+    from graphiti_core.driver.neo4j_driver import Neo4jDriver
+
+    # LLM模型
+    from graphiti_core.llm_client.config import LLMConfig
+    from graphiti_core.llm_client.openai_generic_client import OpenAIGenericClient
+    llm_config = LLMConfig(
+        api_key=OPENAI_API_KEY,  # OpenAI API key
+        model=OPENAI_API_MODEL,
+        small_model=OPENAI_API_SMALL_MODEL,
+        base_url=OPENAI_API_BASE,  # OpenAI's OpenAI-compatible endpoint
+
+    )
+    # 与嵌入、重排共用进程内的连接池
+    from agent_kit.http_clients import get_client_factory
+    openai_client = get_client_factory().async_openai_client(api_key=OPENAI_API_KEY, base_url=OPENAI_API_BASE)
+    llm_client = OpenAIGenericClient(config=llm_config, client=openai_client)
+
+    # 嵌入模型
+    from graphiti_core.embedder.openai import OpenAIEmbedder, OpenAIEmbedderConfig
+    config=OpenAIEmbedderConfig(
+        api_key=OPENAI_API_KEY,  # Placeholder API key
+        embedding_model=OPENAI_API_EMBEDDING_MODEL,
+        embedding_dim=OPENAI_API_EMBEDDING_DIM,
+        base_url=OPENAI_API_BASE,
+    )
+    embedder=OpenAIEmbedder(config, client=openai_client)
+
+    # 重排模型
+    from graphiti_core.cross_encoder.openai_reranker_client import OpenAIRerankerClient
+    cross_encoder=OpenAIRerankerClient(client=llm_client, config=llm_config)
+
+    # # 图数据库
+    driver = Neo4jDriver(
+        uri="bolt://localhost:7687",
+        user="neo4j",
+        password="12345678",
+        database="neo4j"  # Custom database name
+    )
 
-# 定义边类型
-from graphiti_core.edges import EntityEdge
-from graphiti_core.nodes import EpisodeType
+    # 初始化Graphiti
+    return Graphiti(
+        # uri="bolt://localhost:7687",
+        # user="neo4j",
+        # password="12345678",
+        # database="neo4j",  # Custom database name
+        graph_driver=driver, 
+        llm_client=llm_client, 
+        embedder=embedder, 
+        cross_encoder=cross_encoder
+    )
 
-# 清理数据
-from graphiti_core.utils.maintenance.graph_data_operations import clear_data
+
+def warmup() -> None:
+    """提前付清冷启动开销：导入 graphiti_core / openai 并创建 Graphiti（驱动在第一次查询时才连接数据库）。"""
+    for name in _HEAVY_MODULES:
+        importlib.import_module(name)
+    build_graphiti()
 
 
 # 导入产品数据
-import json
-from datetime import datetime, timezone
-from pathlib import Path
 async def ingest_products_data(client: Graphiti):
+    # 定义边类型
+    from graphiti_core.nodes import EpisodeType
+
     # script_dir = Path.cwd()
     # json_file_path = script_dir / 'data' / 'products.json'
 
@@ -289,6 +327,10 @@ async def ingest_products_data(client: Graphiti):
 
 
 async def main():
+    # 清理数据
+    from graphiti_core.utils.maintenance.graph_data_operations import clear_data
+
+    graphiti = build_graphiti()
 
     # 初始化清理数据
     await clear_data(graphiti.driver)
@@ -299,4 +341,5 @@ async def main():
     await ingest_products_data(graphiti)
 
 if __name__ == "__main__":
+    configure_logging()
     asyncio.run(main())
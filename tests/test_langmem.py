@@ -2,19 +2,17 @@
 langmem 记忆示例
 """
 
-import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
 from langgraph.store.memory import InMemoryStore
 from langmem import create_manage_memory_tool, create_search_memory_tool
 from langchain_core.messages import HumanMessage
 
+from agent_kit.http_clients import chat_model
+
 load_dotenv()
 
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
+llm = chat_model(
     model="qwen3-coder-plus",
 )
 
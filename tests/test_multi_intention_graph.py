@@ -1,22 +1,34 @@
-import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import SystemMessage, HumanMessage
+from langgraph.types import Send
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from typing import Literal
+from functools import lru_cache
+from typing import Annotated, TypedDict
+
+from agent_kit.http_clients import chat_model
+from agent_kit.intent_classifier import (
+    CentroidIntentClassifier,
+    HashingEmbeddings,
+    KeywordIntentRules,
+    TieredIntentClassifier,
+)
+from agent_kit.llm_cache import SQLiteLLMCache
 
 _ = load_dotenv()
 
 # 配置大模型服务
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-    model="qwen3-coder-plus",
-    temperature=0.7,
-)
+@lru_cache(maxsize=None)
+def get_llm():
+    """第一次调用时创建模型（连同 LLM 响应缓存文件），之后返回同一个对象。"""
+    return chat_model(
+        model="qwen3-coder-plus",
+        temperature=0.7,
+        # 只缓存 temperature=0 的调用（意图分类），对话回答不缓存
+        cache=SQLiteLLMCache(),
+    )
 
 # 定义工具函数
 @tool
@@ -39,8 +51,38 @@ math_tools = [calculate]
 weather_tool_node = ToolNode(weather_tools)
 math_tool_node = ToolNode(math_tools)
 
-# 分类节点：使用LLM对问题进行意图分类
-def classify_intention(state: MessagesState, config: RunnableConfig):
+INTENTIONS = ("weather", "math", "chat")
+
+# 第一级：关键词规则，命中的意图全部采用，同时命中多个时按复合问题处理（在规范化后的小写文本上匹配）
+INTENT_RULES = {
+    "weather": [r"天气|气温|温度|下雨|下雪|降雨|降温|刮风|台风|雾霾|空气质量|紫外线|晴天|阴天|多云|weather"],
+    "math": [
+        r"\d\s*[-+*/×÷^%]\s*\d",
+        r"计算|算一下|算算|等于多少|多少倍|平方|开方|根号|求和|乘以|除以|加上|减去|百分之",
+    ],
+}
+
+# 第二级：各意图的标注样例，取嵌入质心做最近质心分类
+INTENT_EXAMPLES = {
+    "weather": [
+        "北京今天天气怎么样？", "明天上海会下雨吗", "广州这周热不热", "出门要不要带伞",
+        "杭州现在多少度", "深圳明天有台风吗", "周末适合去爬山吗，会不会变天", "成都冷不冷，要穿外套吗",
+        "今晚会降温吗", "南京的空气好不好",
+    ],
+    "math": [
+        "帮我计算一下 123 + 456 等于多少？", "15 乘以 24 是多少", "100 除以 8", "3 的平方加 4 的平方",
+        "一共 7 个人平分 350 元，每人多少", "2 的 10 次方", "12% 的 500 是多少", "求 1 到 100 的和",
+        "0.5 加 0.25", "圆周率乘以 2",
+    ],
+    "chat": [
+        "你好，介绍一下你自己", "讲个笑话吧", "你叫什么名字", "推荐一本好看的书", "今天心情不太好",
+        "谢谢你的帮助", "怎么学好英语", "给我写一首关于春天的诗", "你能做什么", "晚饭吃什么好",
+    ],
+}
+
+
+# 第三级：使用LLM对问题进行意图分类，只在本地分类不确定时调用
+def llm_classify(text: str) -> str:
     """使用LLM对用户问题进行意图分类"""
     system_prompt = """你是一个意图分类助手。请根据用户的问题，判断其意图类型。
 
@@ -49,38 +91,66 @@ def classify_intention(state: MessagesState, config: RunnableConfig):
     2. math - 数学计算相关的问题（如计算、数学运算等）
     3. chat - 通用聊天对话（其他所有问题）
 
-    请只返回一个单词：weather、math 或 chat，不要返回其他内容。"""
+    问题同时包含多种意图时，返回全部意图，用英文逗号分隔（如 weather,math）。
+    请只返回意图单词：weather、math 或 chat，不要返回其他内容。"""
 
-    last_message = state["messages"][-1]
-    classification_prompt = f"""用户问题：{last_message.content}
+    classification_prompt = f"""用户问题：{text}
 
-    请判断意图类型（只返回一个单词：weather、math 或 chat）："""
+    请判断意图类型（只返回 weather、math、chat 中的一个或多个，逗号分隔）："""
 
     messages = [
         SystemMessage(content=system_prompt),
         HumanMessage(content=classification_prompt)
     ]
     
-    response = llm.invoke(messages)
-    intention = response.content.strip().lower()
-    
-    # 确保返回的是有效的意图类型
-    if intention not in ["weather", "math", "chat"]:
-        intention = "chat"  # 默认为聊天
-    
-    # 将分类结果添加到消息中
-    classification_msg = HumanMessage(
-        content=f"[系统分类结果：{intention}]"
+    # 分类需要确定的结果，同一问题重复分类时命中 LLM 响应缓存
+    response = get_llm().invoke(messages, temperature=0)
+    return response.content.strip().lower()
+
+
+def build_intent_classifier(fallback=llm_classify) -> TieredIntentClassifier:
+    """关键词规则 -> 本地最近质心 -> LLM 的两级分类器；fallback=None 时完全离线。"""
+    return TieredIntentClassifier(
+        INTENTIONS,
+        rules=KeywordIntentRules(INTENT_RULES),
+        centroid=CentroidIntentClassifier(HashingEmbeddings(), INTENT_EXAMPLES),
+        fallback=fallback,
+        default="chat",  # 无法判断时默认为聊天
     )
-    
-    return {"messages": state["messages"] + [classification_msg]}
+
+
+def _collect_results(current: list[dict], update: list[dict] | None) -> list[dict]:
+    """并行分支的结果追加合并；分类节点写入 None 表示新一轮对话，清空上一轮的结果。"""
+    if update is None:
+        return []
+    return current + update
+
+
+class MultiIntentionState(MessagesState):
+    intents: list[str]
+    results: Annotated[list[dict], _collect_results]
+
+
+class BranchOutput(TypedDict):
+    results: list[dict]
+
+
+# 分类节点：classifier 可替换，默认先本地分类、不确定时才调用LLM；复合问题返回多个意图
+def make_classify_node(classifier: TieredIntentClassifier):
+    def classify_intention(state: MultiIntentionState, config: RunnableConfig):
+        """对用户问题进行意图分类"""
+        last_message = state["messages"][-1]
+        prediction = classifier.classify(last_message.content)
+        return {"intents": list(prediction.intents), "results": None}
+
+    return classify_intention
 
 # 天气处理节点
 def weather_handler(state: MessagesState, config: RunnableConfig):
     """处理天气相关的问题"""
     system_prompt = "你是一个天气助手，可以帮助用户查询天气信息。"
     all_messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    model = llm.bind_tools(weather_tools)
+    model = get_llm().bind_tools(weather_tools)
     return {"messages": [model.invoke(all_messages)]}
 
 # 数学处理节点
@@ -88,7 +158,7 @@ def math_handler(state: MessagesState, config: RunnableConfig):
     """处理数学计算相关的问题"""
     system_prompt = "你是一个数学计算助手，可以帮助用户进行数学计算。"
     all_messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    model = llm.bind_tools(math_tools)
+    model = get_llm().bind_tools(math_tools)
     return {"messages": [model.invoke(all_messages)]}
 
 # 通用聊天节点
@@ -96,20 +166,23 @@ def chat_handler(state: MessagesState, config: RunnableConfig):
     """处理通用聊天对话"""
     system_prompt = "你是一个友好的助手，可以回答各种问题并进行对话。"
     all_messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    return {"messages": [llm.invoke(all_messages)]}
+    return {"messages": [get_llm().invoke(all_messages)]}
 
-# 路由函数：根据分类结果决定路由
-def route_by_intention(state: MessagesState, config: RunnableConfig) -> Literal["weather", "math", "chat"]:
-    """根据分类结果路由到不同的处理节点"""
-    # 从最后一条消息中提取分类结果
-    last_message = state["messages"][-1].content
-    
-    if "[系统分类结果：weather]" in last_message:
-        return "weather"
-    elif "[系统分类结果：math]" in last_message:
-        return "math"
-    else:
-        return "chat"
+# 路由函数：每个意图一个 Send，各分支并行执行，总耗时取决于最慢的分支
+def route_by_intention(state: MultiIntentionState, config: RunnableConfig) -> list[Send]:
+    """根据分类结果把问题分发到对应的处理分支"""
+    return [
+        Send(
+            f"{intention}_handler",
+            {
+                "messages": state["messages"] + [
+                    # 复合问题中每个分支只回答自己负责的部分
+                    HumanMessage(content=f"[系统分类结果：{intention}]")
+                ],
+            },
+        )
+        for intention in state["intents"]
+    ]
 
 # 判断是否需要调用工具（天气）
 def should_use_weather_tool(state: MessagesState, config: RunnableConfig):
@@ -127,57 +200,73 @@ def should_use_math_tool(state: MessagesState, config: RunnableConfig):
         return "use_tool"
     return "end"
 
+# 处理分支：处理节点 <-> 工具节点的循环，结束时只把最终回答写回主图的 results
+def build_branch(intention: str, handler, tool_node: ToolNode | None = None, should_use_tool=None):
+    """构建单个意图的处理子图"""
+    builder = StateGraph(MessagesState, output_schema=BranchOutput)
+
+    def finish(state: MessagesState, config: RunnableConfig):
+        return {"results": [{"intention": intention, "content": state["messages"][-1].content}]}
+
+    builder.add_node(f"{intention}_handler", handler)
+    builder.add_node("finish", finish)
+    builder.add_edge(START, f"{intention}_handler")
+    if tool_node is None:
+        builder.add_edge(f"{intention}_handler", "finish")
+    else:
+        builder.add_node(f"{intention}_tool", tool_node)
+        builder.add_conditional_edges(
+            f"{intention}_handler",
+            should_use_tool,
+            {
+                "use_tool": f"{intention}_tool",
+                "end": "finish",
+            },
+        )
+        builder.add_edge(f"{intention}_tool", f"{intention}_handler")
+    builder.add_edge("finish", END)
+    return builder.compile(name=f"{intention}-branch")
+
+
+# 合并节点：按意图顺序拼接各分支的回答，不再调用LLM
+def merge_results(state: MultiIntentionState, config: RunnableConfig):
+    """合并并行分支的结果"""
+    order = {intention: i for i, intention in enumerate(state["intents"])}
+    results = sorted(state["results"], key=lambda r: order.get(r["intention"], len(order)))
+    if len(results) == 1:
+        content = results[0]["content"]
+    else:
+        content = "\n\n".join(f"【{r['intention']}】\n{r['content']}" for r in results)
+    return {"messages": [AIMessage(content=content)]}
+
+
 # 构建多意图状态图
-def build_multi_intention_graph():
+def build_multi_intention_graph(classifier: TieredIntentClassifier | None = None):
     """构建多意图分类处理图"""
-    builder = StateGraph(MessagesState)
+    builder = StateGraph(MultiIntentionState)
     
     # 添加节点
-    builder.add_node("classify", classify_intention)  # 分类节点
-    builder.add_node("weather_handler", weather_handler)  # 天气处理节点
-    builder.add_node("math_handler", math_handler)  # 数学处理节点
-    builder.add_node("chat_handler", chat_handler)  # 聊天处理节点
-    builder.add_node("weather_tool", weather_tool_node)  # 天气工具节点
-    builder.add_node("math_tool", math_tool_node)  # 数学工具节点
+    builder.add_node("classify", make_classify_node(classifier or build_intent_classifier()))  # 分类节点
+    builder.add_node("weather_handler", build_branch("weather", weather_handler, weather_tool_node, should_use_weather_tool))  # 天气处理分支
+    builder.add_node("math_handler", build_branch("math", math_handler, math_tool_node, should_use_math_tool))  # 数学处理分支
+    builder.add_node("chat_handler", build_branch("chat", chat_handler))  # 聊天处理分支
+    builder.add_node("merge", merge_results)  # 合并节点
     
     # 添加边：从START到分类节点
     builder.add_edge(START, "classify")
     
-    # 添加条件边：根据分类结果路由
+    # 添加条件边：按分类结果并行分发到一个或多个处理分支
     builder.add_conditional_edges(
         "classify",
         route_by_intention,
-        {
-            "weather": "weather_handler",
-            "math": "math_handler",
-            "chat": "chat_handler",
-        },
-    )
-    
-    # 天气处理流程：判断是否需要调用工具
-    builder.add_conditional_edges(
-        "weather_handler",
-        should_use_weather_tool,
-        {
-            "use_tool": "weather_tool",
-            "end": END,
-        },
-    )
-    builder.add_edge("weather_tool", "weather_handler")
-    
-    # 数学处理流程：判断是否需要调用工具
-    builder.add_conditional_edges(
-        "math_handler",
-        should_use_math_tool,
-        {
-            "use_tool": "math_tool",
-            "end": END,
-        },
+        ["weather_handler", "math_handler", "chat_handler"],
     )
-    builder.add_edge("math_tool", "math_handler")
     
-    # 聊天处理直接结束
-    builder.add_edge("chat_handler", END)
+    # 各分支都完成后合并结果
+    builder.add_edge("weather_handler", "merge")
+    builder.add_edge("math_handler", "merge")
+    builder.add_edge("chat_handler", "merge")
+    builder.add_edge("merge", END)
     
     return builder.compile(name="multi-intention-graph")
 
@@ -215,6 +304,7 @@ if __name__ == "__main__":
         # "北京今天天气怎么样？",
         "帮我计算一下 123 + 456 等于多少？",
         # "你好，介绍一下你自己",
+        "北京天气怎么样，顺便算一下 123+456",
     ]
     
     for query in test_queries:
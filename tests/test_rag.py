@@ -2,124 +2,159 @@
 基于阿里百炼平台 API 的 RAG 示例
 
 参考: https://docs.langchain.com/oss/python/langchain/rag#build-a-rag-agent-with-langchain
+
+import 本模块不会抓取网页、调用 Embedding 接口或导入 langchain / openai / bs4：
+模型、向量库与 Agent 都由工厂函数在第一次使用时创建，服务可在接收请求前调用 warmup()。
 """
 
-import os
-import bs4
+from __future__ import annotations
+
+import importlib
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
-from openai import OpenAI
-from langchain_openai import ChatOpenAI
-from langchain_community.document_loaders import WebBaseLoader
-from langchain_core.embeddings import Embeddings
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain.agents import create_agent
-from langchain.tools import tool
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+    from langchain_openai import ChatOpenAI
+
+    from agent_kit import MatrixVectorStore
 
 
 # 加载模型配置
 _ = load_dotenv()
 
-
-# 加载模型
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-    model="qwen3-coder-plus",
-    temperature=0.7,
+BLOG_URL = "https://luochang212.github.io/posts/quick_bi_intro/"
+
+# 处理第一个问题前必然用到的模块，warmup() 预先导入
+_HEAVY_MODULES = (
+    "bs4",
+    "langchain_community.document_loaders",
+    "langchain.agents",
+    "langchain.tools",
+    "openai",
+    "agent_kit.embeddings",
+    "agent_kit.matrix_store",
+    "agent_kit.chunking",
 )
 
-# 创建 OpenAI 客户端
-client = OpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
-)
 
-# DashScope 兼容的 OpenAIEmbeddings 实现
-class DashScopeEmbeddings(Embeddings):
-    def __init__(self, model: str = "text-embedding-v4", dimensions: int = 1024):
-        self.model = model
-        self.dimensions = dimensions
-
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        out: list[list[float]] = []
-        for i in range(0, len(texts), 10):
-            chunk = texts[i : i + 10]
-            r = client.embeddings.create(
-                model=self.model,
-                input=chunk,
-                dimensions=self.dimensions,
-            )
-            out.extend([d.embedding for d in r.data])
-        return out
-
-    def embed_query(self, text: str) -> list[float]:
-        r = client.embeddings.create(
-            model=self.model,
-            input=[text],
-            dimensions=self.dimensions,
-        )
-        return r.data[0].embedding
+@lru_cache(maxsize=None)
+def get_llm() -> ChatOpenAI:
+    """加载模型；第一次调用时创建，之后返回同一个对象。"""
+    from agent_kit.http_clients import chat_model
 
-# 初始化内存向量存储
-embeddings = DashScopeEmbeddings()
-vector_store = InMemoryVectorStore(embedding=embeddings)
+    return chat_model(
+        model="qwen3-coder-plus",
+        temperature=0.7,
+    )
 
-# Only keep post title, headers, and content from the full HTML.
-bs4_strainer = bs4.SoupStrainer(class_=("post-title", "post-header", "post-content"))
-loader = WebBaseLoader(
-    web_paths=("https://luochang212.github.io/posts/quick_bi_intro/",),
-    bs_kwargs={"parse_only": bs4_strainer},
-)
-docs = loader.load()
 
-assert len(docs) == 1
-# print(f"Total characters: {len(docs[0].page_content)}")
-# print(docs[0].page_content[:500])
+def load_blog_documents(url: str = BLOG_URL) -> list[Document]:
+    """抓取博客文章。"""
+    import bs4
+    from langchain_community.document_loaders import WebBaseLoader
 
-# 文本分块
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,  # chunk size (characters)
-    chunk_overlap=200,  # chunk overlap (characters)
-    add_start_index=True,  # track index in original document
-)
-all_splits = text_splitter.split_documents(docs)
+    # Only keep post title, headers, and content from the full HTML.
+    bs4_strainer = bs4.SoupStrainer(class_=("post-title", "post-header", "post-content"))
+    loader = WebBaseLoader(
+        web_paths=(url,),
+        bs_kwargs={"parse_only": bs4_strainer},
+    )
+    docs = loader.load()
+
+    assert len(docs) == 1
+    # print(f"Total characters: {len(docs[0].page_content)}")
+    # print(docs[0].page_content[:500])
+    return docs
 
-# print(f"Split blog post into {len(all_splits)} sub-documents.")
 
-# 将文档添加到向量存储
-document_ids = vector_store.add_documents(documents=all_splits)
+def build_vector_store(docs: list[Document]) -> MatrixVectorStore:
+    """分块并写入内存向量存储（重复的检索问题命中查询向量缓存）。"""
+    from agent_kit import DashScopeEmbeddings, MatrixVectorStore, QueryCachedEmbeddings
+    from agent_kit.chunking import split_documents
 
-# print(document_ids[:3])
+    embeddings = QueryCachedEmbeddings(DashScopeEmbeddings())
+    vector_store = MatrixVectorStore(embedding=embeddings)
 
-# 创建上下文检索工具
-@tool(response_format="content_and_artifact")
-def retrieve_context(query: str):
-    """Retrieve information to help answer a query."""
-    retrieved_docs = vector_store.similarity_search(query, k=2)
-    serialized = "\n\n".join(
-        (f"Source: {doc.metadata}\nContent: {doc.page_content}")
-        for doc in retrieved_docs
+    # 文本分块：按句打包，不会从句子中间切开
+    all_splits = split_documents(
+        docs,
+        strategy="sentence",
+        chunk_size=1000,  # chunk size (characters)
+        overlap=200,  # chunk overlap (characters)
+        add_start_index=True,  # track index in original document
     )
-    return serialized, retrieved_docs
-
-# 创建 ReAct Agent
-agent = create_agent(
-    llm,
-    tools=[retrieve_context],
-    system_prompt=(
-        # If desired, specify custom instructions
-        "You have access to a tool that retrieves context from a blog post. "
-        "Use the tool to help answer user queries."
+
+    # print(f"Split blog post into {len(all_splits)} sub-documents.")
+
+    # 将文档添加到向量存储
+    document_ids = vector_store.add_documents(documents=all_splits)
+
+    # print(document_ids[:3])
+    return vector_store
+
+
+@lru_cache(maxsize=None)
+def get_vector_store() -> MatrixVectorStore:
+    """博客文章的向量库；第一次调用时抓取并嵌入，之后返回同一个对象。"""
+    return build_vector_store(load_blog_documents())
+
+
+def create_rag_agent(vector_store: MatrixVectorStore | None = None):
+    """创建带上下文检索工具的 ReAct Agent；未给出 vector_store 时使用 get_vector_store()。"""
+    from langchain.agents import create_agent
+    from langchain.tools import tool
+
+    store = vector_store if vector_store is not None else get_vector_store()
+
+    # 创建上下文检索工具
+    @tool(response_format="content_and_artifact")
+    def retrieve_context(query: str):
+        """Retrieve information to help answer a query."""
+        retrieved_docs = store.similarity_search(query, k=2)
+        serialized = "\n\n".join(
+            (f"Source: {doc.metadata}\nContent: {doc.page_content}")
+            for doc in retrieved_docs
+        )
+        return serialized, retrieved_docs
+
+    # 创建 ReAct Agent
+    return create_agent(
+        get_llm(),
+        tools=[retrieve_context],
+        system_prompt=(
+            # If desired, specify custom instructions
+            "You have access to a tool that retrieves context from a blog post. "
+            "Use the tool to help answer user queries."
+        )
     )
-)
 
-# 测试 ReAct Agent
-query = "当前的 Agent 能力，有哪些局限？"
 
-for event in agent.stream(
-    {"messages": [{"role": "user", "content": query}]},
-    stream_mode="values",
-):
-    event["messages"][-1].pretty_print()
+def warmup(load_documents: bool = False) -> None:
+    """提前付清冷启动开销：导入依赖并创建模型客户端。
+
+    load_documents=True 时同时抓取文章并建好向量库（需要网络与 Embedding 接口），第一个问题不再等待入库。
+    """
+    for name in _HEAVY_MODULES:
+        importlib.import_module(name)
+    get_llm()
+    if load_documents:
+        get_vector_store()
+
+
+def run_demo():
+    """测试 ReAct Agent。"""
+    agent = create_rag_agent()
+    query = "当前的 Agent 能力，有哪些局限？"
+
+    for event in agent.stream(
+        {"messages": [{"role": "user", "content": query}]},
+        stream_mode="values",
+    ):
+        event["messages"][-1].pretty_print()
+
+
+if __name__ == "__main__":
+    run_demo()
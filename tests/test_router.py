@@ -1,17 +1,16 @@
-import os
-import re
+from pathlib import Path
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain.agents import create_agent
 from langchain_core.messages import HumanMessage
 from langgraph.graph import MessagesState
 from langgraph.graph import StateGraph, START, END
 
+from agent_kit.http_clients import chat_model
+from agent_kit.rule_router import RuleRouter
+
 load_dotenv()
 
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
+llm = chat_model(
     model="qwen3-coder-plus",
 )
 
@@ -32,12 +31,9 @@ def run_tool_agent(state: MessagesState):
     res = tool_agent.invoke({"messages": state["messages"]})
     return {"messages": res["messages"]}
 
-# 3) 路由节点：简单规则判断是否需要走工具
-def route(state: MessagesState):
-    text = state["messages"][-1].content.lower()
-    if re.search(r"天气|weather|气温|温度|城市|city", text):
-        return "tool"
-    return "chat"
+# 3) 路由节点：关键词路由表编译成 Aho–Corasick 自动机判断是否需要走工具，
+# 修改 router_rules.json 后无需重启即可生效
+route = RuleRouter(Path(__file__).parent / "router_rules.json")
 
 graph_builder = StateGraph(MessagesState)
 
@@ -61,3 +57,4 @@ graph = graph_builder.compile()
 
 result = graph.invoke({"messages": [HumanMessage(content="你好，北京是什么天气")]})
 print(result["messages"][-1].content)
+print(route.stats())
@@ -1,20 +1,18 @@
-import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
+from agent_kit.http_clients import chat_model
+
 
 _ = load_dotenv()
 
 
 # 配置大模型服务
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
+llm = chat_model(
     model="qwen3-coder-plus",
     temperature=0.7,
 )
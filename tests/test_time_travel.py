@@ -1,21 +1,19 @@
-import os
 import uuid
 
 from dotenv import load_dotenv
 from typing_extensions import TypedDict, NotRequired
 from langgraph.graph import StateGraph, START, END
-from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import InMemorySaver
 
+from agent_kit.http_clients import chat_model
+
 
 # 加载模型配置
 _ = load_dotenv()
 
 
 # 加载模型
-llm = ChatOpenAI(
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url=os.getenv("DASHSCOPE_BASE_URL"),
+llm = chat_model(
     model="qwen3-coder-plus",
     temperature=0.7,
 )